@@ -23,7 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "runs.middleware.RequestMetricsMiddleware",  # First, to measure the other middleware too
     "django.middleware.security.SecurityMiddleware",
+    "runs.middleware.StaticAssetMiddleware",  # Before sessions and locale, see its docstring
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",  # Add this for translation support
     "django.middleware.common.CommonMiddleware",
@@ -31,6 +33,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "runs.profiling.ProfilingMiddleware",  # After authentication, to recognise staff
 ]
 
 ROOT_URLCONF = "firmenlauf.urls"
@@ -90,8 +93,91 @@ LOCALE_PATHS = [
 STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# Connection options for SQLite databases, applied to every new connection. WAL lets
+# readers continue while one connection writes, and synchronous=NORMAL is durable in WAL
+# mode except for the last commits before a power loss. Write transactions start with
+# BEGIN IMMEDIATE: a transaction that reads before it writes would otherwise fail with
+# "database is locked" without waiting. Waiting writers give up after the timeout (s).
+SQLITE_OPTIONS = {
+    "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL",
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+}
+
+# Cache
+# The local-memory cache is per process: changes only invalidate the pages cached by the
+# process that made them. The production settings use a cache shared by all processes.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Seconds a public page stays in the versioned page cache (0 disables it).
+# Changes to events and participants invalidate cached pages immediately.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Seconds browsers and proxies may reuse a response of the JSON API without asking again.
+# After that they revalidate with the ETag and usually get a 304 Not Modified.
+API_CACHE_MAX_AGE = 15
+
+# Seconds an event report (such as the t-shirt sizes) stays cached. Changes to the
+# event or its participants invalidate it immediately.
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Live seat counts on the event detail page: seconds between keepalive comments on an
+# idle stream, and seconds before a stream or a long poll is ended (browsers reconnect).
+AVAILABILITY_KEEPALIVE = 15
+AVAILABILITY_STREAM_TIMEOUT = 5 * 60
+AVAILABILITY_POLL_TIMEOUT = 25
+
+# Server-sent events and long polls hold their connection open for minutes. Only enable
+# them when served by an ASGI server: a WSGI worker would be blocked for every open page.
+# Without them, pages ask for the seat count every AVAILABILITY_POLL_INTERVAL seconds.
+LIVE_AVAILABILITY_SSE = False
+AVAILABILITY_POLL_INTERVAL = 30
+
+# Seconds between the checks for seat count changes made by other processes, while pages
+# are connected to this process
+AVAILABILITY_CHECK_INTERVAL = 2
+
+# Email outbox delivered by the send_emails command: emails sent per SMTP connection,
+# delivery attempts before an email is given up, seconds before the first retry
+# (doubled for every further attempt), and seconds a worker reserves the emails it sends.
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_LEASE = 5 * 60
+
+# Bearer token Prometheus sends to scrape /metrics. Staff members can always view it.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+# Seconds between the times each process stores its request metrics in the cache; a
+# process that has not stored them for three intervals counts as exited
+METRICS_FLUSH_INTERVAL = 10
+# Send the Server-Timing header to every visitor instead of staff members only. It
+# reveals the number of queries and the time spent on them.
+SERVER_TIMING = False
+
+# Request profiles: directory they are stored in, share of all requests profiled
+# without being asked for (0 to only profile on request of staff members), and the
+# number of profiles kept.
+PROFILING_DIR = BASE_DIR / "profiles"
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_KEEP = 200
+
+# Directory the publish_pages command renders the public pages to, for the web server
+# to serve them without Django. Unset disables publishing.
+PUBLISHED_PAGES_DIR = os.environ.get("PUBLISHED_PAGES_DIR")
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Admin contact email for user support
 ADMIN_EMAIL = "marvin.schweizer@gmail.com"
+
+# High-throughput registration mode: concurrent registrations for the same event are
+# collected for REGISTRATION_BATCH_WINDOW seconds (at most REGISTRATION_BATCH_SIZE of them)
+# and saved in a single transaction. See runs.batching.
+REGISTRATION_BATCHING = False
+REGISTRATION_BATCH_WINDOW = 0.005
+REGISTRATION_BATCH_SIZE = 100
@@ -7,7 +7,7 @@ These settings are used for local development.
 import os
 
 from .base import *  # noqa
-from .base import BASE_DIR  # noqa
+from .base import BASE_DIR, SQLITE_OPTIONS  # noqa
 
 # SECURITY WARNING: keep the secret key used in production secret!
 # In development, we use a default key if not provided in environment
@@ -26,8 +26,22 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": SQLITE_OPTIONS,
+        # A file-backed test database, so concurrency tests get real SQLite locking;
+        # the shared-cache in-memory default fails fast with "table is locked"
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Template edits do not invalidate the page cache, so do not cache during development
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    }
+}
+
+# Show every request's timing in the developer tools, logged in or not
+SERVER_TIMING = True
+
 # Email backend for development
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -7,6 +7,7 @@ These settings are used for production deployment.
 import os
 
 from .base import *  # noqa
+from .base import BASE_DIR, SQLITE_OPTIONS
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY")
@@ -40,6 +41,33 @@ DATABASES = {
     }
 }
 
+# A single-node deployment may use SQLite (DB_ENGINE=django.db.backends.sqlite3 with
+# DB_NAME as the path of the database file); it needs the concurrency options
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"]["OPTIONS"] = SQLITE_OPTIONS
+
+# Cache
+# Pages, reports and admin lookups are invalidated by bumping version keys in the cache.
+# Every web worker and management command must see the same versions, so the cache has
+# to be shared between processes: files by default, or e.g. Redis via the environment.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", str(BASE_DIR / "cache")),
+    }
+}
+if CACHES["default"]["BACKEND"] == "django.core.cache.backends.filebased.FileBasedCache":
+    # Culling at the default 300 entries would drop the request metrics of workers
+    # along with pages, so leave room for every cached page
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", "5000"))}
+if CACHES["default"]["BACKEND"] == "django.core.cache.backends.locmem.LocMemCache":
+    raise ValueError(
+        "The local-memory cache is not shared between processes, so changes would not "
+        "invalidate the pages cached by other workers. Set CACHE_BACKEND to a shared cache."
+    )
+
 # Security settings
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -59,3 +87,9 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD")
 EMAIL_USE_TLS = True
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL")
+
+# Static files are collected with content hashes in their names and a gzip copy
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "runs.storage.CompressedManifestStaticFilesStorage"},
+}
@@ -1,16 +1,101 @@
 """Admin configuration for the runs application."""
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from django.utils.translation import ngettext
 
-from .models import Participant, RunningEvent
+from .cache import get_page_version
+from .exports import participant_csv_response
+from .models import DepartmentStatistic, OutgoingEmail, Participant, RunningEvent
+from .reports import tshirt_size_report
 
 
-class ParticipantInline(admin.TabularInline):
-    """Inline admin for participants to be included in the running event admin."""
+def report_rebalancing(modeladmin, request, promoted: int, demoted: int) -> None:
+    """Tell the admin user how many participants were moved."""
+    if promoted:
+        modeladmin.message_user(
+            request,
+            ngettext(
+                "%(count)d participant was moved from the waiting list to a spot.",
+                "%(count)d participants were moved from the waiting list to a spot.",
+                promoted,
+            )
+            % {"count": promoted},
+            messages.SUCCESS,
+        )
+    if demoted:
+        modeladmin.message_user(
+            request,
+            ngettext(
+                "%(count)d participant was moved to the waiting list.",
+                "%(count)d participants were moved to the waiting list.",
+                demoted,
+            )
+            % {"count": demoted},
+            messages.WARNING,
+        )
 
-    model = Participant
-    extra = 0
-    readonly_fields = ("registered_at",)
+
+class DepartmentListFilter(admin.SimpleListFilter):
+    """
+    Filter participants by department.
+
+    The departments are looked up through the department index, only for the selected
+    event if there is one, and cached until the next participant change.
+    """
+
+    title = _("Department")
+    parameter_name = "department"
+
+    def lookups(self, request, model_admin):
+        """Return the departments that have participants."""
+        event_id = request.GET.get("event__id__exact", "")
+        key = f"runs:admin_departments:{get_page_version()}:{event_id}"
+        departments = cache.get(key)
+        if departments is None:
+            participants = Participant.objects.all()
+            if event_id.isdigit():
+                participants = participants.filter(event_id=event_id)
+            departments = list(
+                participants.order_by("department").values_list("department", flat=True).distinct()
+            )
+            cache.set(key, departments)
+        return [(department, department) for department in departments]
+
+    def queryset(self, request, queryset):
+        """Restrict the participants to the selected department."""
+        if self.value() is None:
+            return queryset
+        return queryset.filter(department=self.value())
+
+
+class ParticipantPaginator(Paginator):
+    """
+    Paginator that counts all participants through the event counters.
+
+    Counting an unfiltered participant table scans all of it, while the sum of the
+    registered and waiting list counters only reads the events.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        """Return the total number of participants in the list."""
+        query = getattr(self.object_list, "query", None)
+        if query is None or query.where:
+            return super().count
+        return RunningEvent.objects.aggregate(
+            total=Coalesce(Sum(F("registered_count") + F("waitlist_count")), 0)
+        )["total"]
 
 
 @admin.register(RunningEvent)
@@ -23,11 +108,86 @@ class RunningEventAdmin(admin.ModelAdmin):
         "location",
         "registration_deadline",
         "max_participants",
+        "registered_count",
+        "waitlist_count",
         "created_at",
     )
     list_filter = ("date", "registration_deadline")
     search_fields = ("name", "location")
-    inlines = [ParticipantInline]
+    actions = ["rebalance_waiting_lists", "export_participants_csv"]
+    # Participants shown per page of the roster on the change page
+    roster_per_page = 50
+
+    def render_change_form(self, request, context, add=False, change=False, form_url="", obj=None):
+        """
+        Add one page of the participant roster to the change page.
+
+        Participants are listed read-only and edited in the participant admin, so
+        saving an event never posts its participants.
+        """
+        if obj is not None:
+            participants = obj.participants.only(
+                "name",
+                "department",
+                "year_of_birth",
+                "tshirt_size",
+                "email",
+                "on_waiting_list",
+                "registered_at",
+            ).order_by("on_waiting_list", "registered_at", "pk")
+            paginator = Paginator(participants, self.roster_per_page)
+            context["participant_page"] = paginator.get_page(request.GET.get("participants_page"))
+        return super().render_change_form(request, context, add, change, form_url, obj)
+
+    def get_urls(self):
+        """Add the t-shirt size report page to the event admin."""
+        urls = [
+            path(
+                "<path:object_id>/tshirt-sizes/",
+                self.admin_site.admin_view(self.tshirt_size_view),
+                name="runs_runningevent_tshirt_sizes",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def tshirt_size_view(self, request, object_id):
+        """Show how many t-shirts of each size the participants of an event ordered."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        report = tshirt_size_report(int(object_id)) if object_id.isdigit() else None
+        if report is None:
+            raise Http404
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "object_id": object_id,
+            "title": _("T-shirt sizes: %(event)s") % {"event": report["event"]["name"]},
+            "report": report,
+        }
+        return TemplateResponse(request, "admin/runs/runningevent/tshirt_sizes.html", context)
+
+    def save_model(self, request, obj, form, change):
+        """Rebalance the waiting list after the capacity changed."""
+        super().save_model(request, obj, form, change)
+        if change and "max_participants" in form.changed_data:
+            report_rebalancing(self, request, *obj.rebalance_waiting_list())
+
+    @admin.action(description=_("Rebalance waiting lists of selected events"))
+    def rebalance_waiting_lists(self, request, queryset):
+        """Promote or demote participants of the selected events to match their capacity."""
+        report_rebalancing(self, request, *queryset.rebalance_waiting_lists())
+
+    def has_view_participant_permission(self, request):
+        """Check if the user may see the participants, and thus export them."""
+        return request.user.has_perm("runs.view_participant")
+
+    @admin.action(
+        description=_("Export participants of selected events as CSV"),
+        permissions=["view_participant"],
+    )
+    def export_participants_csv(self, request, queryset):
+        """Stream the participants of the selected events as CSV."""
+        return participant_csv_response(request, Participant.objects.filter(event__in=queryset))
 
 
 @admin.register(Participant)
@@ -44,6 +204,147 @@ class ParticipantAdmin(admin.ModelAdmin):
         "on_waiting_list",
         "registered_at",
     )
-    list_filter = ("event", "tshirt_size", "department", "on_waiting_list")
-    search_fields = ("name", "email")
+    list_select_related = ("event",)
+    list_filter = ("event", "tshirt_size", DepartmentListFilter, "on_waiting_list")
+    # Prefix and exact lookups, served by the case-insensitive indexes of migration 0010
+    search_fields = ("^name", "=email")
+    search_help_text = _(
+        "Search by the beginning of the name or the exact email address. Start with * "
+        "to search anywhere in the name, which is slower."
+    )
+    show_full_result_count = False
+    paginator = ParticipantPaginator
     readonly_fields = ("registered_at",)
+    actions = ["export_csv"]
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search the indexed name prefixes and emails, or the whole names on request.
+
+        A term starting with ``*`` searches anywhere in the name (e.g. for a last
+        name). That scans the table, so it is never done implicitly.
+        """
+        search_term = search_term.strip()
+        if search_term.startswith("*"):
+            substring = search_term[1:].strip()
+            return (queryset.filter(name__icontains=substring) if substring else queryset), False
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.action(description=_("Export selected participants as CSV"))
+    def export_csv(self, request, queryset):
+        """Stream the selected participants as CSV."""
+        return participant_csv_response(request, queryset)
+
+    def delete_model(self, request, obj):
+        """Delete a participant and give the freed spot to the waiting list."""
+        super().delete_model(request, obj)
+        report_rebalancing(self, request, *obj.event.rebalance_waiting_list())
+
+    def delete_queryset(self, request, queryset):
+        """Delete participants and give the freed spots to the waiting lists."""
+        event_ids = set(queryset.values_list("event_id", flat=True))
+        super().delete_queryset(request, queryset)
+        events = RunningEvent.objects.filter(pk__in=event_ids)
+        report_rebalancing(self, request, *events.rebalance_waiting_lists())
+
+
+@admin.register(DepartmentStatistic)
+class DepartmentStatisticAdmin(admin.ModelAdmin):
+    """
+    Dashboard of the department statistics.
+
+    Replaces the change list with two rankings of the departments: across all events
+    and for one event. Each ranking is a single LIMIT query over the incrementally
+    maintained statistics, so the page does not slow down as the history grows.
+    """
+
+    # Departments per ranking and latest events offered for selection
+    dashboard_limit = 20
+
+    def has_add_permission(self, request):
+        """Statistics are maintained automatically."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Statistics are maintained automatically."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Statistics are maintained automatically."""
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        """Show the department rankings across all events and for the selected event."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        def ranking(statistics):
+            return list(
+                statistics.order_by("-registered_count", "-waitlist_count", "department")[
+                    : self.dashboard_limit
+                ]
+            )
+
+        events = list(
+            RunningEvent.objects.only("name", "date").order_by("-date", "-pk")[
+                : self.dashboard_limit
+            ]
+        )
+        event_id = request.GET.get("event", "")
+        if event_id.isdigit():
+            event = RunningEvent.objects.only("name", "date").filter(pk=event_id).first()
+        else:
+            event = events[0] if events else None
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": _("Department statistics"),
+            "totals": ranking(DepartmentStatistic.objects.filter(event=None)),
+            "events": events,
+            "event": event,
+            "event_statistics": ranking(event.department_statistics.all()) if event else [],
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, "admin/runs/departmentstatistic/dashboard.html", context)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the OutgoingEmail model.
+
+    Shows the outbox delivered by the send_emails command. Emails are written by the
+    application, so they can only be inspected, retried or deleted here.
+    """
+
+    list_display = ("recipient", "subject", "created_at", "attempts", "next_attempt_at", "sent_at")
+    list_filter = (("sent_at", admin.EmptyFieldListFilter),)
+    search_fields = ("=recipient",)
+    readonly_fields = ("participant",)
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        """Emails are queued by the application."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Emails are queued by the application."""
+        return False
+
+    @admin.action(description=_("Retry sending the selected emails now"))
+    def retry(self, request, queryset):
+        """Make unsent emails due again, including those that ran out of attempts."""
+        count = queryset.filter(sent_at__isnull=True).update(
+            attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(
+            request,
+            ngettext(
+                "%(count)d email will be sent by the next run of send_emails.",
+                "%(count)d emails will be sent by the next run of send_emails.",
+                count,
+            )
+            % {"count": count},
+            messages.SUCCESS,
+        )
@@ -8,3 +8,7 @@ class RunsConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "runs"
+
+    def ready(self):
+        """Connect the signal handlers of the runs application."""
+        from . import receivers  # noqa: F401
@@ -0,0 +1,204 @@
+"""Push of seat availability to the browsers watching an event."""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+from .cache import aget_event_version
+from .models import RunningEvent
+
+
+def availability_state(event: RunningEvent) -> dict:
+    """
+    Describe the seats of an event for the browsers watching it.
+
+    Returns:
+        dict: The available spots (None if there is no limit), the capacity, the
+            length of the waiting list and a version that grows with every change
+    """
+    return {
+        "version": int(event.updated_at.timestamp() * 1_000_000),
+        "available_spots": event.get_available_spots(),
+        "max_participants": event.max_participants,
+        "waitlist_count": event.waitlist_count,
+    }
+
+
+def format_server_sent_event(state: dict) -> str:
+    """Format an availability state as a server-sent event."""
+    return f"id: {state['version']}\ndata: {json.dumps(state, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """A browser connection waiting for availability changes of one event."""
+
+    def __init__(self, event_id: int):
+        """Initialize the subscription on the running event loop."""
+        self.event_id = event_id
+        self.loop = asyncio.get_running_loop()
+        self.state: Optional[dict] = None
+        self.changed = asyncio.Event()
+
+    def push(self, state: dict) -> None:
+        """Hand over a new state; only the latest one is kept for slow clients."""
+        self.state = state
+        self.changed.set()
+
+    async def wait(self, timeout: float) -> Optional[dict]:
+        """
+        Wait for the next change.
+
+        Returns:
+            dict or None: The new state, or None if nothing changed within ``timeout``
+        """
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.changed.clear()
+        return self.state
+
+
+class AvailabilityBroker:
+    """
+    Fan out availability changes to all subscribed connections of this process.
+
+    Changes made by this process (announced by the event_changed signal) are read
+    from the database once and pushed to all subscribers at once. Changes made by
+    other workers or management commands are picked up by a watcher thread, which
+    reads all watched events with one query every ``AVAILABILITY_CHECK_INTERVAL``
+    seconds while there are subscribers.
+    """
+
+    def __init__(self):
+        """Initialize the broker without subscribers."""
+        self._lock = threading.Lock()
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        # The newest version pushed or read per watched event; older states are dropped
+        self._versions: dict[int, int] = {}
+        self._watcher: Optional[threading.Thread] = None
+
+    def subscribe(self, event_id: int) -> Subscription:
+        """Start receiving the changes of an event. Must be called on an event loop."""
+        subscription = Subscription(event_id)
+        with self._lock:
+            self._subscriptions.setdefault(event_id, set()).add(subscription)
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(
+                    target=self._watch, name="availability-watcher", daemon=True
+                )
+                self._watcher.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop receiving changes and forget the version of events nobody watches."""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.event_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.event_id, None)
+                self._versions.pop(subscription.event_id, None)
+
+    async def aget_state(self, event_id: int) -> Optional[dict]:
+        """
+        Read the current state of an event from the database.
+
+        Returns:
+            dict or None: The state, or None if the event does not exist
+        """
+        event = await RunningEvent.objects.filter(pk=event_id).afirst()
+        if event is None:
+            return None
+        state = availability_state(event)
+        with self._lock:
+            if event_id in self._subscriptions:
+                self._versions[event_id] = max(self._versions.get(event_id, 0), state["version"])
+        return state
+
+    async def aget_cached_state(self, event_id: int) -> Optional[dict]:
+        """
+        Return the current state of an event from the cache, or read and cache it.
+
+        The state is cached under the event's version, so the browsers polling an
+        event cost one query per change instead of one per poll.
+
+        Returns:
+            dict or None: The state, or None if the event does not exist
+        """
+        key = f"runs:availability:{await aget_event_version(event_id)}:{event_id}"
+        state = await cache.aget(key)
+        if state is None:
+            state = await self.aget_state(event_id)
+            if state is not None:
+                await cache.aset(key, state, settings.PAGE_CACHE_TIMEOUT)
+        return state
+
+    def publish(self, event_id: int) -> None:
+        """Read the changed event once and push its state to all subscribers."""
+        with self._lock:
+            if event_id not in self._subscriptions:
+                return
+        event = RunningEvent.objects.filter(pk=event_id).first()
+        if event is not None:
+            self._push(event_id, availability_state(event))
+
+    def _push(self, event_id: int, state: dict) -> None:
+        """Push a state to the subscribers of an event unless they have a newer one."""
+        with self._lock:
+            if event_id not in self._subscriptions:
+                return
+            if self._versions.get(event_id, 0) >= state["version"]:
+                return
+            self._versions[event_id] = state["version"]
+            subscriptions = list(self._subscriptions[event_id])
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, state)
+            except RuntimeError:
+                # The connection's event loop is already closed
+                self.unsubscribe(subscription)
+
+    def _watch(self) -> None:
+        """Push changes made by other processes until nobody is subscribed any more."""
+        try:
+            while True:
+                time.sleep(settings.AVAILABILITY_CHECK_INTERVAL)
+                with self._lock:
+                    event_ids = list(self._subscriptions)
+                    if not event_ids:
+                        self._watcher = None
+                        return
+                try:
+                    events = list(RunningEvent.objects.filter(pk__in=event_ids))
+                except DatabaseError:
+                    continue  # Try again with the next check
+                for event in events:
+                    self._push(event.pk, availability_state(event))
+        finally:
+            connection.close()
+
+    async def stream(self, subscription: Subscription, state: dict):
+        """
+        Yield server-sent events for a subscription, starting with ``state``.
+
+        Comments keep idle connections open. The stream ends after
+        ``AVAILABILITY_STREAM_TIMEOUT`` seconds; browsers then reconnect on their own.
+        """
+        try:
+            yield f"retry: {settings.AVAILABILITY_KEEPALIVE * 1000}\n"
+            yield format_server_sent_event(state)
+            deadline = subscription.loop.time() + settings.AVAILABILITY_STREAM_TIMEOUT
+            while (remaining := deadline - subscription.loop.time()) > 0:
+                state = await subscription.wait(min(settings.AVAILABILITY_KEEPALIVE, remaining))
+                yield ": keepalive\n\n" if state is None else format_server_sent_event(state)
+        finally:
+            self.unsubscribe(subscription)
+
+
+availability_broker = AvailabilityBroker()
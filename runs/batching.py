@@ -0,0 +1,149 @@
+"""Group commit of concurrent registrations for the runs application."""
+
+import threading
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import translation
+
+from .models import Participant, RunningEvent
+
+
+class _Batch:
+    """Registrations for one event waiting to be committed together."""
+
+    def __init__(self):
+        """Initialize an empty, open batch."""
+        self.participants: list[Participant] = []
+        # The active language of each request, for its confirmation email
+        self.languages: list[str] = []
+        self.results: list[tuple[Participant, bool]] = []
+        self.error: Optional[BaseException] = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class RegistrationBatcher:
+    """
+    Collect concurrent registrations per event and commit them as one batch.
+
+    The first registration for an event opens a batch and waits for
+    ``REGISTRATION_BATCH_WINDOW`` seconds (or until ``REGISTRATION_BATCH_SIZE``
+    registrations have joined), then commits all of them in one transaction via
+    RunningEvent.register_batch(). The other requests block until that commit is done.
+
+    Registrations collected here come from the registration form, so each one
+    queues a confirmation email, written in the language of its own request.
+
+    Batches only span the request threads of a single process.
+    """
+
+    def __init__(self):
+        """Initialize the batcher without pending batches."""
+        self._lock = threading.Lock()
+        self._pending: dict[int, _Batch] = {}
+
+    def submit(self, event: RunningEvent, participant: Participant) -> tuple[Participant, bool]:
+        """
+        Register a participant as part of the next batch for the event.
+
+        Args:
+            event (RunningEvent): The event to register for
+            participant (Participant): The unsaved participant
+
+        Returns:
+            tuple: The saved participant and True, or the existing registration
+                and False for a duplicate submission
+        """
+        with self._lock:
+            batch = self._pending.get(event.pk)
+            leader = batch is None
+            if leader:
+                batch = self._pending[event.pk] = _Batch()
+            index = len(batch.participants)
+            batch.participants.append(participant)
+            batch.languages.append(translation.get_language())
+            if len(batch.participants) >= settings.REGISTRATION_BATCH_SIZE:
+                del self._pending[event.pk]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(settings.REGISTRATION_BATCH_WINDOW)
+            with self._lock:
+                if self._pending.get(event.pk) is batch:
+                    del self._pending[event.pk]
+            self._commit(event, batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    async def asubmit(
+        self, event: RunningEvent, participant: Participant
+    ) -> tuple[Participant, bool]:
+        """
+        Async version of submit().
+
+        Under ASGI every request runs its sync code in a thread of its own, so
+        concurrent requests still wait for the same batch.
+        """
+        return await sync_to_async(self.submit)(event, participant)
+
+    def _commit(self, event: RunningEvent, batch: _Batch) -> None:
+        """Save a closed batch and wake up the requests waiting on it."""
+        try:
+            first_by_key: dict[tuple, tuple[Participant, str]] = {}
+            for participant, language in zip(batch.participants, batch.languages):
+                first_by_key.setdefault(participant.registration_key, (participant, language))
+            registered = self._register(event, *zip(*first_by_key.values()))
+            batch.results = []
+            for participant in batch.participants:
+                first = registered[participant.registration_key]
+                batch.results.append((first, first is participant))
+        except BaseException as exc:
+            batch.error = exc
+            raise
+        finally:
+            batch.done.set()
+
+    @staticmethod
+    def _register(
+        event: RunningEvent, participants: tuple[Participant, ...], languages: tuple[str, ...]
+    ) -> dict[tuple, Participant]:
+        """
+        Save distinct participants, resolving registrations that already exist.
+
+        Args:
+            event (RunningEvent): The event to register for
+            participants (tuple): The unsaved participants, in arrival order
+            languages (tuple): The language of each participant's confirmation
+
+        Returns:
+            dict: The saved or already existing participant per registration key
+        """
+        try:
+            event.register_batch(list(participants), confirm=True, languages=list(languages))
+            return {p.registration_key: p for p in participants}
+        except IntegrityError:
+            pass
+
+        # Someone in the batch registered earlier: fall back to one transaction each
+        registered = {}
+        for participant, language in zip(participants, languages):
+            try:
+                with translation.override(language):
+                    event.register(participant, confirm=True)
+            except IntegrityError:
+                existing = participant.get_existing_registration()
+                if existing is None:
+                    raise
+                participant = existing
+            registered[participant.registration_key] = participant
+        return registered
+
+
+registration_batcher = RegistrationBatcher()
@@ -0,0 +1,228 @@
+"""Cache versioning, page caching and conditional GET support for the runs application."""
+
+import hashlib
+import time
+from datetime import datetime
+from functools import partial
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .models import RunningEvent
+
+PAGE_VERSION_KEY = "runs:page_version"
+
+# Rendered into cached pages instead of the per-visitor CSRF token
+CSRF_TOKEN_PLACEHOLDER = "__runs_csrf_token__"
+
+
+def get_page_version() -> int:
+    """
+    Return the current page cache version.
+
+    A missing version (first use or evicted) starts from the current time, so it can
+    never collide with the versions of pages cached before.
+    """
+    return cache.get_or_set(PAGE_VERSION_KEY, time.time_ns)
+
+
+async def aget_page_version() -> int:
+    """Async version of get_page_version()."""
+    return await cache.aget_or_set(PAGE_VERSION_KEY, time.time_ns)
+
+
+def bump_page_version() -> None:
+    """Invalidate all cached pages by moving to a new version."""
+    try:
+        cache.incr(PAGE_VERSION_KEY)
+    except ValueError:
+        cache.set(PAGE_VERSION_KEY, time.time_ns())
+
+
+def get_event_version(event_id: int) -> int:
+    """
+    Return the cache version of one event and its participants.
+
+    Like the page version, a missing version starts from the current time.
+    """
+    return cache.get_or_set(f"runs:event_version:{event_id}", time.time_ns)
+
+
+async def aget_event_version(event_id: int) -> int:
+    """Async version of get_event_version()."""
+    return await cache.aget_or_set(f"runs:event_version:{event_id}", time.time_ns)
+
+
+def bump_event_version(event_id: int) -> None:
+    """Invalidate everything cached for one event by moving it to a new version."""
+    key = f"runs:event_version:{event_id}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns())
+
+
+async def apage_cache_key(request) -> str:
+    """
+    Build the cache key of a page.
+
+    The key covers the version, the active language (as chosen by LocaleMiddleware),
+    today's date (registration closes at midnight) and the path. The cached pages
+    ignore the query string, so it is left out: otherwise every made-up query
+    string would render and store another copy.
+    """
+    path = hashlib.md5(request.path.encode(), usedforsecurity=False).hexdigest()
+    today = timezone.now().date().isoformat()
+    return f"runs:page:{await aget_page_version()}:{get_language()}:{today}:{path}"
+
+
+async def ahas_pending_messages(request) -> bool:
+    """Tell whether messages are waiting to be shown to the visitor."""
+    # Messages that did not fit into the cookie are read from the session
+    return bool(await sync_to_async(len)(get_messages(request)))
+
+
+class CachedPageMixin:
+    """
+    Serve GET requests of an async view from the versioned page cache.
+
+    Pages are validated with an ETag and a Last-Modified time first, so unchanged
+    pages are answered with 304 Not Modified without rendering. The page is rendered
+    with a placeholder instead of the CSRF token, so one cached copy can be shared
+    by all visitors; the placeholder is replaced with the visitor's own token on the
+    way out. Requests with pending messages bypass the cache and the validators,
+    since those are specific to one visitor.
+
+    Views implement ``aget_page()`` to render the page, as a template or any other
+    response such as JSON.
+    """
+
+    def get_context_data(self, **kwargs):
+        """Render a placeholder instead of the visitor's CSRF token on GET requests."""
+        context = super().get_context_data(**kwargs)
+        if self.request.method in ("GET", "HEAD"):
+            context["csrf_token"] = CSRF_TOKEN_PLACEHOLDER
+        return context
+
+    async def aget_page(self):
+        """
+        Render the page.
+
+        Returns:
+            HttpResponse: The page; a TemplateResponse is rendered after the view returns
+        """
+        raise NotImplementedError("subclasses of CachedPageMixin must provide aget_page()")
+
+    async def get(self, request, *args, **kwargs):
+        """Answer unchanged pages with 304 and serve the others from the page cache."""
+        if await ahas_pending_messages(request):
+            response = await self.aget_page()
+            return self._when_rendered(response, partial(self._insert_csrf_token, request))
+
+        etag, last_modified = await apage_validators(request, self.kwargs.get("pk"))
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await self._aget_cached_page(request)
+        if etag:
+            response.headers.setdefault("ETag", etag)
+        if last_modified and not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(last_modified)
+        return response
+
+    async def _aget_cached_page(self, request):
+        """Return the cached page or render and cache it."""
+        if not settings.PAGE_CACHE_TIMEOUT:
+            response = await self.aget_page()
+            return self._when_rendered(response, partial(self._insert_csrf_token, request))
+
+        key = await apage_cache_key(request)
+        page = await cache.aget(key)
+        if page is not None:
+            content, content_type = page
+            return self._insert_csrf_token(request, HttpResponse(content, content_type))
+
+        response = await self.aget_page()
+        return self._when_rendered(response, partial(self._store_page, request, key))
+
+    @staticmethod
+    def _when_rendered(response, callback):
+        """Pass the response to the callback once its content is rendered."""
+        if getattr(response, "is_rendered", True):
+            callback(response)
+        else:
+            response.add_post_render_callback(callback)
+        return response
+
+    def _store_page(self, request, key, response):
+        """Cache a freshly rendered page and personalise the response."""
+        # Post-render callbacks cannot be coroutines, hence the sync cache API
+        if response.status_code == 200:
+            page = (response.content, response["Content-Type"])
+            cache.set(key, page, settings.PAGE_CACHE_TIMEOUT)
+        self._insert_csrf_token(request, response)
+
+    @staticmethod
+    def _insert_csrf_token(request, response):
+        """Replace the CSRF token placeholder with the visitor's token."""
+        placeholder = CSRF_TOKEN_PLACEHOLDER.encode()
+        if placeholder in response.content:
+            token = get_token(request).encode()
+            response.content = response.content.replace(placeholder, token)
+        return response
+
+
+async def apage_state(pk=None) -> Optional[tuple[datetime, int]]:
+    """
+    Return the last change and the number of events shown on a page.
+
+    The result is computed with one query and cached under the page version, so
+    revalidating an unchanged page costs no query at all.
+
+    Args:
+        pk: The event of a detail page, or None for the event list
+
+    Returns:
+        tuple or None: The last change and the number of events, or None if the
+            page shows no event.
+    """
+    today = timezone.now().date().isoformat()
+    key = f"runs:page_state:{await aget_page_version()}:{today}:{pk}"
+    state = await cache.aget(key)
+    if state is None:
+        if pk is None:
+            events = RunningEvent.objects.registration_open()
+        else:
+            events = RunningEvent.objects.filter(pk=pk)
+        result = await events.aaggregate(last_modified=Max("updated_at"), count=Count("pk"))
+        state = (result["last_modified"], result["count"])
+        await cache.aset(key, state, settings.PAGE_CACHE_TIMEOUT)
+    return state if state[1] else None
+
+
+async def apage_validators(request, pk=None) -> tuple[Optional[str], Optional[int]]:
+    """
+    Compute the validators of the event list (no ``pk``) or an event detail page.
+
+    Returns:
+        tuple: The quoted ETag, which changes with the events, their participants,
+            the active language and the date, and the Last-Modified timestamp.
+            Both are None if the page shows no event.
+    """
+    state = await apage_state(pk)
+    if state is None:
+        return None, None
+    last_modified, count = state
+    today = timezone.now().date().isoformat()
+    validator = f"{get_language()}:{today}:{count}:{last_modified.isoformat()}"
+    etag = hashlib.md5(validator.encode(), usedforsecurity=False).hexdigest()
+    return f'"{etag}"', int(last_modified.timestamp())
@@ -4,7 +4,6 @@
 
 # Django imports
 from django import forms
-from django.core.exceptions import NON_FIELD_ERRORS
 from django.utils.translation import gettext_lazy as _
 
 # Local application imports
@@ -16,7 +15,8 @@ class ParticipantForm(forms.ModelForm):
     Form for participant registration.
 
     This form collects participant information for registration to a running event.
-    It validates that the participant is not already registered for the event.
+    Duplicate registrations are rejected by the database's unique constraint when
+    the participant is saved, see RunningEventDetailView.post.
     """
 
     class Meta:
@@ -61,35 +61,6 @@ class ParticipantForm(forms.ModelForm):
             raise forms.ValidationError(_("Year of birth must be between 1900 and 2023."))
         return year_of_birth
 
-    def clean(self):
-        """
-        Clean and validate the form data.
-
-        This method checks if the participant is already registered for the event
-        based on name, department, and year of birth.
-
-        Returns:
-            dict: The cleaned form data
-        """
-        cleaned_data = super().clean()
-        name = cleaned_data.get("name")
-        department = cleaned_data.get("department")
-        year_of_birth = cleaned_data.get("year_of_birth")
-
-        # Check if this person is already registered for this event
-        if name and department and year_of_birth and self.event:
-            try:
-                self.existing_participant = Participant.objects.get(
-                    event=self.event, name=name, department=department, year_of_birth=year_of_birth
-                )
-                # Instead of raising an error, we'll store the existing participant
-                # and handle it in the view
-                self.add_error(NON_FIELD_ERRORS, "already_registered")
-            except Participant.DoesNotExist:
-                pass
-
-        return cleaned_data
-
     def save(self, commit=True):
         """
         Save the form data to create a new participant.
@@ -0,0 +1,352 @@
+"""Management command to benchmark the pages of the runs application."""
+
+import json
+import platform
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.models import Participant, RunningEvent
+
+# The benchmark must not touch the site's cache or published pages: seeding and
+# registering would invalidate and unpublish them
+BENCH_SETTINGS = {
+    "CACHES": {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "runs-bench",
+        }
+    },
+    "PUBLISHED_PAGES_DIR": None,
+}
+
+
+def summarize(latencies: list[float], queries: list[int], errors: int) -> dict:
+    """
+    Summarize the requests of one scenario.
+
+    Args:
+        latencies (list): The latency of every request in seconds
+        queries (list): The number of database queries of every request
+        errors (int): The number of requests answered with an error status
+
+    Returns:
+        dict: The request count, latency percentiles in milliseconds and query counts
+    """
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": round(percentiles[49] * 1000, 2),
+        "p95_ms": round(percentiles[94] * 1000, 2),
+        "p99_ms": round(percentiles[98] * 1000, 2),
+        "min_queries": min(queries),
+        "max_queries": max(queries),
+    }
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare benchmark results with the results of an earlier run.
+
+    Query counts are deterministic, so any increase is a regression. Latencies
+    vary between runs and only count when they grew by more than ``tolerance``.
+
+    Args:
+        results (dict): The results of this run
+        baseline (dict): The results of the earlier run
+        tolerance (float): The accepted latency growth, e.g. 0.2 for 20%
+
+    Returns:
+        list: A description of every regression
+    """
+    regressions = []
+    for scenario, result in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if before is None:
+            continue
+        if result["max_queries"] > before["max_queries"]:
+            regressions.append(
+                f"{scenario}: {result['max_queries']} queries (was {before['max_queries']})"
+            )
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {result['p95_ms']} ms (was {before['p95_ms']} ms)")
+    return regressions
+
+
+class Command(BaseCommand):
+    """Measure latency and query counts of the public pages, registration and admin."""
+
+    help = (
+        "Seed a fresh test database with events and participants, then measure latency "
+        "percentiles and query counts of the event list, event detail, registration and "
+        "admin change lists, and of concurrent registrations for one capped event. "
+        "Results are written as JSON and can be compared with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument("--events", type=int, default=20, help="Events to seed")
+        parser.add_argument(
+            "--participants", type=int, default=200, help="Participants to seed per event"
+        )
+        parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+        parser.add_argument(
+            "--warmup", type=int, default=5, help="Unmeasured requests before each scenario"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Threads registering concurrently"
+        )
+        parser.add_argument(
+            "--registrations", type=int, default=200, help="Concurrent registrations"
+        )
+        parser.add_argument(
+            "--max-participants", type=int, default=100, help="Spots of the concurrent event"
+        )
+        parser.add_argument("--output", default="bench.json", help="File for the JSON results")
+        parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Accepted p95 latency growth over the earlier run (default 0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        """Run all scenarios against a freshly created and seeded test database."""
+        if options["requests"] < 2 or options["registrations"] < 2:
+            raise CommandError("Percentiles need at least 2 requests and 2 registrations.")
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)
+
+        with override_settings(**BENCH_SETTINGS):
+            results = self.run_benchmark(options)
+
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+        self.stdout.write(f"Results written to {options['output']}.")
+
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options["tolerance"])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(regression))
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} regressions compared to {options['compare']}."
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f"No regressions compared to {options['compare']}.")
+            )
+
+    def run_benchmark(self, options):
+        """
+        Seed a fresh test database and run all scenarios against it.
+
+        Returns:
+            dict: The results, with the environment and options they were measured with
+        """
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            cache.clear()
+            self.seed(options)
+            results = {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "cache": settings.CACHES["default"]["BACKEND"],
+                "options": {
+                    key: options[key]
+                    for key in (
+                        "events",
+                        "participants",
+                        "requests",
+                        "warmup",
+                        "concurrency",
+                        "registrations",
+                        "max_participants",
+                    )
+                },
+                "scenarios": self.run_scenarios(options),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        return results
+
+    def seed(self, options):
+        """Create the events and participants, keeping all counters and statistics right."""
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        self.events = [
+            RunningEvent.objects.create(
+                name=f"Bench Event {index}",
+                date=tomorrow + timedelta(days=index),
+                location="Bench",
+                description="Event created by the bench command.",
+            )
+            for index in range(options["events"])
+        ]
+        sizes = [size for size, label in Participant.TSHIRT_SIZES]
+        for event in self.events:
+            participants = [
+                Participant(
+                    name=f"Runner {index}",
+                    department=f"Department {index % 25}",
+                    year_of_birth=1960 + index % 45,
+                    tshirt_size=sizes[index % len(sizes)],
+                    email=f"runner{index}@example.com",
+                )
+                for index in range(options["participants"])
+            ]
+            for start in range(0, len(participants), 1000):
+                event.register_batch(participants[start : start + 1000])
+        self.capped_event = RunningEvent.objects.create(
+            name="Bench Rush",
+            date=tomorrow,
+            location="Bench",
+            description="Capped event for the concurrent registrations.",
+            max_participants=options["max_participants"],
+        )
+        self.user = User.objects.create_superuser("bench", "bench@example.com", "bench")
+
+    def run_scenarios(self, options):
+        """
+        Measure every scenario.
+
+        Returns:
+            dict: The summary of every scenario by name
+        """
+        client = Client()
+        admin_client = Client()
+        admin_client.force_login(self.user)
+        detail_url = reverse("event_detail", args=[self.events[0].pk])
+        registrations = iter(range(10**9))
+
+        def register(client, url, index):
+            return client.post(
+                url,
+                {
+                    "name": f"Bench Runner {index}",
+                    "department": "Bench",
+                    "year_of_birth": 1990,
+                    "tshirt_size": "M",
+                    "email": f"bench{index}@example.com",
+                },
+            )
+
+        scenarios = {
+            "event_list": lambda: client.get(reverse("event_list")),
+            "event_detail": lambda: client.get(detail_url),
+            "registration": lambda: register(client, detail_url, next(registrations)),
+            "admin_event_changelist": lambda: admin_client.get(
+                reverse("admin:runs_runningevent_changelist")
+            ),
+            "admin_participant_changelist": lambda: admin_client.get(
+                reverse("admin:runs_participant_changelist")
+            ),
+        }
+        results = {}
+        for name, send in scenarios.items():
+            for _ in range(options["warmup"]):
+                send()
+            latencies, queries, errors = [], [], 0
+            for _ in range(options["requests"]):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = send()
+                    latencies.append(time.perf_counter() - start)
+                queries.append(len(captured))
+                errors += response.status_code >= 400
+            results[name] = summarize(latencies, queries, errors)
+            self.report(name, results[name])
+
+        results["concurrent_registration"] = self.run_concurrent_registrations(register, options)
+        self.report("concurrent_registration", results["concurrent_registration"])
+        return results
+
+    def run_concurrent_registrations(self, register, options):
+        """
+        Register for the capped event from several threads at once.
+
+        Returns:
+            dict: The summary of the registrations, their throughput and whether
+                the event ended up with exactly its spots taken
+        """
+        url = reverse("event_detail", args=[self.capped_event.pk])
+        threads = options["concurrency"]
+        barrier = threading.Barrier(threads + 1)
+        lock = threading.Lock()
+        latencies, queries, errors = [], [], [0]
+
+        def worker(indexes):
+            client = Client()
+            barrier.wait()
+            try:
+                for index in indexes:
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        try:
+                            failed = register(client, url, index).status_code >= 400
+                        except Exception:
+                            failed = True
+                        elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(len(captured))
+                        errors[0] += failed
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=worker, args=(range(i, options["registrations"], threads),))
+            for i in range(threads)
+        ]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        self.capped_event.refresh_from_db()
+        result = summarize(latencies, queries, errors[0])
+        result["registrations_per_second"] = round(len(latencies) / elapsed, 1)
+        result["registered"] = self.capped_event.registered_count
+        result["waiting_list"] = self.capped_event.waitlist_count
+        result["capacity_respected"] = self.capped_event.registered_count == min(
+            options["max_participants"], len(latencies) - errors[0]
+        )
+        return result
+
+    def report(self, name, result):
+        """Print the summary of one scenario."""
+        self.stdout.write(
+            f"{name:<29} p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  "
+            f"p99 {result['p99_ms']:7.1f} ms  {result['min_queries']}-{result['max_queries']} "
+            f"queries  ({result['errors']} errors)"
+        )
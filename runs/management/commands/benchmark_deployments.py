@@ -0,0 +1,241 @@
+"""Management command to compare the WSGI and the ASGI deployment of the public pages."""
+
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.models import RunningEvent
+
+HOST = "localhost"
+
+
+class Command(BaseCommand):
+    """Compare requests per second and latency of the WSGI and the ASGI application."""
+
+    help = (
+        "Send the public pages and registrations from many concurrent slow clients "
+        "through the WSGI and the ASGI application (in process, without a server) and "
+        "compare requests per second and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument("--requests", type=int, default=400, help="Requests per scenario")
+        parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Worker threads of the WSGI deployment"
+        )
+        parser.add_argument(
+            "--client-delay",
+            type=float,
+            default=0.02,
+            help="Seconds a client takes to send its request",
+        )
+        parser.add_argument("--max-participants", type=int, default=100)
+
+    def handle(self, *args, **options):
+        """Run every scenario against both deployments using a temporary event."""
+        event = RunningEvent.objects.create(
+            name="Benchmark (deployments)",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Benchmark",
+            description="Temporary event created by benchmark_deployments.",
+            max_participants=options["max_participants"],
+        )
+        try:
+            # One CSRF cookie and token pair is valid for all registrations
+            client = Client(SERVER_NAME=HOST)
+            client.get(reverse("event_detail", args=[event.pk]))
+            csrf_token = client.cookies["csrftoken"].value
+
+            deployments = {
+                "wsgi": lambda requests: self.run_wsgi(requests, options),
+                "asgi": lambda requests: asyncio.run(self.run_asgi(requests, options)),
+            }
+            for label, run in deployments.items():
+                scenarios = {
+                    "event list": [("GET", reverse("event_list"), b"")],
+                    "event detail": [("GET", reverse("event_detail", args=[event.pk]), b"")],
+                    "registration": [
+                        (
+                            "POST",
+                            reverse("event_detail", args=[event.pk]),
+                            urlencode(
+                                {
+                                    "csrfmiddlewaretoken": csrf_token,
+                                    "name": f"Benchmark Runner {label} {index}",
+                                    "department": "Benchmark",
+                                    "year_of_birth": 1990,
+                                    "tshirt_size": "M",
+                                    "email": f"runner{index}@example.com",
+                                }
+                            ).encode(),
+                        )
+                        for index in range(options["requests"])
+                    ],
+                }
+                for scenario, requests in scenarios.items():
+                    requests = [
+                        requests[index % len(requests)] + (csrf_token,)
+                        for index in range(options["requests"])
+                    ]
+                    elapsed, latencies, errors = run(requests)
+                    self.report(label, scenario, elapsed, latencies, errors)
+        finally:
+            event.delete()
+
+    def report(self, label, scenario, elapsed, latencies, errors):
+        """Print the throughput and latency percentiles of one run."""
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{label} {scenario:<13} {len(latencies) / elapsed:7.0f} requests/s  "
+            f"p50 {percentiles[49] * 1000:7.1f} ms  p95 {percentiles[94] * 1000:7.1f} ms  "
+            f"p99 {percentiles[98] * 1000:7.1f} ms  ({errors} errors)"
+        )
+
+    def run_wsgi(self, requests, options):
+        """
+        Send the requests through the WSGI application served by a thread pool.
+
+        Each worker thread stays busy while its client is sending the request, as
+        with a threaded WSGI server.
+
+        Returns:
+            tuple: The wall clock time, the latency of every request and the number
+                of failed requests
+        """
+        application = WSGIHandler()
+        pending = list(reversed(requests))
+        lock = threading.Lock()
+        latencies, errors = [], [0]
+
+        def serve(method, path, body, csrf_token):
+            time.sleep(options["client_delay"])
+            environ = {
+                "REQUEST_METHOD": method,
+                "PATH_INFO": path,
+                "SCRIPT_NAME": "",
+                "QUERY_STRING": "",
+                "SERVER_NAME": HOST,
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "REMOTE_ADDR": "127.0.0.1",
+                "HTTP_HOST": HOST,
+                "HTTP_COOKIE": f"csrftoken={csrf_token}",
+                "CONTENT_TYPE": "application/x-www-form-urlencoded",
+                "CONTENT_LENGTH": str(len(body)),
+                "wsgi.input": BytesIO(body),
+                "wsgi.url_scheme": "http",
+                "wsgi.errors": self.stderr,
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            statuses = []
+            response = application(environ, lambda status, headers: statuses.append(status))
+            b"".join(response)
+            response.close()
+            return int(statuses[0].split()[0])
+
+        def client(pool):
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    request = pending.pop()
+                start = time.perf_counter()
+                status = pool.submit(serve, *request).result()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    errors[0] += status >= 400
+
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            clients = [
+                threading.Thread(target=client, args=(pool,)) for _ in range(options["concurrency"])
+            ]
+            start = time.perf_counter()
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        return elapsed, latencies, errors[0]
+
+    async def run_asgi(self, requests, options):
+        """
+        Send the requests through the ASGI application.
+
+        Slow clients only hold a coroutine waiting for the request body, as with an
+        ASGI server.
+
+        Returns:
+            tuple: The wall clock time, the latency of every request and the number
+                of failed requests
+        """
+        application = ASGIHandler()
+        pending = list(reversed(requests))
+        latencies, errors = [], 0
+
+        async def serve(method, path, body, csrf_token):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": method,
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [
+                    (b"host", HOST.encode()),
+                    (b"cookie", f"csrftoken={csrf_token}".encode()),
+                    (b"content-type", b"application/x-www-form-urlencoded"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": (HOST, 80),
+            }
+            received = False
+            statuses = []
+
+            async def receive():
+                nonlocal received
+                if received:
+                    # Nothing but a disconnect would follow the body
+                    await asyncio.Event().wait()
+                received = True
+                await asyncio.sleep(options["client_delay"])
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await application(scope, receive, send)
+            return statuses[0]
+
+        async def client():
+            nonlocal errors
+            while pending:
+                request = pending.pop()
+                start = time.perf_counter()
+                status = await serve(*request)
+                latencies.append(time.perf_counter() - start)
+                errors += status >= 400
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options["concurrency"])))
+        return time.perf_counter() - start, latencies, errors
@@ -0,0 +1,91 @@
+"""Management command to benchmark the registration write path."""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from runs.batching import registration_batcher
+from runs.models import Participant, RunningEvent
+
+
+class Command(BaseCommand):
+    """Compare registrations per second of the per-request and the batched path."""
+
+    help = (
+        "Fire concurrent registrations at a temporary event and compare registrations "
+        "per second of the per-request and the batched (group commit) path."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument("--registrations", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--max-participants", type=int, default=100)
+
+    def handle(self, *args, **options):
+        """Run both registration paths against their own temporary event."""
+        modes = {
+            "per-request": lambda event, participant: event.register(participant),
+            "batched": registration_batcher.submit,
+        }
+        for label, register in modes.items():
+            event = RunningEvent.objects.create(
+                name=f"Benchmark ({label})",
+                date=timezone.now().date() + timedelta(days=1),
+                location="Benchmark",
+                description="Temporary event created by benchmark_registrations.",
+                max_participants=options["max_participants"],
+            )
+            try:
+                elapsed = self.run_registrations(
+                    event, register, options["registrations"], options["threads"]
+                )
+                event.refresh_from_db()
+            finally:
+                event.delete()
+
+            self.stdout.write(
+                f"{label}: {options['registrations'] / elapsed:.0f} registrations/s "
+                f"({elapsed:.2f}s, {event.registered_count} registered, "
+                f"{event.waitlist_count} waiting)"
+            )
+
+    def run_registrations(self, event, register, registrations, threads):
+        """
+        Register participants from several threads at once.
+
+        Returns:
+            float: The wall clock time in seconds
+        """
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(indexes):
+            barrier.wait()
+            try:
+                for index in indexes:
+                    participant = Participant(
+                        name=f"Benchmark Runner {index}",
+                        department="Benchmark",
+                        year_of_birth=1990,
+                        tshirt_size="M",
+                        email=f"runner{index}@example.com",
+                    )
+                    register(event, participant)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=worker, args=(range(i, registrations, threads),))
+            for i in range(threads)
+        ]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - start
@@ -0,0 +1,257 @@
+"""Management command to generate synthetic events and participants."""
+
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from runs.cache import bump_page_version
+from runs.models import DepartmentStatistic, Participant, RunningEvent
+
+FIRST_NAMES = [
+    "Anna", "Ben", "Clara", "David", "Elena", "Felix", "Greta", "Hannes", "Ida", "Jonas",
+    "Katrin", "Lukas", "Marie", "Niklas", "Olga", "Paul", "Quirin", "Rosa", "Simon", "Tanja",
+    "Uwe", "Vera", "Wolfgang", "Xenia", "Yusuf", "Zoe", "Ahmet", "Birgit", "Carlos", "Dana",
+    "Emil", "Fatima", "Georg", "Helga", "Ivan", "Julia", "Karl", "Lea", "Mehmet", "Nina",
+]  # fmt: skip
+LAST_NAMES = [
+    "Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker",
+    "Schulz", "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Schröder", "Neumann",
+    "Schwarz", "Braun", "Zimmermann", "Krüger", "Hartmann", "Lange", "Werner", "Krause",
+    "Lehmann", "Köhler", "Herrmann", "Walter", "Kaiser", "Yilmaz", "Kaya", "Nowak",
+]  # fmt: skip
+# Departments with their relative size
+DEPARTMENTS = {
+    "Production / Assembly": 18,
+    "Production / Quality Assurance": 6,
+    "Logistics / Warehouse": 9,
+    "Logistics / Shipping": 4,
+    "Sales / Field Service": 8,
+    "Sales / Inside Sales": 5,
+    "Marketing / Communications": 4,
+    "IT / Software Development": 7,
+    "IT / Infrastructure": 3,
+    "Research & Development": 9,
+    "Finance / Accounting": 4,
+    "Finance / Controlling": 2,
+    "Human Resources": 3,
+    "Purchasing": 3,
+    "Customer Service": 6,
+    "Legal": 1,
+    "Facility Management": 2,
+    "Management": 1,
+}
+# Range of the generated years of birth
+FIRST_YEAR_OF_BIRTH, LAST_YEAR_OF_BIRTH = 1955, 2006
+# T-shirt sizes with their share of the registrations
+TSHIRT_SIZES = {"XS": 4, "S": 14, "M": 30, "L": 28, "XL": 13, "XXL": 5, "NO": 6}
+# Email addresses are kept ASCII
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+# Columns of the participant rows, in the order generate_participants() yields them
+PARTICIPANT_FIELDS = (
+    "event",
+    "name",
+    "department",
+    "year_of_birth",
+    "tshirt_size",
+    "email",
+    "on_waiting_list",
+    "registered_at",
+    "updated_at",
+)
+LOCATIONS = ["Stadtpark", "Werksgelände", "Rheinufer", "Olympiapark", "Hafen", "Altstadt"]
+
+
+def count_unique_registrations() -> int:
+    """
+    Count the distinct registrations the names, departments and years can form.
+
+    Registrations are unique per event, so no event can have more participants.
+
+    Returns:
+        int: The number of distinct (name, department, year of birth) combinations
+    """
+    years = LAST_YEAR_OF_BIRTH - FIRST_YEAR_OF_BIRTH + 1
+    return len(FIRST_NAMES) * len(LAST_NAMES) * len(DEPARTMENTS) * years
+
+
+class Command(BaseCommand):
+    """Fill the database with realistic events and participants for scale testing."""
+
+    help = (
+        "Generate past and upcoming running events with realistic departments, t-shirt "
+        "sizes and waiting lists. The same --seed always generates the same data. "
+        "Participants are inserted in large batches, bypassing the per-row signals; "
+        "counters and department statistics are computed in bulk."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument("--events", type=int, default=40, help="Events to generate")
+        parser.add_argument(
+            "--participants", type=int, default=100_000, help="Participants across all events"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator")
+        parser.add_argument(
+            "--batch-size", type=int, default=10_000, help="Participants per INSERT batch"
+        )
+        parser.add_argument(
+            "--upcoming",
+            type=int,
+            default=2,
+            help="Events of the generated ones that take place in the future",
+        )
+
+    def handle(self, *args, **options):
+        """Generate the events, then their participants, in one transaction."""
+        if options["events"] < 1 or options["participants"] < 0:
+            raise CommandError("Generate at least one event and no negative participants.")
+        rng = random.Random(options["seed"])
+        start = time.perf_counter()
+
+        if connection.vendor == "sqlite":
+            # The indexes of a million participants do not fit SQLite's default 2 MB
+            # page cache; with 256 MB the inserts no longer wait for the disk
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size = -262144")
+
+        with transaction.atomic():
+            events, demand = self.generate_events(rng, options)
+            created = 0
+            for event, participants in zip(events, demand):
+                for batch in self.generate_participants(rng, event, participants, options):
+                    self.insert_participants(batch)
+                    created += len(batch)
+            written = DepartmentStatistic.objects.rebuild()
+            transaction.on_commit(bump_page_version)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(events)} events and {created} participants "
+                f"({sum(event.waitlist_count for event in events)} on waiting lists) and "
+                f"{written} department statistics in {time.perf_counter() - start:.1f}s."
+            )
+        )
+
+    def generate_events(self, rng, options):
+        """
+        Create the events with their final counters.
+
+        Later events draw more participants, and most events are capped so that up
+        to a third of their participants end up on the waiting list.
+
+        Returns:
+            tuple: The saved events and the number of participants of each
+        """
+        count = options["events"]
+        weights = [rng.uniform(0.5, 1.5) * (1 + index / count) for index in range(count)]
+        demand = [int(options["participants"] * weight / sum(weights)) for weight in weights]
+        demand[-1] += options["participants"] - sum(demand)
+        if max(demand) > (unique := count_unique_registrations()):
+            raise CommandError(
+                f"An event cannot have more than {unique} distinct "
+                "participants; generate more events or fewer participants."
+            )
+
+        today = timezone.now().date()
+        first_upcoming = count - options["upcoming"]
+        events = []
+        for index, participants in enumerate(demand):
+            # Four events a year, the upcoming ones every few weeks from today
+            if index < first_upcoming:
+                date = today - timedelta(days=91 * (first_upcoming - index) + rng.randrange(14))
+            else:
+                date = today + timedelta(days=21 * (index - first_upcoming + 1))
+            capped = rng.random() < 0.8
+            max_participants = (
+                max(1, round(participants * rng.uniform(0.67, 1.05))) if capped else None
+            )
+            registered = min(participants, max_participants or participants)
+            events.append(
+                RunningEvent(
+                    name=f"Firmenlauf {date.year} #{index + 1}",
+                    date=date,
+                    location=rng.choice(LOCATIONS),
+                    description="Generated by generate_fake_data.",
+                    registration_deadline=date - timedelta(days=7),
+                    max_participants=max_participants,
+                    registered_count=registered,
+                    waitlist_count=participants - registered,
+                )
+            )
+        return RunningEvent.objects.bulk_create(events), demand
+
+    def generate_participants(self, rng, event, count, options):
+        """
+        Yield the participant rows of an event in batches, in registration order.
+
+        The first ``registered_count`` participants hold a spot and the rest are on
+        the waiting list, as if they had registered one after another. Random values
+        are drawn for the whole event at once, which is much faster than per row.
+        """
+        first_names = rng.choices(FIRST_NAMES, k=count)
+        last_names = rng.choices(LAST_NAMES, k=count)
+        department_names, department_weights = list(DEPARTMENTS), list(DEPARTMENTS.values())
+        departments = rng.choices(department_names, department_weights, k=count)
+        sizes = rng.choices(list(TSHIRT_SIZES), list(TSHIRT_SIZES.values()), k=count)
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        event_id, registered_count = event.pk, event.registered_count
+        emails = {
+            (first_name, last_name): f"{first_name}.{last_name}".lower().translate(UMLAUTS)
+            for first_name in FIRST_NAMES
+            for last_name in LAST_NAMES
+        }
+        seen = set()
+        batch = []
+        for index in range(count):
+            first_name, last_name = first_names[index], last_names[index]
+            department = departments[index]
+            year_of_birth = min(
+                LAST_YEAR_OF_BIRTH, max(FIRST_YEAR_OF_BIRTH, round(rng.gauss(1983, 11)))
+            )
+            while (key := (first_name, last_name, department, year_of_birth)) in seen:
+                # Registrations must be unique per event: draw another person. Every
+                # column is drawn again, so this ends as long as combinations are left,
+                # which generate_events() checked.
+                first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                department = rng.choices(department_names, department_weights)[0]
+                year_of_birth = rng.randint(FIRST_YEAR_OF_BIRTH, LAST_YEAR_OF_BIRTH)
+            seen.add(key)
+            batch.append(
+                (
+                    event_id,
+                    f"{first_name} {last_name}",
+                    department,
+                    year_of_birth,
+                    sizes[index],
+                    f"{emails[first_name, last_name]}.{index}@example.com",
+                    index >= registered_count,
+                    now,
+                    now,
+                )
+            )
+            if len(batch) == options["batch_size"]:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def insert_participants(rows):
+        """
+        Insert prepared participant rows with one executemany.
+
+        bulk_create() compiles every value of every row into SQL, which took several
+        minutes for a million participants; the prepared rows take seconds.
+        """
+        columns = ", ".join(
+            connection.ops.quote_name(Participant._meta.get_field(field).column)
+            for field in PARTICIPANT_FIELDS
+        )
+        placeholders = ", ".join(["%s"] * len(PARTICIPANT_FIELDS))
+        table = connection.ops.quote_name(Participant._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
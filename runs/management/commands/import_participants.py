@@ -0,0 +1,176 @@
+"""Management command to import participants from a CSV file."""
+
+import csv
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from runs.forms import ParticipantForm
+from runs.models import Participant, RunningEvent
+
+
+class Command(BaseCommand):
+    """Import participants registered through another channel into a running event."""
+
+    help = (
+        "Import participants from a CSV file with the columns name, department, "
+        "year_of_birth, tshirt_size and email. Rows are validated like the registration "
+        "form, and spots are assigned in file order."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument("event", help="Primary key or exact name of the running event")
+        parser.add_argument("csv_file", help="Path of the CSV file, with a header row")
+        parser.add_argument("--delimiter", default=",", help="Column delimiter (default ',')")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Participants inserted per transaction"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validate the file without importing it"
+        )
+
+    def handle(self, *args, **options):
+        """Validate all rows, then insert the valid ones in batches."""
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        event = self.get_event(options["event"])
+        participants, rejected = self.read_participants(event, options)
+
+        for line, reason in rejected:
+            self.stderr.write(f"Line {line}: {reason}")
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Dry run: {len(participants)} participants valid, {len(rejected)} rejected."
+            )
+            return
+
+        registered = imported = 0
+        rows = iter(participants)
+        while batch := list(islice(rows, options["batch_size"])):
+            saved, conflicts = self.register_batch(event, batch)
+            for line, reason in conflicts:
+                self.stderr.write(f"Line {line}: {reason}")
+            rejected += conflicts
+            imported += len(saved)
+            registered += sum(not p.on_waiting_list for p in saved)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} participants into {event} "
+                f"({registered} registered, {imported - registered} on the waiting "
+                f"list), {len(rejected)} rows rejected."
+            )
+        )
+
+    @staticmethod
+    def register_batch(event: RunningEvent, batch: list[tuple[int, Participant]]) -> tuple:
+        """
+        Register a batch, leaving out people who registered on the website meanwhile.
+
+        The rows were checked against the registrations that existed when the file was
+        read. If someone registers one of them before the batch is inserted, the
+        unique constraint rejects the whole batch; those rows are then left out and
+        the others inserted again.
+
+        Args:
+            event (RunningEvent): The event to register the participants for
+            batch (list): The line numbers and unsaved participants
+
+        Returns:
+            tuple: The registered participants, and a list of (line number, reason)
+                for the rows left out
+        """
+        conflicts: list[tuple[int, str]] = []
+        while batch:
+            try:
+                return (
+                    event.register_batch([participant for _line, participant in batch]),
+                    conflicts,
+                )
+            except IntegrityError:
+                existing = set(
+                    Participant.objects.filter(event=event).values_list(
+                        "name", "department", "year_of_birth"
+                    )
+                )
+                duplicates = [
+                    line for line, participant in batch if participant.registration_key in existing
+                ]
+                if not duplicates:
+                    raise
+                conflicts += [(line, "already registered") for line in duplicates]
+                batch = [
+                    (line, participant)
+                    for line, participant in batch
+                    if participant.registration_key not in existing
+                ]
+        return [], conflicts
+
+    def get_event(self, value: str) -> RunningEvent:
+        """Look up the event by primary key or name."""
+        events = RunningEvent.objects.filter(pk=value) if value.isdigit() else None
+        if not events:
+            events = RunningEvent.objects.filter(name=value)
+        if len(events) != 1:
+            raise CommandError(f"No unique running event found for '{value}'.")
+        return events[0]
+
+    def read_participants(self, event: RunningEvent, options) -> tuple[list, list]:
+        """
+        Read and validate the CSV file, which must be encoded as UTF-8.
+
+        Duplicates are detected against an in-memory set of the registrations that
+        already exist for the event (loaded with one query) and of the rows seen so far.
+
+        Returns:
+            tuple: The line numbers and valid unsaved participants in file order, and
+                a list of (line number, reason) for the rejected rows
+        """
+        seen = set(
+            Participant.objects.filter(event=event).values_list(
+                "name", "department", "year_of_birth"
+            )
+        )
+        participants: list[tuple[int, Participant]] = []
+        rejected: list[tuple[int, str]] = []
+
+        try:
+            # utf-8-sig skips the byte order mark spreadsheet applications write
+            with open(options["csv_file"], newline="", encoding="utf-8-sig") as csv_file:
+                reader = csv.DictReader(csv_file, delimiter=options["delimiter"])
+                missing = set(ParticipantForm.Meta.fields) - set(reader.fieldnames or [])
+                if missing:
+                    raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+
+                for row in reader:
+                    form = ParticipantForm(data=row, event=event)
+                    if not form.is_valid():
+                        errors = "; ".join(
+                            f"{field}: {' '.join(messages)}"
+                            for field, messages in form.errors.items()
+                        )
+                        rejected.append((reader.line_num, errors))
+                        continue
+
+                    participant = form.save(commit=False)
+                    if participant.registration_key in seen:
+                        rejected.append((reader.line_num, "already registered"))
+                        continue
+                    seen.add(participant.registration_key)
+                    participants.append((reader.line_num, participant))
+        except UnicodeDecodeError as exc:
+            raise CommandError(
+                f"Cannot read {options['csv_file']}: the file must be encoded as UTF-8 "
+                f"({exc.reason} at byte {exc.start})."
+            ) from exc
+        except csv.Error as exc:
+            raise CommandError(
+                f"Cannot parse {options['csv_file']}: {exc}. Expected a UTF-8 encoded CSV file."
+            ) from exc
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['csv_file']}: {exc}") from exc
+
+        return participants, rejected
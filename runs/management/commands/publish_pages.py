@@ -0,0 +1,48 @@
+"""Management command to publish the public pages as static files."""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from runs.publishing import get_publish_dir, publish_pages
+
+
+class Command(BaseCommand):
+    """Render the public pages into PUBLISHED_PAGES_DIR, once or as a long-running worker."""
+
+    help = (
+        "Render the event list and the detail pages of upcoming events for every "
+        "language into PUBLISHED_PAGES_DIR, for the web server to serve them without "
+        "Django. Changes to events and participants remove the affected pages; with "
+        "--loop they are published again after a few seconds."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and republish removed pages instead of exiting when done",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Seconds between checks with --loop"
+        )
+
+    def handle(self, *args, **options):
+        """Publish all pages, then with --loop the removed ones, and all again every day."""
+        if get_publish_dir() is None:
+            raise CommandError("Set PUBLISHED_PAGES_DIR to publish the pages.")
+        published_on = None
+        while True:
+            # Registration closes at midnight, so every page is renewed once a day
+            today = timezone.now().date()
+            published, removed = publish_pages(missing_only=today == published_on)
+            published_on = today
+            if published or removed or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Published {published} pages, removed {removed}.")
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
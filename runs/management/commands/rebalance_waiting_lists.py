@@ -0,0 +1,21 @@
+"""Management command to rebalance the waiting lists of running events."""
+
+from django.core.management.base import BaseCommand
+
+from runs.models import RunningEvent
+
+
+class Command(BaseCommand):
+    """Move participants between waiting lists and free spots for all running events."""
+
+    help = (
+        "Promote waiting participants into free spots and demote the latest "
+        "registrations of events whose capacity was reduced."
+    )
+
+    def handle(self, *args, **options):
+        """Rebalance each event in its own transaction."""
+        promoted, demoted = RunningEvent.objects.rebalance_waiting_lists()
+        self.stdout.write(
+            self.style.SUCCESS(f"Promoted {promoted} and demoted {demoted} participants.")
+        )
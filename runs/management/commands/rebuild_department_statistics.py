@@ -0,0 +1,16 @@
+"""Management command to rebuild the department statistics."""
+
+from django.core.management.base import BaseCommand
+
+from runs.models import DepartmentStatistic
+
+
+class Command(BaseCommand):
+    """Recompute the department statistics of all running events."""
+
+    help = "Recompute the department statistics of all running events from the participants."
+
+    def handle(self, *args, **options):
+        """Replace the statistics with the result of two GROUP BY queries."""
+        written = DepartmentStatistic.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} department statistics."))
@@ -0,0 +1,19 @@
+"""Management command to rebuild the participant counters of running events."""
+
+from django.core.management.base import BaseCommand
+
+from runs.models import RunningEvent
+from runs.signals import notify_event_changed
+
+
+class Command(BaseCommand):
+    """Recompute the registered and waiting list counters of all running events."""
+
+    help = "Recompute the registered and waiting list counters of all running events."
+
+    def handle(self, *args, **options):
+        """Rebuild the counters with a single set-based UPDATE."""
+        updated = RunningEvent.objects.rebuild_participant_counts()
+        for event_id in RunningEvent.objects.values_list("pk", flat=True):
+            notify_event_changed(RunningEvent, event_id)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt participant counts for {updated} events."))
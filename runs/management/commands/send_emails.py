@@ -0,0 +1,49 @@
+"""Management command to deliver the email outbox."""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from runs.outbox import send_batch
+
+
+class Command(BaseCommand):
+    """Send the queued emails in batches, once or as a long-running worker."""
+
+    help = (
+        "Deliver the due emails of the outbox in batches over one connection to the "
+        "mail server each. Failed emails are retried later with exponential backoff."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help="Emails sent per connection",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll for new emails instead of exiting when done",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Seconds between polls with --loop"
+        )
+
+    def handle(self, *args, **options):
+        """Send batches until the outbox has no due emails left."""
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_batch(options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+            if sent + failed < options["batch_size"]:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed."))
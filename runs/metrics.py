@@ -0,0 +1,324 @@
+"""Per-request performance metrics for the runs application."""
+
+import bisect
+import os
+import socket
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Upper bounds of the histogram buckets, in seconds and in queries
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Cache key of the set of processes that shared their histograms
+METRICS_PROCESSES_KEY = "runs:metrics:processes"
+
+
+@dataclass
+class RequestMetrics:
+    """Where the time of one request went."""
+
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    sql_time: float = 0.0
+    render_started: Optional[float] = None
+    render_time: float = 0.0
+    # Set to a list to record every SQL statement (without parameters) and its time
+    statements: Optional[list] = None
+
+    def rendered(self) -> None:
+        """Stop the render timer started before the template response is rendered."""
+        self.render_time += time.perf_counter() - self.render_started
+
+    def server_timing(self, total: float) -> str:
+        """
+        Format the metrics as a Server-Timing header value.
+
+        Args:
+            total (float): The time spent on the whole request, in seconds
+
+        Returns:
+            str: The ``db``, ``view``, ``render`` and ``total`` entries in milliseconds
+        """
+        view = total - self.render_time
+        return ", ".join(
+            [
+                f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+                f"view;dur={view * 1000:.1f}",
+                f"render;dur={self.render_time * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+
+# The metrics of the request being handled. Copied into the threads that
+# sync_to_async() starts, so queries of async views are counted as well.
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query's time to the current request."""
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.sql_time += duration
+        if metrics.statements is not None:
+            metrics.statements.append({"sql": sql, "duration_ms": round(duration * 1000, 3)})
+
+
+class Histogram:
+    """A cumulative histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: tuple):
+        """Initialize an empty histogram with the given bucket upper bounds."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Count a value in the first bucket it fits into."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def merge(self, counts: list, total: float) -> None:
+        """Add the bucket counts and the sum of another histogram with the same buckets."""
+        if len(counts) == len(self.counts):
+            self.counts = [own + other for own, other in zip(self.counts, counts)]
+            self.sum += total
+
+    def samples(self, name: str, labels: str):
+        """Yield the bucket, sum and count lines of the histogram."""
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Histograms of the request metrics per URL name.
+
+    Every process records its requests in memory, and a background thread
+    publishes a copy of its histograms to the cache every ``METRICS_FLUSH_INTERVAL``
+    seconds. The endpoint publishes the serving process's copy and adds up the
+    published copies of all processes, so whichever worker a scrape reaches, the
+    totals only grow. A process that has not published for a few intervals has
+    exited; the next scrape takes its copy over into the histograms of the
+    serving process, so the totals also keep growing across restarts.
+    """
+
+    METRICS = {
+        "firmenlauf_request_duration_seconds": (
+            "Time spent on the request",
+            DURATION_BUCKETS,
+        ),
+        "firmenlauf_request_view_duration_seconds": (
+            "Time spent in the view and middleware, including SQL",
+            DURATION_BUCKETS,
+        ),
+        "firmenlauf_request_render_duration_seconds": (
+            "Time spent rendering the template response",
+            DURATION_BUCKETS,
+        ),
+        "firmenlauf_request_sql_duration_seconds": (
+            "Time spent executing SQL queries",
+            DURATION_BUCKETS,
+        ),
+        "firmenlauf_request_sql_queries": (
+            "Number of SQL queries",
+            QUERY_BUCKETS,
+        ),
+    }
+
+    # Intervals without a publication after which a process counts as exited, and
+    # after which its copy expires from the cache if no scrape took it over
+    EXITED_AFTER_INTERVALS = 3
+    EXPIRE_AFTER_INTERVALS = 30
+
+    def __init__(self):
+        """Initialize the registry without observations."""
+        self._lock = threading.Lock()
+        # The requests of this process and of the exited ones it took over
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+        self._pid: Optional[int] = None
+        self._process = ""
+        self._published: Optional[dict] = None
+        self._publisher: Optional[threading.Thread] = None
+
+    def _process_key(self) -> str:
+        """
+        Return the cache key of this process's histograms. Call with the lock held.
+
+        Forked workers start with the histograms of their parent, which are not
+        theirs, and get a key of their own.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._histograms.clear()
+            self._new_process_key()
+        return self._process
+
+    def _new_process_key(self) -> None:
+        """Start publishing under a new cache key. Call with the lock held."""
+        self._process = f"runs:metrics:{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex}"
+        self._published = None
+
+    def _histogram(self, histograms: dict, name: str, view: str) -> Histogram:
+        """Return the histogram of a metric and view, adding an empty one if missing."""
+        histogram = histograms.get((name, view))
+        if histogram is None:
+            histogram = histograms[name, view] = Histogram(self.METRICS[name][1])
+        return histogram
+
+    def _merge(self, histograms: dict, snapshot: dict) -> None:
+        """Add published histograms to ``histograms``."""
+        for (name, view), (counts, total) in snapshot.items():
+            if name in self.METRICS:
+                self._histogram(histograms, name, view).merge(counts, total)
+
+    def observe(self, view: str, metrics: RequestMetrics, total: float) -> None:
+        """
+        Record a finished request.
+
+        Args:
+            view (str): The URL name of the request's view
+            metrics (RequestMetrics): The metrics collected while handling it
+            total (float): The time spent on the whole request, in seconds
+        """
+        values = zip(
+            self.METRICS,
+            (total, total - metrics.render_time, metrics.render_time, metrics.sql_time),
+        )
+        with self._lock:
+            self._process_key()
+            for name, value in (*values, ("firmenlauf_request_sql_queries", metrics.queries)):
+                self._histogram(self._histograms, name, view).observe(value)
+            if self._publisher is None or not self._publisher.is_alive():
+                self._publisher = threading.Thread(
+                    target=self._publish_periodically, name="metrics-publisher", daemon=True
+                )
+                self._publisher.start()
+
+    def _publish_periodically(self) -> None:
+        """Publish the histograms every interval, for as long as the process runs."""
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:  # noqa: B902 - a failing cache must not end the publications
+                continue
+
+    def flush(self) -> dict:
+        """
+        Publish the histograms of this process and of the exited ones it took over.
+
+        The cache I/O happens in the caller's thread: the background publisher, or
+        the metrics view. If a scrape took this process over while it was stalled,
+        its counts are already part of another process's histograms, so it starts
+        over under a new key.
+
+        Returns:
+            dict: The published histograms, as (bucket counts, sum) per metric and view
+        """
+        with self._lock:
+            process, published = self._process_key(), self._published
+        if published is not None and cache.get(f"{process}:taken_over"):
+            with self._lock:
+                if self._process == process:
+                    # Keep only the requests recorded since the taken over copy
+                    self._merge(
+                        self._histograms,
+                        {
+                            key: ([-count for count in counts], -total)
+                            for key, (counts, total) in published.items()
+                        },
+                    )
+                    self._new_process_key()
+                process = self._process
+        with self._lock:
+            snapshot = {key: (list(h.counts), h.sum) for key, h in self._histograms.items()}
+            self._published = snapshot
+        timeout = settings.METRICS_FLUSH_INTERVAL * self.EXPIRE_AFTER_INTERVALS
+        cache.set(process, {"published_at": time.time(), "histograms": snapshot}, timeout)
+        processes = cache.get(METRICS_PROCESSES_KEY, set())
+        if process not in processes:
+            # Processes registering at the same time may overwrite each other; the
+            # next publication registers the lost ones again
+            cache.set(METRICS_PROCESSES_KEY, processes | {process}, None)
+        return snapshot
+
+    def collect(self) -> dict[tuple[str, str], Histogram]:
+        """
+        Add up the published histograms of all processes.
+
+        Only published copies are added up, this process's one published right
+        now, so a later scrape never reports less than an earlier one. Exited
+        processes are taken over by this one, and expired ones forgotten.
+
+        Returns:
+            dict: The histograms by metric name and URL name
+        """
+        with self._lock:
+            process = self._process_key()
+        processes = cache.get(METRICS_PROCESSES_KEY, set())
+        snapshots = cache.get_many(processes - {process})
+        interval = settings.METRICS_FLUSH_INTERVAL
+        exited_before = time.time() - interval * self.EXITED_AFTER_INTERVALS
+        for key, snapshot in list(snapshots.items()):
+            if snapshot["published_at"] >= exited_before:
+                continue
+            # The marker claims the copy, so concurrent scrapes take it over only
+            # once, and tells a process that was merely stalled to start over
+            if cache.add(f"{key}:taken_over", True, interval * self.EXPIRE_AFTER_INTERVALS):
+                with self._lock:
+                    self._merge(self._histograms, snapshot["histograms"])
+                cache.delete(key)
+            del snapshots[key]
+        if processes - {process} != set(snapshots):
+            cache.set(METRICS_PROCESSES_KEY, set(snapshots) | {process}, None)
+
+        histograms: dict[tuple[str, str], Histogram] = {}
+        self._merge(histograms, self.flush())
+        for snapshot in snapshots.values():
+            self._merge(histograms, snapshot["histograms"])
+        return histograms
+
+    def render(self) -> str:
+        """
+        Return the histograms of all processes in the Prometheus text exposition format.
+
+        Returns:
+            str: The ``# HELP``, ``# TYPE`` and sample lines of every metric
+        """
+        histograms = sorted(self.collect().items())
+        lines = []
+        for name, (help_text, _buckets) in self.METRICS.items():
+            lines += [f"# HELP {name} {help_text}.", f"# TYPE {name} histogram"]
+            for (metric, view), histogram in histograms:
+                if metric == name:
+                    escaped = view.replace("\\", r"\\").replace('"', r"\"")
+                    lines += histogram.samples(name, f'view="{escaped}"')
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Forget all observations of this process."""
+        with self._lock:
+            self._histograms.clear()
+
+
+metrics_registry = MetricsRegistry()
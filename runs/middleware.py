@@ -0,0 +1,107 @@
+"""Middleware of the runs application."""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import ResolverMatch
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import RequestMetrics, current_request, metrics_registry
+from .views import StaticAssetView
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure SQL, view and render time of every request.
+
+    The times are aggregated per URL name into the histograms served at /metrics,
+    and sent to staff members (or everyone with ``SERVER_TIMING``) as a
+    Server-Timing header, visible in the network panel of the developer tools.
+    Put it first in MIDDLEWARE, so the other middleware is included in the view
+    time.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Initialize the middleware for a sync or an async handler."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Handle a request, measuring it."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        user = None if settings.SERVER_TIMING else getattr(request, "user", None)
+        return self.finish(request, response, metrics, user)
+
+    async def __acall__(self, request):
+        """Async version of __call__()."""
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        user = None
+        if not settings.SERVER_TIMING and hasattr(request, "auser"):
+            user = await request.auser()
+        return self.finish(request, response, metrics, user)
+
+    def process_template_response(self, request, response):
+        """Start the render timer; the response is rendered right after this hook."""
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda response: metrics.rendered())
+        return response
+
+    @staticmethod
+    def finish(request, response, metrics, user):
+        """
+        Record the request in the histograms and add the Server-Timing header.
+
+        The header reveals the number of queries and where the time went, so it is
+        only sent to staff members unless ``SERVER_TIMING`` is set.
+        """
+        total = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        metrics_registry.observe(match.view_name if match else "<unmatched>", metrics, total)
+        if settings.SERVER_TIMING or getattr(user, "is_staff", False):
+            response.headers["Server-Timing"] = metrics.server_timing(total)
+        return response
+
+
+class StaticAssetMiddleware(MiddlewareMixin):
+    """
+    Serve the files under ``STATIC_URL`` with StaticAssetView.
+
+    Static files need no session, language, CSRF or authentication, and the
+    middleware handling those adds headers such as ``Vary: Accept-Language`` that
+    would make caches store a copy per language. Put it right after
+    SecurityMiddleware, so the other middleware is skipped for static files.
+    """
+
+    def __init__(self, get_response):
+        """Initialize the middleware with the URL prefix of the static files."""
+        super().__init__(get_response)
+        self.prefix = f"/{settings.STATIC_URL.lstrip('/')}"
+        self.view = StaticAssetView.as_view()
+
+    def process_request(self, request):
+        """Answer requests for static files without calling the rest of the stack."""
+        if not request.path_info.startswith(self.prefix):
+            return None
+        path = request.path_info.removeprefix(self.prefix)
+        # Named like a URL pattern, for the request metrics
+        request.resolver_match = ResolverMatch(self.view, (), {"path": path}, url_name="static")
+        return self.view(request, path=path)
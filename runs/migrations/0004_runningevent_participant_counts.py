@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-17 20:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_participant_counts(apps, schema_editor):
+    """Initialise the counters from the existing participants."""
+    RunningEvent = apps.get_model("runs", "RunningEvent")
+    Participant = apps.get_model("runs", "Participant")
+
+    def count_participants(on_waiting_list):
+        counts = (
+            Participant.objects.filter(event=OuterRef("pk"), on_waiting_list=on_waiting_list)
+            .order_by()
+            .values("event")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    RunningEvent.objects.update(
+        registered_count=count_participants(False),
+        waitlist_count=count_participants(True),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0003_remove_runningevent_registration_open_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="participant",
+            options={"verbose_name": "participant", "verbose_name_plural": "participants"},
+        ),
+        migrations.AlterModelOptions(
+            name="runningevent",
+            options={"verbose_name": "running event", "verbose_name_plural": "running events"},
+        ),
+        migrations.AddField(
+            model_name="runningevent",
+            name="registered_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Number of participants holding a spot (maintained automatically).",
+            ),
+        ),
+        migrations.AddField(
+            model_name="runningevent",
+            name="waitlist_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Number of participants on the waiting list (maintained automatically).",
+            ),
+        ),
+        migrations.RunPython(populate_participant_counts, migrations.RunPython.noop),
+    ]
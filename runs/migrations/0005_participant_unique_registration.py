@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-17 20:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+REGISTRATION_FIELDS = ("event", "name", "department", "year_of_birth")
+
+
+def remove_duplicate_registrations(apps, schema_editor):
+    """
+    Keep the earliest of registrations the unique constraint would reject.
+
+    Databases filled before the constraint may hold a person twice for an event,
+    which would make adding the constraint fail. The later registrations are
+    deleted and the counters of their events recounted. Spots they held are not
+    handed to the waiting list; use the rebalance action of the event admin.
+    """
+    RunningEvent = apps.get_model("runs", "RunningEvent")
+    Participant = apps.get_model("runs", "Participant")
+
+    duplicated = (
+        Participant.objects.order_by()
+        .values(*REGISTRATION_FIELDS)
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+    )
+    duplicate_ids, event_ids = [], set()
+    for registration in duplicated:
+        del registration["count"]
+        ids = list(
+            Participant.objects.filter(**registration)
+            .order_by("registered_at", "pk")
+            .values_list("pk", flat=True)
+        )
+        duplicate_ids += ids[1:]
+        event_ids.add(registration["event"])
+    if not duplicate_ids:
+        return
+    for start in range(0, len(duplicate_ids), 500):
+        Participant.objects.filter(pk__in=duplicate_ids[start : start + 500]).delete()
+
+    def count_participants(on_waiting_list):
+        counts = (
+            Participant.objects.filter(event=OuterRef("pk"), on_waiting_list=on_waiting_list)
+            .order_by()
+            .values("event")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    RunningEvent.objects.filter(pk__in=event_ids).update(
+        registered_count=count_participants(False),
+        waitlist_count=count_participants(True),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0004_runningevent_participant_counts"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_registrations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="participant",
+            constraint=models.UniqueConstraint(
+                fields=("event", "name", "department", "year_of_birth"),
+                name="unique_participant_per_event",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-17 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0005_participant_unique_registration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="participant",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="runningevent",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, help_text="Last change of the event or its participants."
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0006_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="participant",
+            index=models.Index(fields=["department"], name="runs_participant_dept_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="participant",
+            index=models.Index(fields=["email"], name="runs_participant_email_idx"),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2 on 2026-10-17 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_department_statistics(apps, schema_editor):
+    """Initialise the statistics from the existing participants."""
+    DepartmentStatistic = apps.get_model("runs", "DepartmentStatistic")
+    Participant = apps.get_model("runs", "Participant")
+
+    counts = {
+        "registered_count": Count("pk", filter=Q(on_waiting_list=False)),
+        "waitlist_count": Count("pk", filter=Q(on_waiting_list=True)),
+    }
+    participants = Participant.objects.order_by()
+    rows = [
+        DepartmentStatistic(**row)
+        for row in participants.values("event_id", "department").annotate(**counts)
+    ]
+    rows += [
+        DepartmentStatistic(event_id=None, **row)
+        for row in participants.values("department").annotate(**counts)
+    ]
+    DepartmentStatistic.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0007_participant_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DepartmentStatistic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("department", models.CharField(max_length=100)),
+                ("registered_count", models.PositiveIntegerField(default=0)),
+                ("waitlist_count", models.PositiveIntegerField(default=0)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Empty for the totals across all events.",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="department_statistics",
+                        to="runs.runningevent",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "department statistic",
+                "verbose_name_plural": "department statistics",
+                "indexes": [
+                    models.Index(
+                        fields=["event", "-registered_count"], name="runs_deptstat_ranking_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("event", "department"), name="unique_department_statistic_per_event"
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("event__isnull", True)),
+                        fields=("department",),
+                        name="unique_department_statistic_total",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_department_statistics, migrations.RunPython.noop),
+    ]
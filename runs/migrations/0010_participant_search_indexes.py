@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 21:40
+
+from django.db import migrations
+
+# Case-insensitive indexes for the name prefix and email search of the admin. The
+# lookups compile differently per database, so each needs its own index: PostgreSQL
+# compares UPPER() values (LIKE prefixes need the pattern operator class), SQLite
+# uses LIKE, which only uses an index with the NOCASE collation. MySQL compares
+# case-insensitively by default, so its plain indexes serve the search already.
+SEARCH_INDEXES = {
+    "postgresql": [
+        "CREATE INDEX runs_participant_name_ci_idx "
+        'ON runs_participant (UPPER("name") text_pattern_ops)',
+        'CREATE INDEX runs_participant_email_ci_idx ON runs_participant (UPPER("email"))',
+    ],
+    "sqlite": [
+        'CREATE INDEX runs_participant_name_ci_idx ON runs_participant ("name" COLLATE NOCASE)',
+        'CREATE INDEX runs_participant_email_ci_idx ON runs_participant ("email" COLLATE NOCASE)',
+    ],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    """Create the case-insensitive search indexes of the database in use."""
+    for sql in SEARCH_INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    """Drop the case-insensitive search indexes."""
+    if schema_editor.connection.vendor in SEARCH_INDEXES:
+        for name in ("runs_participant_name_ci_idx", "runs_participant_email_ci_idx"):
+            schema_editor.execute(f"DROP INDEX {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("runs", "0009_outgoing_emails"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -2,11 +2,99 @@
 
 from typing import Optional
 
-from django.db import models
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce, Greatest
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
 from django.utils.translation import gettext_lazy as _
 from django_stubs_ext.db.models.manager import RelatedManager
 
+from .signals import notify_event_changed
+
+# Counters of RunningEvent, only ever changed with atomic UPDATEs
+COUNTER_FIELDS = ("registered_count", "waitlist_count")
+
+
+class RunningEventQuerySet(models.QuerySet):
+    """Custom queryset for the RunningEvent model."""
+
+    def registration_open(self) -> "RunningEventQuerySet":
+        """
+        Filter to events whose registration is open.
+
+        Mirrors RunningEvent.is_registration_open() in the database.
+
+        Returns:
+            RunningEventQuerySet: Events without a deadline or with a deadline not yet passed.
+        """
+        today = timezone.now().date()
+        return self.filter(
+            Q(registration_deadline__isnull=True) | Q(registration_deadline__gte=today)
+        )
+
+    def with_available_spots(self) -> "RunningEventQuerySet":
+        """
+        Annotate each event with its number of available spots.
+
+        Mirrors RunningEvent.get_available_spots(): events without a limit (no or a
+        zero maximum) get None. The limit is checked explicitly because GREATEST skips
+        NULL arguments on PostgreSQL instead of returning NULL.
+
+        Returns:
+            RunningEventQuerySet: Events annotated with ``available_spots``.
+        """
+        return self.annotate(
+            available_spots=Case(
+                When(Q(max_participants__isnull=True) | Q(max_participants=0), then=None),
+                default=Greatest(F("max_participants") - F("registered_count"), 0),
+                output_field=models.IntegerField(),
+            )
+        )
+
+    def rebalance_waiting_lists(self) -> tuple[int, int]:
+        """
+        Rebalance the waiting list of each event, see RunningEvent.rebalance_waiting_list().
+
+        Returns:
+            tuple: The total number of promoted and demoted participants
+        """
+        promoted = demoted = 0
+        for event in self.order_by("pk").iterator():
+            event_promoted, event_demoted = event.rebalance_waiting_list()
+            promoted += event_promoted
+            demoted += event_demoted
+        return promoted, demoted
+
+    def rebuild_participant_counts(self) -> int:
+        """
+        Recompute the registered and waiting list counters from the participants table.
+
+        The counters are normally maintained incrementally (see runs.signals); this is
+        the set-based recovery path, issuing a single UPDATE for all events in the queryset.
+
+        Returns:
+            int: The number of events updated.
+        """
+
+        def count_participants(on_waiting_list: bool) -> Coalesce:
+            counts = (
+                Participant.objects.filter(event=OuterRef("pk"), on_waiting_list=on_waiting_list)
+                .order_by()
+                .values("event")
+                .annotate(count=Count("pk"))
+                .values("count")
+            )
+            return Coalesce(Subquery(counts), 0)
+
+        return self.update(
+            registered_count=count_participants(False),
+            waitlist_count=count_participants(True),
+            updated_at=timezone.now(),
+        )
+
 
 class RunningEvent(models.Model):
     """
@@ -30,9 +118,25 @@ class RunningEvent(models.Model):
         blank=True,
         help_text=_("Maximum number of participants allowed. If not set, there is no limit."),
     )
+    registered_count: models.PositiveIntegerField = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=_("Number of participants holding a spot (maintained automatically)."),
+    )
+    waitlist_count: models.PositiveIntegerField = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=_("Number of participants on the waiting list (maintained automatically)."),
+    )
     created_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
+    updated_at: models.DateTimeField = models.DateTimeField(
+        auto_now=True,
+        help_text=_("Last change of the event or its participants."),
+    )
     participants: RelatedManager["Participant"]
 
+    objects = RunningEventQuerySet.as_manager()
+
     class Meta:
         """Meta options for the RunningEvent model."""
 
@@ -43,6 +147,23 @@ class RunningEvent(models.Model):
         """Return a string representation of the running event."""
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Save the event without overwriting its participant counters.
+
+        Registrations change the counters with atomic UPDATEs while the event may be
+        edited, so the loaded values can be outdated. Updates of existing events
+        therefore leave the counters out unless ``update_fields`` names them.
+        """
+        updating = not self._state.adding and not kwargs.get("force_insert")
+        if updating and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def is_registration_open(self) -> bool:
         """
         Check if registration is open based on the deadline.
@@ -66,8 +187,7 @@ class RunningEvent(models.Model):
         if not self.max_participants:
             return None  # No limit
 
-        registered_count = self.participants.filter(on_waiting_list=False).count()
-        return max(0, self.max_participants - registered_count)
+        return max(0, self.max_participants - self.registered_count)
 
     def has_available_spots(self) -> bool:
         """
@@ -81,6 +201,211 @@ class RunningEvent(models.Model):
             return True  # No limit
         return available_spots > 0
 
+    def register(self, participant: "Participant", confirm: bool = False) -> "Participant":
+        """
+        Save a new participant, assigning a spot or the waiting list atomically.
+
+        The spot is claimed with a conditional UPDATE of this event's counter before
+        the participant is inserted. The UPDATE takes the event's row lock (a write lock
+        on SQLite), so concurrent registrations queue up behind it and exactly
+        max_participants people get a spot; everyone else goes to the waiting list.
+
+        Args:
+            participant (Participant): The unsaved participant to register
+            confirm (bool): Whether to queue a confirmation email in the same transaction
+
+        Returns:
+            Participant: The saved participant
+
+        Raises:
+            IntegrityError: If the participant is already registered for this event
+        """
+        events = RunningEvent.objects.filter(pk=self.pk)
+        has_room = (
+            Q(max_participants__isnull=True)
+            | Q(max_participants=0)
+            | Q(registered_count__lt=F("max_participants"))
+        )
+        now = timezone.now()
+        with transaction.atomic():
+            seated = events.filter(has_room).update(
+                registered_count=F("registered_count") + 1, updated_at=now
+            )
+            if not seated:
+                events.update(waitlist_count=F("waitlist_count") + 1, updated_at=now)
+            participant.event = self
+            participant.on_waiting_list = not seated
+            # The counter is already claimed above, so bypass the post_save counter signal
+            Participant.objects.bulk_create([participant])
+            participant.mark_counted()
+            DepartmentStatistic.objects.adjust(
+                self.pk, participant.department, registered=seated, waiting_list=1 - seated
+            )
+            if confirm:
+                OutgoingEmail.objects.queue_confirmations([participant])
+            notify_event_changed(RunningEvent, self.pk)
+        return participant
+
+    async def aregister(self, participant: "Participant", confirm: bool = False) -> "Participant":
+        """
+        Async version of register().
+
+        The async ORM does not support transactions, so the registration runs in
+        the request's sync thread.
+        """
+        return await sync_to_async(self.register)(participant, confirm)
+
+    def register_batch(
+        self,
+        participants: list["Participant"],
+        confirm: bool = False,
+        languages: Optional[list[str]] = None,
+    ) -> list["Participant"]:
+        """
+        Save several new participants in one transaction.
+
+        Spots are assigned in list order, which is also the order of their
+        ``registered_at`` timestamps; the rest go to the waiting list.
+
+        Args:
+            participants (list): The unsaved participants, in arrival order
+            confirm (bool): Whether to queue confirmation emails in the same transaction
+            languages (list): The language of each participant's confirmation,
+                defaults to the active language
+
+        Returns:
+            list: The saved participants
+
+        Raises:
+            IntegrityError: If any participant is already registered for this event;
+                none of them are saved in that case
+        """
+        events = RunningEvent.objects.filter(pk=self.pk)
+        with transaction.atomic():
+            # Reserve waiting list places first: the write takes the event's lock,
+            # so the counters read next cannot change until we commit
+            events.update(
+                waitlist_count=F("waitlist_count") + len(participants), updated_at=timezone.now()
+            )
+            self.refresh_from_db(fields=["registered_count", "waitlist_count"])
+            available_spots = self.get_available_spots()
+            seats = len(participants) if available_spots is None else available_spots
+            seats = min(seats, len(participants))
+            if seats:
+                events.update(
+                    registered_count=F("registered_count") + seats,
+                    waitlist_count=F("waitlist_count") - seats,
+                )
+            for index, participant in enumerate(participants):
+                participant.event = self
+                participant.on_waiting_list = index >= seats
+            # The counters are already updated above, so bypass the post_save counter signal
+            Participant.objects.bulk_create(participants)
+            department_counts: dict[str, list[int]] = {}
+            for participant in participants:
+                participant.mark_counted()
+                counts = department_counts.setdefault(participant.department, [0, 0])
+                counts[participant.on_waiting_list] += 1
+            # In department order, so concurrent batches lock the statistics in the same
+            # order instead of deadlocking on PostgreSQL
+            for department, (registered, waiting_list) in sorted(department_counts.items()):
+                DepartmentStatistic.objects.adjust(self.pk, department, registered, waiting_list)
+            if confirm:
+                OutgoingEmail.objects.queue_confirmations(participants, languages)
+            notify_event_changed(RunningEvent, self.pk)
+            self.registered_count += seats
+            self.waitlist_count += len(participants) - seats
+        return participants
+
+    def needs_rebalancing(self) -> bool:
+        """
+        Check if participants should move between the waiting list and the spots.
+
+        Returns:
+            bool: True if waiting participants could take free spots, or if more
+                participants hold a spot than the event allows.
+        """
+        if not self.max_participants:
+            return self.waitlist_count > 0
+        if self.registered_count < self.max_participants:
+            return self.waitlist_count > 0
+        return self.registered_count > self.max_participants
+
+    def rebalance_waiting_list(self) -> tuple[int, int]:
+        """
+        Move participants between the waiting list and the available spots.
+
+        Promotes the longest waiting participants (by ``registered_at``) into free
+        spots or, if the capacity was reduced, moves the latest registrations back to
+        the waiting list. Each direction is a single set-based UPDATE, so events with
+        thousands of waiting participants are never loaded into Python.
+
+        Returns:
+            tuple: The number of promoted and the number of demoted participants
+        """
+        self.refresh_from_db(fields=["max_participants", "registered_count", "waitlist_count"])
+        if not self.needs_rebalancing():
+            return 0, 0
+
+        events = RunningEvent.objects.filter(pk=self.pk)
+        participants = Participant.objects.filter(event=self)
+        now = timezone.now()
+        promoted = demoted = 0
+        with transaction.atomic():
+            # Take the event's lock before reading the counters (see register())
+            events.update(updated_at=now)
+            self.refresh_from_db(
+                fields=["max_participants", "registered_count", "waitlist_count", "updated_at"]
+            )
+            waiting = participants.filter(on_waiting_list=True)
+            moving, promote = None, True
+            if not self.max_participants:
+                moving = waiting
+            elif self.registered_count < self.max_participants:
+                free_spots = self.max_participants - self.registered_count
+                first_waiting = waiting.order_by("registered_at", "pk").values("pk")[:free_spots]
+                moving = Participant.objects.filter(pk__in=first_waiting)
+            elif self.registered_count > self.max_participants:
+                excess = self.registered_count - self.max_participants
+                last_registered = (
+                    participants.filter(on_waiting_list=False)
+                    .order_by("-registered_at", "-pk")
+                    .values("pk")[:excess]
+                )
+                moving, promote = Participant.objects.filter(pk__in=last_registered), False
+
+            if moving is not None:
+                # In department order, like register_batch() locks the statistics
+                departments = list(
+                    moving.order_by("department").values("department").annotate(count=Count("pk"))
+                )
+                moved = moving.update(on_waiting_list=not promote, updated_at=now)
+                if promote:
+                    promoted = moved
+                else:
+                    demoted = moved
+                # Queryset updates bypass the counter signals, so adjust the statistics here
+                sign = 1 if promote else -1
+                for row in departments:
+                    DepartmentStatistic.objects.adjust(
+                        self.pk,
+                        row["department"],
+                        registered=sign * row["count"],
+                        waiting_list=-sign * row["count"],
+                    )
+
+            moved = promoted - demoted
+            if moved:
+                # Queryset updates bypass the counter signals, so adjust the counters here
+                events.update(
+                    registered_count=F("registered_count") + moved,
+                    waitlist_count=F("waitlist_count") - moved,
+                )
+                notify_event_changed(RunningEvent, self.pk)
+                self.registered_count += moved
+                self.waitlist_count -= moved
+        return promoted, demoted
+
 
 class Participant(models.Model):
     """
@@ -112,13 +437,292 @@ class Participant(models.Model):
         default=False, help_text=_("Indicates if the participant is on the waiting list")
     )
     registered_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
+    updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
 
     class Meta:
         """Meta options for the Participant model."""
 
         verbose_name = _("participant")
         verbose_name_plural = _("participants")
+        constraints = [
+            # Also serves as the index for duplicate lookups
+            models.UniqueConstraint(
+                fields=["event", "name", "department", "year_of_birth"],
+                name="unique_participant_per_event",
+            ),
+        ]
+        indexes = [
+            # Department filter and email search of the admin
+            models.Index(fields=["department"], name="runs_participant_dept_idx"),
+            models.Index(fields=["email"], name="runs_participant_email_idx"),
+        ]
 
     def __str__(self) -> str:
         """Return a string representation of the participant."""
         return f"{self.name} - {self.event.name}"
+
+    @property
+    def registration_key(self) -> tuple:
+        """Return the fields that identify a registration within an event."""
+        return (self.name, self.department, self.year_of_birth)
+
+    def get_existing_registration(self) -> Optional["Participant"]:
+        """
+        Look up the saved registration this participant duplicates.
+
+        Returns:
+            Participant or None: The earlier registration with the same event, name,
+                department and year of birth, if any.
+        """
+        return self._existing_registrations().first()
+
+    async def aget_existing_registration(self) -> Optional["Participant"]:
+        """Async version of get_existing_registration()."""
+        return await self._existing_registrations().afirst()
+
+    def _existing_registrations(self) -> models.QuerySet:
+        """Return the saved registrations with this participant's registration key."""
+        return Participant.objects.filter(
+            event_id=self.event_id,
+            name=self.name,
+            department=self.department,
+            year_of_birth=self.year_of_birth,
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Create an instance from database values and remember its counted state.
+
+        The counted state lets the counter signals detect moves between events
+        or on/off the waiting list without querying the old state.
+        """
+        instance = super().from_db(db, field_names, values)
+        if {"event_id", "on_waiting_list", "department"}.issubset(field_names):
+            instance.mark_counted()
+        return instance
+
+    def mark_counted(self) -> None:
+        """Record the event, waiting list state and department the participant is counted in."""
+        self._counted_state = (self.event_id, self.on_waiting_list, self.department)
+
+    def save(self, *args, **kwargs):
+        """Save the participant and update the event counters in one transaction."""
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+
+class DepartmentStatisticQuerySet(models.QuerySet):
+    """Custom queryset for the DepartmentStatistic model."""
+
+    def adjust(
+        self, event_id: int, department: str, registered: int = 0, waiting_list: int = 0
+    ) -> None:
+        """
+        Add to the counts of a department, for the event and across all events.
+
+        Missing rows are created when participants are added. Removals from rows that
+        no longer exist (because their event is being deleted) are ignored.
+
+        Args:
+            event_id (int): The primary key of the event
+            department (str): The department of the participants
+            registered (int): The change of participants holding a spot
+            waiting_list (int): The change of participants on the waiting list
+        """
+        for event in (event_id, None):
+            rows = self.filter(event_id=event, department=department)
+            changes = {
+                "registered_count": F("registered_count") + registered,
+                "waitlist_count": F("waitlist_count") + waiting_list,
+            }
+            if rows.update(**changes) or (registered <= 0 and waiting_list <= 0):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(
+                        event_id=event,
+                        department=department,
+                        registered_count=max(registered, 0),
+                        waitlist_count=max(waiting_list, 0),
+                    )
+            except IntegrityError:
+                # Created by a concurrent registration in the meantime
+                rows.update(**changes)
+
+    def rebuild(self) -> int:
+        """
+        Recompute all statistics from the participants table.
+
+        The statistics are normally maintained incrementally; this is the recovery
+        path, replacing all rows with the result of two GROUP BY queries.
+
+        Returns:
+            int: The number of statistic rows written.
+        """
+        counts = {
+            "registered_count": Count("pk", filter=Q(on_waiting_list=False)),
+            "waitlist_count": Count("pk", filter=Q(on_waiting_list=True)),
+        }
+        participants = Participant.objects.order_by()
+        rows = [
+            DepartmentStatistic(**row)
+            for row in participants.values("event_id", "department").annotate(**counts)
+        ]
+        rows += [
+            DepartmentStatistic(event_id=None, **row)
+            for row in participants.values("department").annotate(**counts)
+        ]
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+class DepartmentStatistic(models.Model):
+    """
+    Model holding the number of participants of a department.
+
+    There is one row per event and department, and one row per department without
+    an event holding the totals across all events. The counts are maintained
+    incrementally whenever participants are added, moved or removed.
+    """
+
+    event: models.ForeignKey = models.ForeignKey(
+        RunningEvent,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="department_statistics",
+        help_text=_("Empty for the totals across all events."),
+    )
+    department: models.CharField = models.CharField(max_length=100)
+    registered_count: models.PositiveIntegerField = models.PositiveIntegerField(default=0)
+    waitlist_count: models.PositiveIntegerField = models.PositiveIntegerField(default=0)
+
+    objects = DepartmentStatisticQuerySet.as_manager()
+
+    class Meta:
+        """Meta options for the DepartmentStatistic model."""
+
+        verbose_name = _("department statistic")
+        verbose_name_plural = _("department statistics")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "department"], name="unique_department_statistic_per_event"
+            ),
+            models.UniqueConstraint(
+                fields=["department"],
+                condition=Q(event__isnull=True),
+                name="unique_department_statistic_total",
+            ),
+        ]
+        indexes = [
+            # Departments ranked by runners, per event and across all events
+            models.Index(fields=["event", "-registered_count"], name="runs_deptstat_ranking_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """Return a string representation of the statistic."""
+        return f"{self.department} - {self.event_id or _('all events')}"
+
+
+class OutgoingEmailQuerySet(models.QuerySet):
+    """Custom queryset for the OutgoingEmail model."""
+
+    def due(self) -> "OutgoingEmailQuerySet":
+        """
+        Return the emails to deliver now, oldest first.
+
+        Returns:
+            OutgoingEmailQuerySet: Unsent emails whose next attempt is due and that
+                have attempts left
+        """
+        return self.filter(
+            sent_at__isnull=True,
+            next_attempt_at__lte=timezone.now(),
+            attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        ).order_by("next_attempt_at", "pk")
+
+    def queue_confirmations(
+        self, participants: list["Participant"], languages: Optional[list[str]] = None
+    ) -> list["OutgoingEmail"]:
+        """
+        Queue the registration confirmation of newly registered participants.
+
+        Call this inside the registration's transaction, so a confirmation is stored
+        if and only if the registration is. The emails are delivered later by the
+        send_emails command.
+
+        Args:
+            participants (list): The saved participants
+            languages (list): The language to write each participant's email in,
+                defaults to the active language
+
+        Returns:
+            list: The queued emails
+        """
+        if languages is None:
+            languages = [translation.get_language()] * len(participants)
+        emails = []
+        for participant, language in zip(participants, languages):
+            context = {"participant": participant, "event": participant.event}
+            with translation.override(language):
+                subject = render_to_string("runs/emails/registration_subject.txt", context)
+                body = render_to_string("runs/emails/registration_body.txt", context)
+            emails.append(
+                OutgoingEmail(
+                    participant=participant,
+                    recipient=participant.email,
+                    # Header values must not contain line breaks
+                    subject=" ".join(subject.split()),
+                    body=body,
+                )
+            )
+        return self.bulk_create(emails)
+
+
+class OutgoingEmail(models.Model):
+    """
+    Model for an email waiting in the outbox.
+
+    Emails are written in the same transaction as the change they report and
+    delivered in batches by the send_emails command, so requests never wait for
+    the mail server. Failed deliveries are retried with exponential backoff.
+    """
+
+    participant: models.ForeignKey = models.ForeignKey(
+        Participant,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="emails",
+    )
+    recipient: models.EmailField = models.EmailField()
+    subject: models.CharField = models.CharField(max_length=255)
+    body: models.TextField = models.TextField()
+    created_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
+    next_attempt_at: models.DateTimeField = models.DateTimeField(default=timezone.now)
+    attempts: models.PositiveSmallIntegerField = models.PositiveSmallIntegerField(default=0)
+    last_error: models.TextField = models.TextField(blank=True)
+    sent_at: models.DateTimeField = models.DateTimeField(null=True, blank=True)
+
+    objects = OutgoingEmailQuerySet.as_manager()
+
+    class Meta:
+        """Meta options for the OutgoingEmail model."""
+
+        verbose_name = _("outgoing email")
+        verbose_name_plural = _("outgoing emails")
+        indexes = [
+            # The worker's lookup of due emails; sent emails are left out of the index
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=Q(sent_at__isnull=True),
+                name="runs_email_due_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Return a string representation of the email."""
+        return f"{self.recipient} - {self.subject}"
@@ -0,0 +1,94 @@
+"""Delivery of the email outbox for the runs application."""
+
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Return how long to wait before the next delivery attempt.
+
+    Args:
+        attempts (int): The number of failed attempts so far
+
+    Returns:
+        timedelta: ``EMAIL_OUTBOX_RETRY_DELAY`` seconds, doubled for every further attempt
+    """
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size: int) -> list[OutgoingEmail]:
+    """
+    Reserve the next due emails for this worker.
+
+    The claimed emails are postponed by ``EMAIL_OUTBOX_LEASE`` seconds, so other
+    workers skip them while they are being sent, and a crashed worker's emails
+    become due again afterwards.
+
+    Returns:
+        list: The claimed emails, oldest first
+    """
+    with transaction.atomic():
+        emails = list(OutgoingEmail.objects.due().select_for_update(skip_locked=True)[:batch_size])
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        )
+    return emails
+
+
+def send_batch(batch_size: Optional[int] = None) -> tuple[int, int]:
+    """
+    Deliver one batch of due emails over a single connection to the mail server.
+
+    Emails that fail are retried later with exponential backoff, until
+    ``EMAIL_OUTBOX_MAX_ATTEMPTS`` attempts were made.
+
+    Args:
+        batch_size (int): The maximum number of emails to send, by default
+            ``EMAIL_OUTBOX_BATCH_SIZE``
+
+    Returns:
+        tuple: The number of sent and of failed emails
+    """
+    emails = claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, to=[email.recipient], connection=connection
+            )
+            try:
+                # Reconnects if a previous failure closed the connection
+                connection.open()
+                message.send()
+            except Exception as exc:
+                failed.append((email, exc))
+                connection.close()
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    OutgoingEmail.objects.filter(pk__in=sent).update(
+        sent_at=now, attempts=F("attempts") + 1, last_error=""
+    )
+    for email, exc in failed:
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            attempts=email.attempts + 1,
+            next_attempt_at=now + retry_delay(email.attempts + 1),
+            last_error=f"{type(exc).__name__}: {exc}",
+        )
+    return len(sent), len(failed)
@@ -0,0 +1,223 @@
+"""Profiling of single requests for the runs application."""
+
+import cProfile
+import io
+import json
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import RequestMetrics, current_request
+
+# Profile names are generated from the time and a random suffix; anything else
+# must not be used to build a file path
+PROFILE_NAME = re.compile(r"\d{8}T\d{6}-[0-9a-f]{8}")
+
+
+def get_profile_dir() -> Path:
+    """Return the directory the profiles are stored in."""
+    return Path(settings.PROFILING_DIR)
+
+
+@dataclass
+class RequestProfile:
+    """The call statistics and SQL statements of a profiled request."""
+
+    profiler: cProfile.Profile
+    metrics: RequestMetrics
+    duration: float = 0.0
+
+
+@contextmanager
+def profile_request():
+    """
+    Profile the code run in the block and record the SQL statements it executes.
+
+    Yields:
+        RequestProfile: The profile, complete once the block is left
+    """
+    metrics = current_request.get()
+    token = None
+    if metrics is None:
+        # The RequestMetricsMiddleware is not installed
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+    metrics.statements = []
+    profile = RequestProfile(cProfile.Profile(), metrics)
+    started = time.perf_counter()
+    profile.profiler.enable()
+    try:
+        yield profile
+    finally:
+        profile.profiler.disable()
+        profile.duration = time.perf_counter() - started
+        if token is not None:
+            current_request.reset(token)
+
+
+def save_profile(request, response, profile: RequestProfile, trigger: str) -> str:
+    """
+    Store the profile of a request with its SQL statements.
+
+    Writes the call statistics as ``<name>.prof`` (readable with pstats or
+    snakeviz) and the request details as ``<name>.json``, then removes the oldest
+    profiles beyond ``PROFILING_KEEP``.
+
+    Returns:
+        str: The name of the profile
+    """
+    directory = get_profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    now = timezone.now()
+    name = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    profile.profiler.dump_stats(directory / f"{name}.prof")
+    statements = profile.metrics.statements
+    match = request.resolver_match
+    details = {
+        "name": name,
+        "created_at": now.isoformat(),
+        "trigger": trigger,
+        "method": request.method,
+        "path": request.path,
+        "view": match.view_name if match else None,
+        "status": response.status_code,
+        "duration_ms": round(profile.duration * 1000, 1),
+        "queries": len(statements),
+        "sql_time_ms": round(sum(statement["duration_ms"] for statement in statements), 1),
+        "statements": statements,
+    }
+    (directory / f"{name}.json").write_text(json.dumps(details, indent=1), encoding="utf-8")
+
+    for old in sorted(directory.glob("*.json"), reverse=True)[settings.PROFILING_KEEP :]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".prof").unlink(missing_ok=True)
+    return name
+
+
+def list_profiles() -> list[dict]:
+    """
+    Return the stored profiles, newest first.
+
+    Returns:
+        list: The details of each profile, without its SQL statements
+    """
+    profiles = []
+    for path in sorted(get_profile_dir().glob("*.json"), reverse=True):
+        try:
+            details = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue  # Removed or still being written
+        details.pop("statements", None)
+        profiles.append(details)
+    return profiles
+
+
+def get_profile_path(name: str) -> Optional[Path]:
+    """Return the path of a profile's call statistics, or None if there is no such profile."""
+    if not PROFILE_NAME.fullmatch(name):
+        return None
+    path = get_profile_dir() / f"{name}.prof"
+    return path if path.exists() else None
+
+
+def load_profile(name: str, limit: int = 40) -> Optional[dict]:
+    """
+    Load a stored profile.
+
+    Args:
+        name (str): The name of the profile
+        limit (int): The number of functions to include in the statistics
+
+    Returns:
+        dict or None: The request details, its SQL statements and the functions
+            with the highest cumulative time as text, or None if there is no such profile
+    """
+    path = get_profile_path(name)
+    if path is None:
+        return None
+    details = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+    stream = io.StringIO()
+    pstats.Stats(str(path), stream=stream).sort_stats("cumulative").print_stats(limit)
+    details["stats"] = stream.getvalue()
+    return details
+
+
+class ProfilingMiddleware:
+    """
+    Run selected requests under cProfile and store the result.
+
+    Staff members request a profile with the ``X-Profile: 1`` header or the
+    ``_profile=1`` query parameter. Additionally, a ``PROFILING_SAMPLE_RATE``
+    share of all requests is profiled. Only one request per process is profiled
+    at a time, so the overhead stays bounded. Must come after the
+    AuthenticationMiddleware.
+
+    Under ASGI the profiler only sees the event loop thread: time spent in
+    sync_to_async() threads shows up as waiting, and other requests served
+    concurrently on the loop show up as well. The SQL statements are complete.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Initialize the middleware for a sync or an async handler."""
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def is_requested(request) -> bool:
+        """Check whether the request asks to be profiled (only honoured for staff)."""
+        return "1" in (request.GET.get("_profile"), request.headers.get("X-Profile"))
+
+    @staticmethod
+    def is_sampled() -> bool:
+        """Pick a ``PROFILING_SAMPLE_RATE`` share of the requests."""
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        """Handle a request, profiling it if requested or sampled."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.is_requested(request) and request.user.is_staff:
+            trigger = "requested"
+        else:
+            trigger = "sampled" if self.is_sampled() else None
+        if trigger is None or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            with profile_request() as profile:
+                response = self.get_response(request)
+            save_profile(request, response, profile, trigger)
+        finally:
+            self.lock.release()
+        return response
+
+    async def __acall__(self, request):
+        """Async version of __call__()."""
+        if self.is_requested(request) and (await request.auser()).is_staff:
+            trigger = "requested"
+        else:
+            trigger = "sampled" if self.is_sampled() else None
+        if trigger is None or not self.lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            with profile_request() as profile:
+                response = await self.get_response(request)
+            save_profile(request, response, profile, trigger)
+        finally:
+            self.lock.release()
+        return response
@@ -0,0 +1,145 @@
+"""Static publication of the public pages of the runs application."""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Max
+from django.http import HttpRequest
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from .cache import CSRF_TOKEN_PLACEHOLDER
+from .models import RunningEvent
+from .views import RunningEventDetailView, RunningEventListView
+
+
+def get_publish_dir() -> Optional[Path]:
+    """Return the directory the pages are published to, or None if publishing is disabled."""
+    directory = settings.PUBLISHED_PAGES_DIR
+    return Path(directory) if directory else None
+
+
+def get_page_url(pk: Optional[int] = None) -> str:
+    """Return the URL of the event list (no ``pk``) or an event detail page."""
+    return reverse("event_list") if pk is None else reverse("event_detail", args=[pk])
+
+
+def get_page_path(language: str, pk: Optional[int] = None) -> Path:
+    """
+    Return the file a page is published to.
+
+    Pages are stored under their URL per language, e.g. ``de/event/3/index.html``,
+    so the web server can map a request to its file without knowing the views.
+    """
+    return get_publish_dir() / language / get_page_url(pk).strip("/") / "index.html"
+
+
+def get_page_state(pk: Optional[int] = None) -> tuple:
+    """
+    Return the last change and the number of events shown on a page.
+
+    Unlike apage_state(), the state is always read from the database: it tells
+    whether the page changed while it was being published.
+    """
+    if pk is None:
+        events = RunningEvent.objects.registration_open()
+    else:
+        events = RunningEvent.objects.filter(pk=pk)
+    result = events.aggregate(last_modified=Max("updated_at"), count=Count("pk"))
+    return result["last_modified"], result["count"]
+
+
+def render_page(language: str, pk: Optional[int] = None) -> bytes:
+    """
+    Render a page as an anonymous visitor without messages would see it.
+
+    The CSRF token is left empty: the registration form fetches one when it is
+    submitted from a published page.
+
+    Returns:
+        bytes: The HTML of the page
+    """
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = get_page_url(pk)
+    request.user = AnonymousUser()
+    with translation.override(language):
+        if pk is None:
+            view = RunningEventListView()
+            view.setup(request)
+        else:
+            view = RunningEventDetailView()
+            view.setup(request, pk=pk)
+        response = async_to_sync(view.aget_page)()
+        response.render()
+    return response.content.replace(CSRF_TOKEN_PLACEHOLDER.encode(), b"")
+
+
+def publish_page(language: str, pk: Optional[int] = None) -> bool:
+    """
+    Render a page and publish it atomically.
+
+    If the events shown on the page changed while it was rendered, the page is
+    removed again, so the web server falls back to Django instead of serving it.
+
+    Returns:
+        bool: Whether the page was published
+    """
+    path = get_page_path(language, pk)
+    state = get_page_state(pk)
+    content = render_page(language, pk)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+    if get_page_state(pk) != state:
+        path.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def get_published_events() -> list[int]:
+    """Return the events whose detail pages are published: those not yet taken place."""
+    today = timezone.now().date()
+    return list(RunningEvent.objects.filter(date__gte=today).values_list("pk", flat=True))
+
+
+def publish_pages(missing_only: bool = False) -> tuple[int, int]:
+    """
+    Publish the event list and the detail pages of upcoming events in every language.
+
+    Pages of events that are no longer published are removed.
+
+    Args:
+        missing_only (bool): Only publish pages without a file, e.g. removed after a change
+
+    Returns:
+        tuple: The number of pages published and of pages removed
+    """
+    published = removed = 0
+    pages = [None, *get_published_events()]
+    for language, _name in settings.LANGUAGES:
+        expected = set()
+        for pk in pages:
+            path = get_page_path(language, pk)
+            expected.add(path)
+            if not (missing_only and path.exists()):
+                published += publish_page(language, pk)
+        for path in (get_publish_dir() / language).rglob("index.html"):
+            if path not in expected:
+                path.unlink()
+                removed += 1
+    return published, removed
+
+
+def unpublish_event(event_id: int) -> None:
+    """Remove the published pages showing an event, so Django serves them until republished."""
+    if get_publish_dir() is None:
+        return
+    for language, _name in settings.LANGUAGES:
+        get_page_path(language).unlink(missing_ok=True)
+        get_page_path(language, event_id).unlink(missing_ok=True)
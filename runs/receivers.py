@@ -0,0 +1,122 @@
+"""Signal handlers for the runs application."""
+
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .availability import availability_broker
+from .cache import bump_event_version, bump_page_version
+from .metrics import record_query
+from .models import DepartmentStatistic, Participant, RunningEvent
+from .publishing import unpublish_event
+from .signals import event_changed, notify_event_changed
+
+
+def _counter_field(on_waiting_list: bool) -> str:
+    """Return the name of the RunningEvent counter a participant is counted in."""
+    return "waitlist_count" if on_waiting_list else "registered_count"
+
+
+def adjust_participant_count(event_id: int, on_waiting_list: bool, delta: int) -> None:
+    """
+    Atomically add ``delta`` to the matching counter of an event and mark it as updated.
+
+    Args:
+        event_id (int): The primary key of the event
+        on_waiting_list (bool): Whether the waiting list counter should be adjusted
+        delta (int): The amount to add (negative to subtract)
+    """
+    field = _counter_field(on_waiting_list)
+    RunningEvent.objects.filter(pk=event_id).update(
+        **{field: F(field) + delta}, updated_at=timezone.now()
+    )
+
+
+def adjust_department_count(
+    event_id: int, on_waiting_list: bool, department: str, delta: int
+) -> None:
+    """
+    Add ``delta`` to the matching department statistics of an event and of all events.
+
+    Args:
+        event_id (int): The primary key of the event
+        on_waiting_list (bool): Whether the waiting list count should be adjusted
+        department (str): The department of the participant
+        delta (int): The amount to add (negative to subtract)
+    """
+    field = "waiting_list" if on_waiting_list else "registered"
+    DepartmentStatistic.objects.adjust(event_id, department, **{field: delta})
+
+
+@receiver(post_save, sender=Participant)
+def update_counts_on_save(sender, instance, created, raw, **kwargs):
+    """Count a new participant, or move an existing one between counters and statistics."""
+    if raw:
+        return
+
+    notify_event_changed(sender, instance.event_id)
+    new_state = (instance.event_id, instance.on_waiting_list, instance.department)
+    if created:
+        adjust_participant_count(instance.event_id, instance.on_waiting_list, 1)
+        adjust_department_count(*new_state, 1)
+    else:
+        old_state = getattr(instance, "_counted_state", None)
+        if old_state is None:
+            return
+        # The rows are locked in a fixed order (by event, and by department for the
+        # statistics), so saves moving participants in opposite directions cannot deadlock
+        if old_state[:2] != new_state[:2]:
+            for state, delta in sorted([(old_state[:2], -1), (new_state[:2], 1)]):
+                adjust_participant_count(*state, delta)
+            if old_state[0] != new_state[0]:
+                notify_event_changed(sender, old_state[0])
+        if old_state != new_state:
+            changes = [(old_state, -1), (new_state, 1)]
+            for state, delta in sorted(changes, key=lambda change: (change[0][2], change[0][0])):
+                adjust_department_count(*state, delta)
+
+    instance.mark_counted()
+
+
+@receiver(post_delete, sender=Participant)
+def update_counts_on_delete(sender, instance, **kwargs):
+    """Remove a deleted participant from its event's counter and department statistics."""
+    adjust_participant_count(instance.event_id, instance.on_waiting_list, -1)
+    adjust_department_count(instance.event_id, instance.on_waiting_list, instance.department, -1)
+    notify_event_changed(sender, instance.event_id)
+
+
+@receiver(post_save, sender=RunningEvent)
+@receiver(post_delete, sender=RunningEvent)
+def notify_running_event_changed(sender, instance, raw=False, **kwargs):
+    """Announce changes made to a running event itself."""
+    if not raw:
+        notify_event_changed(sender, instance.pk)
+
+
+@receiver(event_changed)
+def invalidate_page_cache(sender, event_id, **kwargs):
+    """Invalidate the cached public pages and everything cached for the event."""
+    bump_page_version()
+    bump_event_version(event_id)
+
+
+@receiver(event_changed)
+def unpublish_pages(sender, event_id, **kwargs):
+    """Remove the event's published pages, so Django serves them until they are republished."""
+    unpublish_event(event_id)
+
+
+@receiver(event_changed)
+def publish_availability(sender, event_id, **kwargs):
+    """Push the event's new seat count to the browsers showing its detail page."""
+    availability_broker.publish(event_id)
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    """Count the queries of every database connection in the request metrics."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
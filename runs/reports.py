@@ -0,0 +1,111 @@
+"""Aggregated participant reports for the runs application."""
+
+import csv
+import io
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .cache import get_event_version
+from .models import Participant, RunningEvent
+
+TSHIRT_SIZE_REPORT_FIELDS = ["size", "label", "registered", "waiting_list", "total"]
+
+
+def _get_tshirt_size_counts(event_id: int) -> Optional[tuple[str, dict]]:
+    """
+    Count the t-shirt sizes of an event's participants.
+
+    The counts are computed with one GROUP BY query and cached under the event's
+    version, so they are only recomputed after the event or its participants changed.
+
+    Returns:
+        tuple or None: The event name and the (registered, waiting list) counts by
+            size, or None if the event does not exist.
+    """
+    key = f"runs:tshirt_sizes:{get_event_version(event_id)}:{event_id}"
+    result = cache.get(key)
+    if result is None:
+        name = RunningEvent.objects.filter(pk=event_id).values_list("name", flat=True).first()
+        if name is None:
+            return None
+        rows = (
+            Participant.objects.filter(event_id=event_id)
+            .order_by()
+            .values("tshirt_size")
+            .annotate(
+                registered=Count("pk", filter=Q(on_waiting_list=False)),
+                waiting_list=Count("pk", filter=Q(on_waiting_list=True)),
+            )
+        )
+        counts = {row["tshirt_size"]: (row["registered"], row["waiting_list"]) for row in rows}
+        result = (name, counts)
+        cache.set(key, result, settings.REPORT_CACHE_TIMEOUT)
+    return result
+
+
+def tshirt_size_report(event_id: int) -> Optional[dict]:
+    """
+    Build the t-shirt size report of an event.
+
+    Args:
+        event_id (int): The primary key of the event
+
+    Returns:
+        dict or None: The event, one entry per size in the order of
+            Participant.TSHIRT_SIZES (sizes nobody chose included) and the totals,
+            or None if the event does not exist.
+    """
+    result = _get_tshirt_size_counts(event_id)
+    if result is None:
+        return None
+    name, counts = result
+
+    sizes = []
+    for size, label in Participant.TSHIRT_SIZES:
+        registered, waiting_list = counts.get(size, (0, 0))
+        sizes.append(
+            {
+                "size": size,
+                "label": str(label),
+                "registered": registered,
+                "waiting_list": waiting_list,
+                "total": registered + waiting_list,
+            }
+        )
+    total = {
+        field: sum(entry[field] for entry in sizes)
+        for field in ("registered", "waiting_list", "total")
+    }
+    return {"event": {"id": event_id, "name": name}, "sizes": sizes, "total": total}
+
+
+def tshirt_size_csv_response(report: dict) -> HttpResponse:
+    """
+    Return a t-shirt size report as a CSV download.
+
+    Args:
+        report (dict): The report built by tshirt_size_report()
+
+    Returns:
+        HttpResponse: The CSV attachment, one row per size and a total row
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(TSHIRT_SIZE_REPORT_FIELDS)
+    for entry in report["sizes"]:
+        writer.writerow([entry[field] for field in TSHIRT_SIZE_REPORT_FIELDS])
+    total = report["total"]
+    writer.writerow(["", "", total["registered"], total["waiting_list"], total["total"]])
+
+    today = timezone.now().date().isoformat()
+    filename = f"tshirt-sizes-{report['event']['id']}-{today}.csv"
+    return HttpResponse(
+        output.getvalue(),
+        content_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,19 @@
+"""Custom signals of the runs application."""
+
+from django.db import transaction
+from django.dispatch import Signal
+
+# Sent after the transaction commits whenever a running event or its participants
+# changed, including their counters. Provides the ``event_id`` argument.
+event_changed = Signal()
+
+
+def notify_event_changed(sender, event_id: int) -> None:
+    """
+    Send event_changed for an event once the current transaction commits.
+
+    Args:
+        sender: The model class that changed
+        event_id (int): The primary key of the affected event
+    """
+    transaction.on_commit(lambda: event_changed.send(sender=sender, event_id=event_id))
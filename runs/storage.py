@@ -0,0 +1,55 @@
+"""Static file storage of the runs application."""
+
+import gzip
+from functools import cached_property
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+# Extensions of text assets worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".txt", ".json", ".html", ".xml", ".map")
+# Below this size the gzip overhead eats the savings
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed static files with a precompressed gzip copy of each text asset.
+
+    ``collectstatic`` writes ``<name>.<hash>.<ext>.gz`` next to every hashed text
+    file if it is smaller, so the files can be served compressed without
+    compressing them on every request.
+    """
+
+    def post_process(self, *args, **kwargs):
+        """Hash the files as usual, then compress the hashed text assets."""
+        yield from super().post_process(*args, **kwargs)
+        if kwargs.get("dry_run"):
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name: str) -> bool:
+        """
+        Write the gzip copy of a file.
+
+        The copy is deterministic (without a timestamp), so unchanged files produce
+        unchanged copies.
+
+        Returns:
+            bool: Whether the copy was written (False if compressing does not pay off)
+        """
+        with self.open(name) as file:
+            content = file.read()
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(content) < MIN_COMPRESS_SIZE or len(compressed) >= len(content):
+            return False
+        self.delete(f"{name}.gz")
+        self.save(f"{name}.gz", ContentFile(compressed))
+        return True
+
+    @cached_property
+    def hashed_names(self) -> frozenset:
+        """The content-hashed names of the collected files, as loaded from the manifest."""
+        return frozenset(self.hashed_files.values())
@@ -0,0 +1,327 @@
+"""Tests for the admin configuration of the runs application."""
+
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth.models import Permission, User
+from django.contrib.messages import get_messages
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.models import Participant, RunningEvent
+
+
+class RunningEventAdminTest(TestCase):
+    """Test case for the RunningEventAdmin."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.user)
+        self.event = RunningEvent.objects.create(
+            name="Test Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=1,
+        )
+        for i in range(3):
+            self.event.register(
+                Participant(
+                    name=f"Runner {i}",
+                    department="Dept",
+                    year_of_birth=2000,
+                    tshirt_size="M",
+                    email=f"runner{i}@example.com",
+                )
+            )
+
+    def change_form_data(self, **changes):
+        """Build the POST data of the event change form."""
+        data = {
+            "name": self.event.name,
+            "date": self.event.date.isoformat(),
+            "location": self.event.location,
+            "description": self.event.description,
+            "registration_deadline": "",
+            "max_participants": self.event.max_participants,
+        }
+        data.update(changes)
+        return data
+
+    def test_raising_capacity_promotes_waiting_participants(self):
+        """Test that raising max_participants promotes waiting participants."""
+        response = self.client.post(
+            reverse("admin:runs_runningevent_change", args=[self.event.pk]),
+            self.change_form_data(max_participants=2),
+            HTTP_ACCEPT_LANGUAGE="en",
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(
+            "1 participant was moved from the waiting list to a spot.",
+            [str(message) for message in get_messages(response.wsgi_request)],
+        )
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (2, 1))
+        self.assertTrue(Participant.objects.get(name="Runner 2").on_waiting_list)
+
+    def test_change_page_shows_one_page_of_participants(self):
+        """Test that the change page lists the participants read-only and paginated."""
+        self.event.register_batch(
+            [
+                Participant(name=f"Extra {i}", department="Dept", year_of_birth=1990)
+                for i in range(60)
+            ]
+        )
+        url = reverse("admin:runs_runningevent_change", args=[self.event.pk])
+
+        response = self.client.get(url)
+        page = response.context["participant_page"]
+        self.assertEqual((page.paginator.count, len(page.object_list)), (63, 50))
+        self.assertContains(response, "Runner 0")
+        self.assertNotContains(response, "Extra 59")
+        self.assertNotContains(response, "participants-TOTAL_FORMS")
+
+        response = self.client.get(url, {"participants_page": 2})
+        self.assertContains(response, "Extra 59")
+
+    def test_saving_event_does_not_touch_participants(self):
+        """Test that saving an event only posts and saves the event."""
+        updated_at = list(self.event.participants.values_list("updated_at", flat=True))
+        response = self.client.post(
+            reverse("admin:runs_runningevent_change", args=[self.event.pk]),
+            self.change_form_data(location="New Location"),
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(self.event.participants.values_list("updated_at", flat=True)), updated_at
+        )
+
+    def test_export_participants_csv_action(self):
+        """Test the admin action exporting the participants of the selected events."""
+        response = self.client.post(
+            reverse("admin:runs_runningevent_changelist"),
+            {"action": "export_participants_csv", "_selected_action": [self.event.pk]},
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("\n"), 4)
+
+    def test_export_action_requires_participant_permission(self):
+        """Test that only users allowed to view participants are offered the export."""
+        staff = User.objects.create_user("staff", is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename="view_runningevent"))
+        self.client.force_login(staff)
+        url = reverse("admin:runs_runningevent_changelist")
+
+        def actions():
+            form = self.client.get(url).context["action_form"]
+            return [name for name, _label in form.fields["action"].choices]
+
+        self.assertNotIn("export_participants_csv", actions())
+        staff.user_permissions.add(Permission.objects.get(codename="view_participant"))
+        self.assertIn("export_participants_csv", actions())
+
+    def test_rebalance_action(self):
+        """Test the admin action for rebalancing waiting lists."""
+        RunningEvent.objects.filter(pk=self.event.pk).update(max_participants=3)
+        response = self.client.post(
+            reverse("admin:runs_runningevent_changelist"),
+            {"action": "rebalance_waiting_lists", "_selected_action": [self.event.pk]},
+            HTTP_ACCEPT_LANGUAGE="de",
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ["2 Teilnehmer wurden von der Warteliste auf einen Platz verschoben."],
+        )
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (3, 0))
+
+
+class ParticipantAdminTest(TestCase):
+    """Test case for the ParticipantAdmin."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.user)
+        self.event = RunningEvent.objects.create(
+            name="Test Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=1,
+        )
+        self.participants = [
+            self.event.register(
+                Participant(name=f"Runner {i}", department="Dept", year_of_birth=2000)
+            )
+            for i in range(3)
+        ]
+
+    def test_export_csv_action(self):
+        """Test the admin action exporting the selected participants."""
+        response = self.client.post(
+            reverse("admin:runs_participant_changelist"),
+            {"action": "export_csv", "_selected_action": [self.participants[1].pk]},
+        )
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("\n"), 2)
+        self.assertIn("Runner 1", content)
+
+    def test_delete_promotes_waiting_participant(self):
+        """Test that deleting a participant gives the spot to the waiting list."""
+        response = self.client.post(
+            reverse("admin:runs_participant_delete", args=[self.participants[0].pk]),
+            {"post": "yes"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Participant.objects.get(name="Runner 1").on_waiting_list)
+        self.assertTrue(Participant.objects.get(name="Runner 2").on_waiting_list)
+
+    def test_bulk_delete_promotes_waiting_participants(self):
+        """Test that the delete action gives the spots to the waiting list."""
+        response = self.client.post(
+            reverse("admin:runs_participant_changelist"),
+            {
+                "action": "delete_selected",
+                "_selected_action": [self.participants[0].pk, self.participants[1].pk],
+                "post": "yes",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Participant.objects.get(name="Runner 2").on_waiting_list)
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (1, 0))
+
+    def test_changelist_query_count_does_not_grow_with_participants(self):
+        """Test that the changelist joins the events and skips the full table count."""
+        other_event = RunningEvent.objects.create(
+            name="Other Event", date=timezone.now().date() + timedelta(days=2), location="Park"
+        )
+        other_event.register_batch(
+            [
+                Participant(name=f"Other {i}", department=f"Dept {i % 5}", year_of_birth=1990)
+                for i in range(50)
+            ]
+        )
+        url = reverse("admin:runs_participant_changelist")
+
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertContains(response, "Other 49")
+        self.assertEqual(response.context["cl"].result_count, 53)
+        self.assertIsNone(response.context["cl"].full_result_count)
+
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {"event__id__exact": self.event.pk})
+        self.assertEqual(response.context["cl"].result_count, 3)
+        department_filter = response.context["cl"].filter_specs[2]
+        self.assertEqual(department_filter.lookup_choices, [("Dept", "Dept")])
+
+    def test_search(self):
+        """Test searching by name prefix and email, and by substring on request only."""
+        self.event.register(
+            Participant(
+                name="Jane Doe", department="Dept", year_of_birth=1990, email="Jane@Example.com"
+            )
+        )
+        url = reverse("admin:runs_participant_changelist")
+        for term, count in (
+            ("runner", 3),
+            ('"runner 1"', 1),
+            ("jane@example.com", 1),
+            ("doe", 0),
+            ("*doe", 1),
+            ("* unner", 3),
+            ("*", 4),
+        ):
+            response = self.client.get(url, {"q": term})
+            self.assertEqual(response.context["cl"].result_count, count, term)
+
+    def test_search_uses_indexes(self):
+        """Test that the name prefix and email search are served by an index."""
+        if connection.vendor not in ("postgresql", "sqlite"):
+            self.skipTest("Plain indexes serve the case-insensitive search")
+        self.event.register(
+            Participant(
+                name="Jane", department="Dept", year_of_birth=1990, email="jane@example.com"
+            )
+        )
+        model_admin = admin.site._registry[Participant]
+        request = RequestFactory().get("/")
+        for term, index in (
+            ("Runner", "runs_participant_name_ci_idx"),
+            ("jane@example.com", "runs_participant_email_ci_idx"),
+        ):
+            queryset, _ = model_admin.get_search_results(request, Participant.objects.all(), term)
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    # The test table is tiny, so the planner would rather scan it
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                self.assertIn(index, queryset.explain())
+
+    def test_department_filter(self):
+        """Test filtering the participants by department."""
+        self.event.register(Participant(name="Other", department="Sales", year_of_birth=1990))
+        response = self.client.get(
+            reverse("admin:runs_participant_changelist"), {"department": "Sales"}
+        )
+        self.assertEqual(response.context["cl"].result_count, 1)
+        self.assertContains(response, "Other")
+
+
+class DepartmentStatisticAdminTest(TestCase):
+    """Test case for the department statistics dashboard."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.user)
+        self.url = reverse("admin:runs_departmentstatistic_changelist")
+
+    def create_event(self, index, departments):
+        """Create an event with one registered participant per department."""
+        event = RunningEvent.objects.create(
+            name=f"Event {index}",
+            date=timezone.now().date() - timedelta(days=index),
+            location="Park",
+        )
+        event.register_batch(
+            [
+                Participant(name="Runner", department=department, year_of_birth=2000)
+                for department in departments
+            ]
+        )
+        return event
+
+    def test_rankings(self):
+        """Test that departments are ranked across all events and for the selected event."""
+        latest = self.create_event(0, ["Sales", "IT"])
+        older = self.create_event(1, ["IT"])
+
+        response = self.client.get(self.url)
+        totals = [(row.department, row.registered_count) for row in response.context["totals"]]
+        self.assertEqual(totals, [("IT", 2), ("Sales", 1)])
+        self.assertEqual(response.context["event"], latest)
+
+        response = self.client.get(self.url, {"event": older.pk})
+        self.assertEqual([row.department for row in response.context["event_statistics"]], ["IT"])
+
+    def test_query_count_does_not_grow_with_history(self):
+        """Test that the dashboard runs the same queries however many events exist."""
+        self.create_event(0, ["Sales"])
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+
+        for index in range(1, 30):
+            self.create_event(index, [f"Dept {index}", "Sales"])
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context["totals"]), 20)
+        self.assertEqual(len(response.context["events"]), 20)
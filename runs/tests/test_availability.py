@@ -0,0 +1,219 @@
+"""Tests for the live seat availability of the runs application."""
+
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.availability import availability_broker
+from runs.models import Participant, RunningEvent
+
+
+class AvailabilityTestMixin:
+    """Create an event with one free spot and register participants for it."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Live Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            max_participants=2,
+        )
+        self.event.register(Participant(name="First", department="Dept", year_of_birth=2000))
+
+    def tearDown(self):
+        """Make sure no test leaves subscriptions behind."""
+        self.assertEqual(availability_broker._subscriptions, {})
+
+    async def register(self, name):
+        """Register a participant and announce the change like a committed transaction."""
+
+        def register():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.event.register(Participant(name=name, department="Dept", year_of_birth=2000))
+
+        await sync_to_async(register)()
+
+    async def wait_for_subscribers(self, count):
+        """Wait until ``count`` connections are subscribed to the event."""
+        while len(availability_broker._subscriptions.get(self.event.pk, ())) < count:
+            await asyncio.sleep(0.001)
+
+
+class AvailabilityBrokerTest(AvailabilityTestMixin, TestCase):
+    """Test case for the availability broker."""
+
+    async def test_one_query_for_all_subscribers(self):
+        """Test that a change is read once and pushed to every subscriber."""
+        subscriptions = [availability_broker.subscribe(self.event.pk) for _ in range(3)]
+        try:
+
+            def publish():
+                with self.assertNumQueries(1):
+                    availability_broker.publish(self.event.pk)
+
+            await sync_to_async(publish)()
+            for subscription in subscriptions:
+                state = await subscription.wait(1)
+                self.assertEqual(state["available_spots"], 1)
+                self.assertEqual(state["waitlist_count"], 0)
+            # Older states, e.g. read by the watcher in the meantime, are not pushed again
+            availability_broker._push(self.event.pk, {**state, "available_spots": 2})
+            self.assertIsNone(await subscriptions[0].wait(0.01))
+        finally:
+            for subscription in subscriptions:
+                availability_broker.unsubscribe(subscription)
+        self.assertEqual(availability_broker._versions, {})
+
+    async def test_registration_is_published(self):
+        """Test that committed registrations reach the subscribers."""
+        subscription = availability_broker.subscribe(self.event.pk)
+        try:
+            await self.register("Second")
+            self.assertEqual((await subscription.wait(1))["available_spots"], 0)
+            await self.register("Third")
+            self.assertEqual((await subscription.wait(1))["waitlist_count"], 1)
+        finally:
+            availability_broker.unsubscribe(subscription)
+
+    def test_no_query_without_subscribers(self):
+        """Test that changes nobody watches are not read."""
+        with self.assertNumQueries(0):
+            availability_broker.publish(self.event.pk)
+
+
+class AvailabilityWatcherTest(AvailabilityTestMixin, TransactionTestCase):
+    """Test case for changes made by other processes."""
+
+    @override_settings(AVAILABILITY_CHECK_INTERVAL=0.01)
+    async def test_changes_of_other_processes_are_pushed(self):
+        """Test that changes made without the event_changed signal reach subscribers."""
+        subscription = availability_broker.subscribe(self.event.pk)
+        try:
+            state = await availability_broker.aget_state(self.event.pk)
+            self.assertEqual(state["available_spots"], 1)
+            # Like another worker would, without a signal in this process
+            await RunningEvent.objects.filter(pk=self.event.pk).aupdate(
+                registered_count=2, updated_at=timezone.now()
+            )
+            # A watcher started by an earlier test may still sleep its default interval
+            self.assertEqual((await subscription.wait(5))["available_spots"], 0)
+        finally:
+            availability_broker.unsubscribe(subscription)
+
+
+@override_settings(LIVE_AVAILABILITY_SSE=True)
+class AvailabilityViewTest(AvailabilityTestMixin, TestCase):
+    """Test case for the availability stream and its long-polling fallback."""
+
+    async def test_stream(self):
+        """Test that the stream starts with the current state and pushes changes."""
+        response = await AsyncClient().get(
+            reverse("event_availability_stream", args=[self.event.pk])
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn("no-cache", response["Cache-Control"])
+        events = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await anext(events)).startswith(b"retry: "))
+            first = (await anext(events)).decode()
+            self.assertIn('"available_spots":1', first)
+
+            await self.register("Second")
+            second = (await anext(events)).decode()
+            state = json.loads(second.split("data: ")[1])
+            self.assertEqual(state["available_spots"], 0)
+            self.assertTrue(second.startswith(f"id: {state['version']}\n"))
+        finally:
+            await events.aclose()
+
+    @override_settings(AVAILABILITY_KEEPALIVE=0.01, AVAILABILITY_STREAM_TIMEOUT=0.05)
+    async def test_stream_keepalive_and_timeout(self):
+        """Test that idle streams send comments and end after the timeout."""
+        response = await AsyncClient().get(
+            reverse("event_availability_stream", args=[self.event.pk])
+        )
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertIn(b": keepalive\n\n", chunks)
+
+    async def test_poll(self):
+        """Test that a long poll returns once the shown version is outdated."""
+        url = reverse("event_availability_poll", args=[self.event.pk])
+        client = AsyncClient()
+        state = (await client.get(url)).json()
+        self.assertEqual(state["available_spots"], 1)
+
+        poll = asyncio.ensure_future(client.get(url, {"version": state["version"]}))
+        await self.wait_for_subscribers(1)
+        await self.register("Second")
+        response = await poll
+        self.assertEqual(response.json()["available_spots"], 0)
+
+    @override_settings(AVAILABILITY_POLL_TIMEOUT=0.01)
+    async def test_poll_timeout(self):
+        """Test that a long poll returns the unchanged state after the timeout."""
+        url = reverse("event_availability_poll", args=[self.event.pk])
+        client = AsyncClient()
+        state = (await client.get(url)).json()
+        self.assertEqual((await client.get(url, {"version": state["version"]})).json(), state)
+
+    async def test_missing_event(self):
+        """Test that streams and polls of missing events return 404."""
+        client = AsyncClient()
+        for name in ("event_availability_stream", "event_availability_poll"):
+            response = await client.get(reverse(name, args=[self.event.pk + 100]))
+            self.assertEqual(response.status_code, 404)
+
+    async def test_detail_page_listens(self):
+        """Test that the event detail page connects to the stream."""
+        response = await AsyncClient().get(reverse("event_detail", args=[self.event.pk]))
+        self.assertContains(response, reverse("event_availability_stream", args=[self.event.pk]))
+        self.assertContains(response, '<span data-field="available_spots">1</span>', html=False)
+
+
+class AvailabilityWithoutSSETest(AvailabilityTestMixin, TestCase):
+    """Test case for the seat count of pages served without server-sent events."""
+
+    async def test_short_poll(self):
+        """Test that pages poll at an interval and polls never wait."""
+        client = AsyncClient()
+        response = await client.get(reverse("event_detail", args=[self.event.pk]))
+        self.assertNotContains(response, reverse("event_availability_stream", args=[self.event.pk]))
+        self.assertContains(response, 'data-poll-interval="30"')
+
+        url = reverse("event_availability_poll", args=[self.event.pk])
+        state = (await client.get(url)).json()
+        response = await asyncio.wait_for(client.get(url, {"version": state["version"]}), 1)
+        self.assertEqual(response.json(), state)
+
+        response = await client.get(reverse("event_availability_stream", args=[self.event.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    async def test_short_poll_cached(self):
+        """Test that polls share one read of the event until it changes."""
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        client = AsyncClient()
+        url = reverse("event_availability_poll", args=[self.event.pk])
+        with mock.patch.object(
+            availability_broker, "aget_state", wraps=availability_broker.aget_state
+        ) as aget_state:
+            state = (await client.get(url)).json()
+            self.assertEqual((await client.get(url)).json(), state)
+            self.assertEqual(aget_state.call_count, 1)
+
+            await self.register("Second")
+            self.assertEqual((await client.get(url)).json()["available_spots"], 0)
+            self.assertEqual(aget_state.call_count, 2)
+            missing = reverse("event_availability_poll", args=[self.event.pk + 1])
+            self.assertEqual((await client.get(missing)).status_code, 404)
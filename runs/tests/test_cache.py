@@ -0,0 +1,186 @@
+"""Tests for the page cache of the runs application."""
+
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.cache import CSRF_TOKEN_PLACEHOLDER
+from runs.models import Participant, RunningEvent
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class PageCacheTest(TestCase):
+    """Test case for the versioned page cache of the public pages."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.client = Client()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event = RunningEvent.objects.create(
+                name="Cached Event",
+                date=timezone.now().date() + timedelta(days=1),
+                location="Test Location",
+                description="Test Description",
+                max_participants=10,
+            )
+
+    def test_list_served_from_cache(self):
+        """Test that a repeated list request does not hit the database."""
+        first = self.client.get(reverse("event_list"))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse("event_list"))
+        self.assertEqual(first.content, second.content)
+
+    def test_detail_served_from_cache(self):
+        """Test that a repeated detail request does not hit the database."""
+        self.client.get(reverse("event_detail", args=[self.event.pk]))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("event_detail", args=[self.event.pk]))
+        self.assertContains(response, "Cached Event")
+
+    def test_api_served_from_cache(self):
+        """Test that a repeated API request does not hit the database and stays JSON."""
+        first = self.client.get(reverse("api_event_list"))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse("api_event_list"))
+        self.assertEqual(second["Content-Type"], "application/json")
+        self.assertEqual(first.json(), second.json())
+
+    def test_query_string_ignored(self):
+        """Test that query strings share the cached copy of the page."""
+        self.client.get(reverse("event_list"))
+        with self.assertNumQueries(0):
+            for query in ("utm_source=newsletter", "x=1", "x=2"):
+                self.client.get(reverse("event_list"), QUERY_STRING=query)
+
+    def test_invalidated_by_registration(self):
+        """Test that a new participant invalidates the cached pages."""
+        self.assertContains(self.client.get(reverse("event_list")), "10 ")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.register(Participant(name="Runner", department="Dept", year_of_birth=2000))
+
+        self.assertContains(self.client.get(reverse("event_list")), "9 ")
+
+    def test_invalidated_by_event_change(self):
+        """Test that editing an event invalidates the cached pages."""
+        self.client.get(reverse("event_detail", args=[self.event.pk]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.name = "Renamed Event"
+            self.event.save()
+
+        response = self.client.get(reverse("event_detail", args=[self.event.pk]))
+        self.assertContains(response, "Renamed Event")
+
+    def test_cache_key_includes_language(self):
+        """Test that each language gets its own cached copy."""
+        german = self.client.get(reverse("event_list"), HTTP_ACCEPT_LANGUAGE="de")
+        english = self.client.get(reverse("event_list"), HTTP_ACCEPT_LANGUAGE="en")
+        self.assertContains(german, "Verfügbare Laufveranstaltungen")
+        self.assertContains(english, "Available Running Events")
+
+    def test_cached_page_gets_visitors_csrf_token(self):
+        """Test that a page cached for one visitor carries a valid token for the next."""
+        url = reverse("event_detail", args=[self.event.pk])
+        Client().get(url)
+
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(url)
+        self.assertNotContains(response, CSRF_TOKEN_PLACEHOLDER)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode())
+
+        response = client.post(
+            url,
+            {
+                "csrfmiddlewaretoken": token.group(1),
+                "name": "Runner",
+                "department": "Dept",
+                "year_of_birth": 2000,
+                "tshirt_size": "M",
+                "email": "runner@example.com",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+class ConditionalGetTest(TestCase):
+    """Test case for ETag and Last-Modified support of the public pages."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.client = Client()
+        self.event = RunningEvent.objects.create(
+            name="Watched Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=10,
+        )
+        self.detail_url = reverse("event_detail", args=[self.event.pk])
+
+    def test_list_not_modified(self):
+        """Test that an unchanged event list is answered with 304 without rendering."""
+        response = self.client.get(reverse("event_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with self.assertTemplateNotUsed("runs/event_list.html"):
+            response = self.client.get(reverse("event_list"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_not_modified(self):
+        """Test that an unchanged detail page is answered with 304 in a single query."""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is honoured without an ETag."""
+        response = self.client.get(self.detail_url)
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_registration_invalidates_validators(self):
+        """Test that a new registration turns the next conditional request into a 200."""
+        list_etag = self.client.get(reverse("event_list"))["ETag"]
+        detail_etag = self.client.get(self.detail_url)["ETag"]
+
+        self.client.post(
+            self.detail_url,
+            {
+                "name": "New Runner",
+                "department": "Test Department",
+                "year_of_birth": 2000,
+                "tshirt_size": "M",
+                "email": "runner@example.com",
+            },
+        )
+
+        response = self.client.get(reverse("event_list"), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "9")
+
+    def test_etag_depends_on_language(self):
+        """Test that each language gets its own validator."""
+        german = self.client.get(self.detail_url, HTTP_ACCEPT_LANGUAGE="de")
+        english = self.client.get(self.detail_url, HTTP_ACCEPT_LANGUAGE="en")
+        self.assertNotEqual(german["ETag"], english["ETag"])
+
+    def test_missing_event(self):
+        """Test that a missing event still returns 404."""
+        response = self.client.get(reverse("event_detail", args=[self.event.pk + 100]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,398 @@
+"""Tests for the management commands of the runs application."""
+
+import csv
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from runs.management.commands import bench, generate_fake_data, import_participants
+from runs.management.commands.bench import find_regressions
+from runs.models import DepartmentStatistic, Participant, RunningEvent
+
+
+class RebuildParticipantCountsCommandTest(TestCase):
+    """Test case for the rebuild_participant_counts command."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Test Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=1,
+        )
+        for i, on_waiting_list in enumerate([False, True, True]):
+            Participant.objects.create(
+                event=self.event,
+                name=f"Participant {i}",
+                department="Test Department",
+                year_of_birth=2000,
+                tshirt_size="M",
+                email=f"participant{i}@example.com",
+                on_waiting_list=on_waiting_list,
+            )
+
+    def test_rebuild_counts(self):
+        """Test that the command repairs drifted counters."""
+        RunningEvent.objects.update(registered_count=5, waitlist_count=0)
+
+        out = StringIO()
+        call_command("rebuild_participant_counts", stdout=out)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registered_count, 1)
+        self.assertEqual(self.event.waitlist_count, 2)
+        self.assertIn("1 events", out.getvalue())
+
+
+class RebuildDepartmentStatisticsCommandTest(TestCase):
+    """Test case for the rebuild_department_statistics command."""
+
+    def test_rebuild_statistics(self):
+        """Test that the command repairs drifted statistics."""
+        event = RunningEvent.objects.create(
+            name="Test Event", date=timezone.now().date(), location="Test Location"
+        )
+        event.register(Participant(name="Runner", department="Sales", year_of_birth=2000))
+        DepartmentStatistic.objects.update(registered_count=7)
+        DepartmentStatistic.objects.create(event=event, department="Ghosts", registered_count=3)
+
+        out = StringIO()
+        call_command("rebuild_department_statistics", stdout=out)
+
+        self.assertEqual(
+            set(DepartmentStatistic.objects.values_list("event", "department", "registered_count")),
+            {(event.pk, "Sales", 1), (None, "Sales", 1)},
+        )
+        self.assertIn("Rebuilt 2 department statistics", out.getvalue())
+
+
+class RebalanceWaitingListsCommandTest(TestCase):
+    """Test case for the rebalance_waiting_lists command."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Test Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=1,
+        )
+        for i in range(3):
+            self.event.register(
+                Participant(name=f"Runner {i}", department="Dept", year_of_birth=2000)
+            )
+
+    def test_rebalance(self):
+        """Test that the command fills the spots of all events."""
+        RunningEvent.objects.update(max_participants=2)
+
+        out = StringIO()
+        call_command("rebalance_waiting_lists", stdout=out)
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (2, 1))
+        self.assertIn("Promoted 1 and demoted 0", out.getvalue())
+
+
+class ImportParticipantsCommandTest(TestCase):
+    """Test case for the import_participants command."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Import Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=3,
+        )
+        self.event.register(
+            Participant(
+                name="Existing Runner",
+                department="Sales",
+                year_of_birth=1990,
+                tshirt_size="M",
+                email="existing@example.com",
+            )
+        )
+
+    def write_csv(self, content):
+        """Write a temporary CSV file and return its path."""
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w", encoding="utf-8") as csv_file:
+            csv_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_csv(self, content, *args):
+        """Run the command and return its output and error output."""
+        out, err = StringIO(), StringIO()
+        call_command(
+            "import_participants",
+            str(self.event.pk),
+            self.write_csv(content),
+            *args,
+            stdout=out,
+            stderr=err,
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_import(self):
+        """Test that valid rows are imported with spots assigned in file order."""
+        out, err = self.import_csv(
+            "name,department,year_of_birth,tshirt_size,email\n"
+            "Runner 1,IT,1985,L,runner1@example.com\n"
+            "Runner 2,HR,1990,S,runner2@example.com\n"
+            "Runner 3,IT,1995,XL,runner3@example.com\n"
+            "Runner 4,IT,2000,NO,runner4@example.com\n"
+        )
+
+        self.assertEqual(err, "")
+        self.assertIn("Imported 4 participants", out)
+        waiting = Participant.objects.filter(event=self.event, on_waiting_list=True)
+        self.assertEqual(sorted(waiting.values_list("name", flat=True)), ["Runner 3", "Runner 4"])
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (3, 2))
+
+    def test_rejected_rows(self):
+        """Test that invalid and duplicate rows are reported and skipped."""
+        out, err = self.import_csv(
+            "name;department;year_of_birth;tshirt_size;email\n"
+            "Existing Runner;Sales;1990;M;other@example.com\n"
+            "Too Old;IT;1800;M;old@example.com\n"
+            "Bad Size;IT;1990;XXXL;size@example.com\n"
+            "New Runner;IT;1990;M;new@example.com\n"
+            "New Runner;IT;1990;L;again@example.com\n",
+            "--delimiter",
+            ";",
+        )
+
+        self.assertIn("Imported 1 participants", out)
+        self.assertIn("4 rows rejected", out)
+        self.assertIn("Line 2: already registered", err)
+        self.assertIn("Line 3: year_of_birth", err)
+        self.assertIn("Line 4: tshirt_size", err)
+        self.assertIn("Line 6: already registered", err)
+
+    def test_registered_during_import(self):
+        """Test that people registering on the website during the import are reported."""
+        read_participants = import_participants.Command.read_participants
+
+        def read_and_register(command, event, options):
+            result = read_participants(command, event, options)
+            event.register(Participant(name="Runner 2", department="HR", year_of_birth=1990))
+            return result
+
+        with mock.patch.object(import_participants.Command, "read_participants", read_and_register):
+            out, err = self.import_csv(
+                "name,department,year_of_birth,tshirt_size,email\n"
+                "Runner 1,IT,1985,L,runner1@example.com\n"
+                "Runner 2,HR,1990,S,runner2@example.com\n"
+                "Runner 3,IT,1995,XL,runner3@example.com\n",
+                "--batch-size",
+                "2",
+            )
+
+        self.assertEqual(err, "Line 3: already registered\n")
+        self.assertIn("Imported 2 participants", out)
+        self.assertIn("1 rows rejected", out)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (3, 1))
+
+    def test_dry_run(self):
+        """Test that a dry run does not import anything."""
+        out, _ = self.import_csv(
+            "name,department,year_of_birth,tshirt_size,email\n"
+            "Runner 1,IT,1985,L,runner1@example.com\n",
+            "--dry-run",
+        )
+        self.assertIn("1 participants valid", out)
+        self.assertEqual(Participant.objects.filter(event=self.event).count(), 1)
+
+    def test_query_count_independent_of_rows(self):
+        """Test that rows are validated and inserted without per-row queries."""
+        rows = "".join(f"Runner {i},IT,1990,M,runner{i}@example.com\n" for i in range(500))
+        path = self.write_csv("name,department,year_of_birth,tshirt_size,email\n" + rows)
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "import_participants",
+                str(self.event.pk),
+                path,
+                "--batch-size",
+                "250",
+                stdout=StringIO(),
+            )
+        self.assertLess(len(queries), 50)
+        self.assertEqual(Participant.objects.filter(event=self.event).count(), 501)
+
+    def test_missing_columns(self):
+        """Test that a file without the expected header is refused."""
+        with self.assertRaises(CommandError):
+            self.import_csv("name,email\nRunner,runner@example.com\n")
+
+    def test_unreadable_file(self):
+        """Test that files in another encoding or with broken quoting are refused."""
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "wb") as csv_file:
+            csv_file.write(
+                "name,department,year_of_birth,tshirt_size,email\n"
+                "Jürgen,IT,1985,L,juergen@example.com\n".encode("latin-1")
+            )
+        self.addCleanup(os.remove, path)
+        with self.assertRaisesMessage(CommandError, "must be encoded as UTF-8"):
+            call_command("import_participants", str(self.event.pk), path, stdout=StringIO())
+
+        with self.assertRaisesMessage(CommandError, "Expected a UTF-8 encoded CSV file"):
+            self.import_csv(
+                "name,department,year_of_birth,tshirt_size,email\n"
+                # An unclosed quote swallows the rest of the file into one field
+                'Runner,"IT,1985,L,runner@example.com\n'
+                + "x" * csv.field_size_limit()
+            )
+
+    def test_batch_size_validated(self):
+        """Test that a batch size below one is refused instead of importing nothing."""
+        with self.assertRaisesMessage(CommandError, "--batch-size must be at least 1."):
+            self.import_csv(
+                "name,department,year_of_birth,tshirt_size,email\n"
+                "Runner 1,IT,1985,L,runner1@example.com\n",
+                "--batch-size",
+                "0",
+            )
+        self.assertEqual(Participant.objects.filter(event=self.event).count(), 1)
+
+
+class GenerateFakeDataCommandTest(TestCase):
+    """Test case for the generate_fake_data command."""
+
+    def generate(self, seed=0):
+        """Generate a small data set and return its participants."""
+        call_command(
+            "generate_fake_data",
+            "--events=5",
+            "--participants=2000",
+            f"--seed={seed}",
+            "--batch-size=300",
+            stdout=StringIO(),
+        )
+        return list(
+            Participant.objects.order_by("pk").values_list(
+                "name", "department", "year_of_birth", "tshirt_size", "on_waiting_list"
+            )
+        )
+
+    def test_counters_and_statistics_consistent(self):
+        """Test that the bulk inserted data looks as if registered one by one."""
+        self.generate()
+        self.assertEqual(Participant.objects.count(), 2000)
+        events = list(RunningEvent.objects.all())
+        self.assertEqual(len(events), 5)
+        self.assertEqual(len([event for event in events if event.date > timezone.now().date()]), 2)
+        for event in events:
+            self.assertFalse(event.needs_rebalancing())
+            if event.max_participants:
+                self.assertLessEqual(event.registered_count, event.max_participants)
+        self.assertTrue(any(event.waitlist_count for event in events))
+
+        counters = [(e.pk, e.registered_count, e.waitlist_count) for e in events]
+        statistics = set(
+            DepartmentStatistic.objects.values_list(
+                "event_id", "department", "registered_count", "waitlist_count"
+            )
+        )
+        call_command("rebuild_participant_counts", stdout=StringIO())
+        call_command("rebuild_department_statistics", stdout=StringIO())
+        self.assertEqual(
+            [(e.pk, e.registered_count, e.waitlist_count) for e in RunningEvent.objects.all()],
+            counters,
+        )
+        self.assertEqual(
+            set(
+                DepartmentStatistic.objects.values_list(
+                    "event_id", "department", "registered_count", "waitlist_count"
+                )
+            ),
+            statistics,
+        )
+
+    def test_deterministic(self):
+        """Test that the same seed generates the same participants."""
+        first = self.generate(seed=7)
+        RunningEvent.objects.all().delete()
+        self.assertEqual(self.generate(seed=7), first)
+        RunningEvent.objects.all().delete()
+        self.assertNotEqual(self.generate(seed=8), first)
+
+    def test_unique_space_exhausted(self):
+        """Test that an event can take every distinct registration and not one more."""
+        names = {"FIRST_NAMES": ["Anna", "Ben"], "LAST_NAMES": ["Koch"]}
+        names["DEPARTMENTS"] = {"IT": 3, "Legal": 1}
+        with mock.patch.multiple(generate_fake_data, **names):
+            # 2 names * 2 departments * 52 years
+            call_command(
+                "generate_fake_data", "--events=1", "--participants=208", stdout=StringIO()
+            )
+            self.assertEqual(
+                Participant.objects.values("name", "department", "year_of_birth")
+                .distinct()
+                .count(),
+                208,
+            )
+            with self.assertRaises(CommandError):
+                call_command("generate_fake_data", "--events=1", "--participants=209")
+
+
+class BenchCommandTest(SimpleTestCase):
+    """Test case for the comparison of bench results."""
+
+    def test_find_regressions(self):
+        """Test that more queries and slower p95 latencies beyond the tolerance are reported."""
+        baseline = {
+            "scenarios": {
+                "event_list": {"p95_ms": 10.0, "max_queries": 2},
+                "event_detail": {"p95_ms": 10.0, "max_queries": 2},
+            }
+        }
+        results = {
+            "scenarios": {
+                "event_list": {"p95_ms": 11.9, "max_queries": 3},
+                "event_detail": {"p95_ms": 12.1, "max_queries": 2},
+                "registration": {"p95_ms": 50.0, "max_queries": 9},
+            }
+        }
+        self.assertEqual(
+            find_regressions(results, baseline, tolerance=0.2),
+            ["event_list: 3 queries (was 2)", "event_detail: p95 12.1 ms (was 10.0 ms)"],
+        )
+
+    def test_too_few_requests(self):
+        """Test that runs too short for percentiles are refused before seeding."""
+        for option in ("--requests=1", "--registrations=1"):
+            with self.assertRaisesMessage(CommandError, "at least 2 requests"):
+                call_command("bench", option, stdout=StringIO())
+
+    def test_isolated_from_site(self):
+        """Test that the benchmark runs with its own cache and publishes no pages."""
+
+        def run_benchmark(command, options):
+            self.assertIsNone(settings.PUBLISHED_PAGES_DIR)
+            self.assertEqual(
+                settings.CACHES["default"]["BACKEND"],
+                "django.core.cache.backends.locmem.LocMemCache",
+            )
+            return {}
+
+        with mock.patch.object(bench.Command, "run_benchmark", run_benchmark):
+            call_command("bench", "--output", os.devnull, stdout=StringIO())
@@ -94,8 +94,8 @@ class ParticipantFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn("year_of_birth", form.errors)
 
-    def test_form_already_registered(self):
-        """Test form with already registered participant."""
+    def test_form_does_not_query_for_duplicates(self):
+        """Test that validation leaves duplicate detection to the database."""
         form = ParticipantForm(
             data={
                 "name": "Existing Participant",  # Same name
@@ -106,10 +106,11 @@ class ParticipantFormTest(TestCase):
             },
             event=self.event,
         )
-        self.assertFalse(form.is_valid())
-        self.assertIn("already_registered", form.errors.get("__all__", []))
-        self.assertTrue(hasattr(form, "existing_participant"))
-        self.assertEqual(form.existing_participant, self.participant)
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+
+        participant = form.save(commit=False)
+        self.assertEqual(participant.get_existing_registration(), self.participant)
 
     def test_form_save(self):
         """Test form save method."""
@@ -0,0 +1,176 @@
+"""Tests for the request metrics of the runs application."""
+
+import re
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.metrics import (
+    METRICS_PROCESSES_KEY,
+    Histogram,
+    MetricsRegistry,
+    RequestMetrics,
+    metrics_registry,
+)
+from runs.models import RunningEvent
+
+QUERIES = "firmenlauf_request_sql_queries"
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+SERVER_TIMING = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", view;dur=[\d.]+, render;dur=([\d.]+), total;dur=[\d.]+'
+)
+
+
+class HistogramTest(SimpleTestCase):
+    """Test case for the Prometheus histogram."""
+
+    def test_samples(self):
+        """Test that buckets are cumulative and bounds are inclusive."""
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+        self.assertEqual(
+            list(histogram.samples("queries", 'view="a"')),
+            [
+                'queries_bucket{view="a",le="1"} 2',
+                'queries_bucket{view="a",le="5"} 3',
+                'queries_bucket{view="a",le="+Inf"} 4',
+                'queries_sum{view="a"} 11.0',
+                'queries_count{view="a"} 4',
+            ],
+        )
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    """Test case for the Server-Timing header and the metrics endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.event = RunningEvent.objects.create(
+            name="Timed Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+        )
+
+    def setUp(self):
+        """Start every test without observations."""
+        metrics_registry.clear()
+
+    def test_server_timing(self):
+        """Test that the header reports the queries and the render time of a page."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("event_detail", args=[self.event.pk]))
+        match = SERVER_TIMING.fullmatch(response["Server-Timing"])
+        self.assertIsNotNone(match, response["Server-Timing"])
+        self.assertEqual(int(match[1]), len(queries))
+        self.assertGreater(float(match[2]), 0)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_for_staff_only(self):
+        """Test that only staff members see the timings unless SERVER_TIMING is set."""
+        url = reverse("event_detail", args=[self.event.pk])
+        self.assertNotIn("Server-Timing", self.client.get(url))
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.assertIn("Server-Timing", self.client.get(url))
+
+    @override_settings(SERVER_TIMING=False)
+    async def test_async_server_timing_for_staff_only(self):
+        """Test that the staff check works for async views as well."""
+        client = AsyncClient()
+        self.assertNotIn("Server-Timing", await client.get(reverse("event_list")))
+        await client.aforce_login(await User.objects.acreate(username="staff", is_staff=True))
+        self.assertIn("Server-Timing", await client.get(reverse("event_list")))
+
+    async def test_async_view_queries_counted(self):
+        """Test that queries run in the threads of async views are counted."""
+        response = await AsyncClient().get(reverse("event_list"))
+        match = SERVER_TIMING.fullmatch(response["Server-Timing"])
+        self.assertGreater(int(match[1]), 0)
+
+    def test_metrics_endpoint(self):
+        """Test that the histograms are exposed per URL name."""
+        self.client.get(reverse("event_detail", args=[self.event.pk]))
+        self.client.get("/no-such-page/")
+
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        with override_settings(METRICS_TOKEN="secret"):
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(
+                self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong").status_code,
+                403,
+            )
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        content = response.content.decode()
+        self.assertIn("# TYPE firmenlauf_request_duration_seconds histogram", content)
+        self.assertIn('firmenlauf_request_sql_queries_count{view="event_detail"} 1', content)
+        self.assertIn('firmenlauf_request_duration_seconds_count{view="<unmatched>"} 1', content)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_metrics_of_all_processes(self):
+        """Test that the endpoint adds up the histograms every process shared."""
+        other_process = MetricsRegistry()
+        other_process.observe("event_detail", RequestMetrics(queries=3), 0.2)
+        other_process.observe("event_list", RequestMetrics(queries=1), 0.1)
+        other_process.flush()
+        # Flushed already, so this one is shared with the next flush only
+        other_process.observe("event_list", RequestMetrics(queries=1), 0.1)
+        self.client.get(reverse("event_detail", args=[self.event.pk]))
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        content = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('firmenlauf_request_sql_queries_count{view="event_detail"} 2', content)
+        self.assertIn('firmenlauf_request_sql_queries_count{view="event_list"} 1', content)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_exited_processes_taken_over(self):
+        """Test that the counts of exited processes are kept and their copies dropped."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        exited, alive = MetricsRegistry(), MetricsRegistry()
+        exited.observe("event_list", RequestMetrics(queries=1), 0.1)
+        alive.observe("event_list", RequestMetrics(queries=1), 0.1)
+        with mock.patch("runs.metrics.time.time", return_value=time.time() - 60):
+            exited.flush()
+        alive.flush()
+        metrics_registry.observe("event_list", RequestMetrics(queries=1), 0.1)
+
+        histograms = metrics_registry.collect()
+        self.assertEqual(sum(histograms[QUERIES, "event_list"].counts), 3)
+        self.assertEqual(
+            cache.get(METRICS_PROCESSES_KEY), {alive._process, metrics_registry._process}
+        )
+        self.assertIsNone(cache.get(exited._process))
+        # Taken over by the first scrape only, and reported by every later one
+        histograms = MetricsRegistry().collect()
+        self.assertEqual(sum(histograms[QUERIES, "event_list"].counts), 3)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_taken_over_process_starts_over(self):
+        """Test that a process taken over while it was stalled counts its requests once."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        stalled = MetricsRegistry()
+        stalled.observe("event_list", RequestMetrics(queries=1), 0.1)
+        with mock.patch("runs.metrics.time.time", return_value=time.time() - 60):
+            stalled.flush()
+        metrics_registry.collect()
+        stalled.observe("event_list", RequestMetrics(queries=1), 0.1)
+
+        histograms = stalled.collect()
+        self.assertEqual(sum(histograms[QUERIES, "event_list"].counts), 2)
+        self.assertEqual(stalled.flush()[QUERIES, "event_list"], ([0, 1] + [0] * 7, 1.0))
+
+    def test_metrics_endpoint_for_staff(self):
+        """Test that staff members can view the metrics without a token."""
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
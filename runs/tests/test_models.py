@@ -1,11 +1,15 @@
 """Tests for the models of the runs application."""
 
+import threading
+import unittest
 from datetime import timedelta
+from unittest import mock
 
-from django.test import TestCase
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 
-from runs.models import Participant, RunningEvent
+from runs.models import DepartmentStatistic, Participant, RunningEvent
 
 
 class RunningEventModelTest(TestCase):
@@ -100,6 +104,71 @@ class RunningEventModelTest(TestCase):
         self.limited_event.refresh_from_db()
         self.assertFalse(self.limited_event.has_available_spots())
 
+    def test_registration_open_queryset(self):
+        """Test that registration_open() matches is_registration_open()."""
+        no_deadline_event = RunningEvent.objects.create(
+            name="Test No Deadline Event",
+            date=self.tomorrow,
+            location="Test Location",
+            description="Test Description",
+        )
+        today_event = RunningEvent.objects.create(
+            name="Test Today Event",
+            date=self.tomorrow,
+            location="Test Location",
+            description="Test Description",
+            registration_deadline=self.today,
+        )
+
+        open_events = set(RunningEvent.objects.registration_open())
+        for event in RunningEvent.objects.all():
+            self.assertEqual(event in open_events, event.is_registration_open())
+        self.assertIn(no_deadline_event, open_events)
+        self.assertIn(today_event, open_events)
+
+    def test_with_available_spots_queryset(self):
+        """Test that with_available_spots() matches get_available_spots()."""
+        for i in range(3):
+            Participant.objects.create(
+                event=self.limited_event,
+                name=f"Test Participant {i}",
+                department="Test Department",
+                year_of_birth=2000,
+                tshirt_size="M",
+                email=f"test{i}@example.com",
+                on_waiting_list=i >= 2,
+            )
+
+        for event in RunningEvent.objects.with_available_spots():
+            self.assertEqual(event.available_spots, event.get_available_spots())
+
+    def test_with_available_spots_unlimited(self):
+        """Test that events without a limit get no number of available spots."""
+        zero_event = RunningEvent.objects.create(
+            name="Test Zero Event",
+            date=self.tomorrow,
+            location="Test Location",
+            description="Test Description",
+            max_participants=0,
+        )
+        # Registrations on unlimited events must not turn into a negative limit
+        RunningEvent.objects.filter(pk__in=[self.open_event.pk, zero_event.pk]).update(
+            registered_count=5
+        )
+
+        events = RunningEvent.objects.with_available_spots().in_bulk()
+        self.assertIsNone(events[self.open_event.pk].available_spots)
+        self.assertIsNone(events[zero_event.pk].available_spots)
+        self.assertEqual(events[self.limited_event.pk].available_spots, 2)
+        self.assertEqual(
+            list(
+                RunningEvent.objects.with_available_spots()
+                .filter(available_spots__isnull=True)
+                .order_by("pk")
+            ),
+            [self.open_event, self.closed_event, zero_event],
+        )
+
 
 class ParticipantModelTest(TestCase):
     """Test case for the Participant model."""
@@ -142,3 +211,392 @@ class ParticipantModelTest(TestCase):
         )
 
         self.assertTrue(waiting_participant.on_waiting_list)
+
+
+class ParticipantCountersTest(TestCase):
+    """Test case for the denormalized participant counters of RunningEvent."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Test Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=2,
+        )
+        self.other_event = RunningEvent.objects.create(
+            name="Other Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+        )
+
+    def create_participant(self, name, **kwargs):
+        """Create a participant for the test event."""
+        defaults = {
+            "event": self.event,
+            "department": "Test Department",
+            "year_of_birth": 2000,
+            "tshirt_size": "M",
+            "email": "test@example.com",
+        }
+        defaults.update(kwargs)
+        return Participant.objects.create(name=name, **defaults)
+
+    def assertCounts(self, event, registered, waiting):
+        """Assert the counters of an event as stored in the database."""
+        event.refresh_from_db()
+        self.assertEqual((event.registered_count, event.waitlist_count), (registered, waiting))
+
+    def test_counts_on_create(self):
+        """Test that creating participants increments the matching counter."""
+        self.create_participant("Registered")
+        self.create_participant("Waiting", on_waiting_list=True)
+        self.assertCounts(self.event, 1, 1)
+        self.assertEqual(self.event.get_available_spots(), 1)
+
+    def test_save_keeps_counts(self):
+        """Test that saving an outdated event instance keeps concurrent counter changes."""
+        stale = RunningEvent.objects.get(pk=self.event.pk)
+        self.create_participant("Registered")
+        self.create_participant("Waiting", on_waiting_list=True)
+
+        stale.name = "Renamed Event"
+        stale.save()
+        self.assertCounts(self.event, 1, 1)
+        self.assertEqual(self.event.name, "Renamed Event")
+
+    def test_counts_on_delete(self):
+        """Test that deleting participants decrements the matching counter."""
+        registered = self.create_participant("Registered")
+        self.create_participant("Waiting", on_waiting_list=True)
+
+        registered.delete()
+        self.assertCounts(self.event, 0, 1)
+
+        Participant.objects.filter(event=self.event).delete()
+        self.assertCounts(self.event, 0, 0)
+
+    def test_counts_on_waiting_list_change(self):
+        """Test that moving a participant on or off the waiting list moves the count."""
+        self.create_participant("Waiting", on_waiting_list=True)
+
+        participant = Participant.objects.get(name="Waiting")
+        participant.on_waiting_list = False
+        participant.save()
+        self.assertCounts(self.event, 1, 0)
+
+        # Saving again without a change must not count twice
+        participant.save()
+        self.assertCounts(self.event, 1, 0)
+
+        participant.on_waiting_list = True
+        participant.save()
+        self.assertCounts(self.event, 0, 1)
+
+    def test_counts_on_event_change(self):
+        """Test that moving a participant to another event moves the count."""
+        participant = self.create_participant("Mover")
+        participant.event = self.other_event
+        participant.save()
+        self.assertCounts(self.event, 0, 0)
+        self.assertCounts(self.other_event, 1, 0)
+
+    def test_register(self):
+        """Test that register() assigns spots until the event is full."""
+        participants = [
+            self.event.register(
+                Participant(name=f"Runner {i}", department="Dept", year_of_birth=2000)
+            )
+            for i in range(3)
+        ]
+        self.assertEqual([p.on_waiting_list for p in participants], [False, False, True])
+        self.assertCounts(self.event, 2, 1)
+
+    def test_register_duplicate(self):
+        """Test that a duplicate registration is rejected without touching the counters."""
+        existing = self.create_participant("Runner")
+        duplicate = Participant(name="Runner", department="Test Department", year_of_birth=2000)
+
+        with self.assertRaises(IntegrityError):
+            self.event.register(duplicate)
+        self.assertCounts(self.event, 1, 0)
+        self.assertEqual(duplicate.get_existing_registration(), existing)
+
+    def test_register_batch(self):
+        """Test that register_batch() assigns spots in list order."""
+        self.create_participant("Registered")
+        participants = self.event.register_batch(
+            [
+                Participant(name=f"Runner {i}", department="Dept", year_of_birth=2000)
+                for i in range(3)
+            ]
+        )
+        self.assertEqual([p.on_waiting_list for p in participants], [False, True, True])
+        self.assertTrue(all(p.pk for p in participants))
+        self.assertCounts(self.event, 2, 2)
+
+    def test_rebuild_participant_counts(self):
+        """Test that the counters can be rebuilt from the participants table."""
+        self.create_participant("Registered")
+        self.create_participant("Waiting", on_waiting_list=True)
+        RunningEvent.objects.update(registered_count=0, waitlist_count=7)
+
+        self.assertEqual(RunningEvent.objects.rebuild_participant_counts(), 2)
+        self.assertCounts(self.event, 1, 1)
+        self.assertCounts(self.other_event, 0, 0)
+
+
+class WaitingListRebalancingTest(TestCase):
+    """Test case for moving participants between the waiting list and the spots."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Test Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=2,
+        )
+        self.participants = [
+            self.event.register(
+                Participant(name=f"Runner {i}", department="Dept", year_of_birth=2000)
+            )
+            for i in range(5)
+        ]
+
+    def waiting_names(self):
+        """Return the names of the waiting participants."""
+        return set(
+            Participant.objects.filter(event=self.event, on_waiting_list=True).values_list(
+                "name", flat=True
+            )
+        )
+
+    def test_nothing_to_do(self):
+        """Test that a balanced event is left untouched."""
+        self.assertFalse(self.event.needs_rebalancing())
+        with self.assertNumQueries(1):
+            self.assertEqual(self.event.rebalance_waiting_list(), (0, 0))
+
+    def test_promotes_oldest_waiting_participants(self):
+        """Test that freed spots go to the longest waiting participants."""
+        self.participants[0].delete()
+
+        self.assertEqual(self.event.rebalance_waiting_list(), (1, 0))
+        self.assertEqual(self.waiting_names(), {"Runner 3", "Runner 4"})
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (2, 2))
+
+    def test_raised_capacity(self):
+        """Test that raising the capacity promotes as many participants as fit."""
+        RunningEvent.objects.filter(pk=self.event.pk).update(max_participants=4)
+
+        self.assertEqual(self.event.rebalance_waiting_list(), (2, 0))
+        self.assertEqual(self.waiting_names(), {"Runner 4"})
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (4, 1))
+
+    def test_removed_capacity(self):
+        """Test that removing the limit promotes everybody."""
+        RunningEvent.objects.filter(pk=self.event.pk).update(max_participants=None)
+
+        self.assertEqual(self.event.rebalance_waiting_list(), (3, 0))
+        self.assertEqual(self.waiting_names(), set())
+
+    def test_reduced_capacity(self):
+        """Test that reducing the capacity demotes the latest registrations."""
+        RunningEvent.objects.filter(pk=self.event.pk).update(max_participants=1)
+
+        self.assertEqual(self.event.rebalance_waiting_list(), (0, 1))
+        self.assertEqual(self.waiting_names(), {"Runner 1", "Runner 2", "Runner 3", "Runner 4"})
+        self.assertEqual((self.event.registered_count, self.event.waitlist_count), (1, 4))
+
+    def test_query_count_independent_of_waiting_list_size(self):
+        """Test that rebalancing is set-based."""
+        self.event.register_batch(
+            [
+                Participant(name=f"Waiting {i}", department="Dept", year_of_birth=2000)
+                for i in range(200)
+            ]
+        )
+        RunningEvent.objects.filter(pk=self.event.pk).update(max_participants=150)
+
+        # Three of them collect and update the statistics of the one moved department
+        with self.assertNumQueries(10):
+            self.assertEqual(self.event.rebalance_waiting_list(), (148, 0))
+        self.assertEqual(
+            Participant.objects.filter(event=self.event, on_waiting_list=False).count(), 150
+        )
+
+
+class DepartmentStatisticTest(TestCase):
+    """Test case for the incrementally maintained department statistics."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Test Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=2,
+        )
+
+    def statistics(self):
+        """Return all statistics as (event id, department) -> (registered, waiting list)."""
+        return {
+            (row.event_id, row.department): (row.registered_count, row.waitlist_count)
+            for row in DepartmentStatistic.objects.all()
+            if row.registered_count or row.waitlist_count
+        }
+
+    def test_registrations_are_counted(self):
+        """Test that registrations count for the event and across all events."""
+        self.event.register(Participant(name="A", department="Sales", year_of_birth=2000))
+        self.event.register_batch(
+            [
+                Participant(name="B", department="IT", year_of_birth=2000),
+                Participant(name="C", department="Sales", year_of_birth=2000),
+            ]
+        )
+        self.assertEqual(
+            self.statistics(),
+            {
+                (self.event.pk, "Sales"): (1, 1),
+                (self.event.pk, "IT"): (1, 0),
+                (None, "Sales"): (1, 1),
+                (None, "IT"): (1, 0),
+            },
+        )
+
+    def test_changes_and_deletes_are_counted(self):
+        """Test that edits, moves and deletions adjust the statistics."""
+        first = self.event.register(Participant(name="A", department="Sales", year_of_birth=2000))
+        second = self.event.register(Participant(name="B", department="Sales", year_of_birth=2000))
+        self.event.register(Participant(name="C", department="IT", year_of_birth=2000))
+
+        second.department = "IT"
+        second.save()
+        first.delete()
+        self.event.rebalance_waiting_list()
+
+        self.assertEqual(self.statistics(), {(self.event.pk, "IT"): (2, 0), (None, "IT"): (2, 0)})
+
+    def test_statistics_locked_in_department_order(self):
+        """Test that the statistics are adjusted in department order, avoiding deadlocks."""
+        departments = ["Sales", "IT", "Legal", "HR"]
+        adjust = DepartmentStatistic.objects.adjust
+        with mock.patch.object(
+            DepartmentStatistic.objects, "adjust", side_effect=adjust
+        ) as adjusted:
+            self.event.register_batch(
+                [
+                    Participant(name=f"Runner {i}", department=department, year_of_birth=2000)
+                    for i, department in enumerate(departments)
+                ]
+            )
+            RunningEvent.objects.filter(pk=self.event.pk).update(max_participants=4)
+            self.event.rebalance_waiting_list()
+            moved = Participant.objects.get(department="Sales")
+            moved.department = "Finance"
+            moved.save()
+        self.assertEqual(
+            [call.args[1] for call in adjusted.call_args_list],
+            sorted(departments) + ["HR", "Legal"] + ["Finance", "Sales"],
+        )
+
+    def test_rebuild_matches_incremental_counts(self):
+        """Test that a rebuild reproduces the incrementally maintained statistics."""
+        other_event = RunningEvent.objects.create(
+            name="Other Event", date=timezone.now().date(), location="Park", max_participants=1
+        )
+        for event in (self.event, other_event):
+            event.register_batch(
+                [
+                    Participant(name=f"Runner {i}", department=f"Dept {i % 2}", year_of_birth=2000)
+                    for i in range(5)
+                ]
+            )
+        Participant.objects.filter(name="Runner 0").first().delete()
+        incremental = self.statistics()
+
+        self.assertEqual(DepartmentStatistic.objects.rebuild(), 6)
+        self.assertEqual(self.statistics(), incremental)
+        self.assertEqual(incremental[(None, "Dept 1")], (1, 3))
+
+    def test_deleting_event(self):
+        """Test that deleting an event removes its participants from the totals."""
+        self.event.register(Participant(name="A", department="Sales", year_of_birth=2000))
+        self.event.delete()
+        self.assertEqual(self.statistics(), {})
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "SQLite concurrency options")
+class SQLiteConcurrencyTest(TransactionTestCase):
+    """Test case for many registrations written to SQLite in parallel."""
+
+    threads = 16
+    registrations_per_thread = 10
+
+    def test_connection_options(self):
+        """Test that new connections use WAL with immediate write transactions."""
+        new_connection = connections.create_connection("default")
+        try:
+            with new_connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], "wal")
+                cursor.execute("PRAGMA synchronous")
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                cursor.execute("PRAGMA busy_timeout")
+                self.assertEqual(cursor.fetchone()[0], 20000)
+            self.assertEqual(new_connection.transaction_mode, "IMMEDIATE")
+        finally:
+            new_connection.close()
+
+    def register(self, event, thread, barrier, errors):
+        """Register participants from one thread, reading before writing each time."""
+        try:
+            barrier.wait()
+            for index in range(self.registrations_per_thread):
+                participant = Participant(
+                    name=f"Runner {thread}-{index}",
+                    department=f"Department {index % 3}",
+                    year_of_birth=1990,
+                )
+                participant.event = event
+                # A read before the write used to fail with "database is locked"
+                # when another connection wrote in between
+                with transaction.atomic():
+                    if participant.get_existing_registration() is None:
+                        event.register(participant)
+        except Exception as exc:  # Collected and asserted in the main thread
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_parallel_registrations(self):
+        """Test that parallel registrations all complete without lock errors."""
+        event = RunningEvent.objects.create(
+            name="Rush Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            max_participants=50,
+        )
+        barrier = threading.Barrier(self.threads + 1)
+        errors = []
+        threads = [
+            threading.Thread(target=self.register, args=(event, thread, barrier, errors))
+            for thread in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.threads * self.registrations_per_thread
+        event.refresh_from_db()
+        self.assertEqual(Participant.objects.filter(event=event).count(), total)
+        self.assertEqual((event.registered_count, event.waitlist_count), (50, total - 50))
@@ -0,0 +1,186 @@
+"""Tests for the email outbox of the runs application."""
+
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from runs.models import OutgoingEmail, Participant, RunningEvent
+from runs.outbox import send_batch
+
+
+class FlakyBackend(EmailBackend):
+    """Email backend that counts connections and rejects some recipients."""
+
+    opened = 0
+    rejected = {"bounce@example.com"}
+
+    def open(self):
+        """Count the connections opened; an open connection is reused."""
+        if not getattr(self, "connected", False):
+            self.connected = True
+            FlakyBackend.opened += 1
+
+    def close(self):
+        """Close the connection."""
+        self.connected = False
+
+    def send_messages(self, messages):
+        """Fail for rejected recipients and keep the other messages."""
+        if any(set(message.to) & self.rejected for message in messages):
+            raise ConnectionError("Recipient rejected")
+        return super().send_messages(messages)
+
+
+class OutboxTestMixin:
+    """Create an event with one spot."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Mail Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Town Hall",
+            max_participants=1,
+        )
+
+    def participant(self, name, email=None):
+        """Return an unsaved participant."""
+        return Participant(
+            name=name,
+            department="Dept",
+            year_of_birth=2000,
+            tshirt_size="M",
+            email=email or f"{name.lower()}@example.com",
+        )
+
+
+class QueueConfirmationTest(OutboxTestMixin, TestCase):
+    """Test case for queueing registration confirmations."""
+
+    def test_registration_form_queues_confirmation(self):
+        """Test that a registration through the form queues one confirmation."""
+        data = {
+            "name": "Anna",
+            "department": "Dept",
+            "year_of_birth": 2000,
+            "tshirt_size": "M",
+            "email": "anna@example.com",
+        }
+        url = reverse("event_detail", args=[self.event.pk])
+        self.client.post(url, data, HTTP_ACCEPT_LANGUAGE="en")
+        self.client.post(url, data, HTTP_ACCEPT_LANGUAGE="en")
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipient, "anna@example.com")
+        self.assertEqual(email.subject, "Registration for Mail Event")
+        self.assertIn("Town Hall", email.body)
+        self.assertEqual(email.participant.name, "Anna")
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(REGISTRATION_BATCHING=True, REGISTRATION_BATCH_WINDOW=0)
+    def test_batched_registration_queues_confirmation(self):
+        """Test that batched registrations are confirmed as well."""
+        self.client.post(
+            reverse("event_detail", args=[self.event.pk]),
+            {
+                "name": "Anna",
+                "department": "Dept",
+                "year_of_birth": 2000,
+                "tshirt_size": "M",
+                "email": "anna@example.com",
+            },
+        )
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_waiting_list_and_language(self):
+        """Test that confirmations tell about the waiting list in the active language."""
+        self.event.register(self.participant("Anna"), confirm=True)
+        with translation.override("de"):
+            self.event.register(self.participant("Ben"), confirm=True)
+        email = OutgoingEmail.objects.get(recipient="ben@example.com")
+        self.assertEqual(email.subject, "Warteliste für Mail Event")
+
+    def test_rolled_back_with_registration(self):
+        """Test that no confirmation is queued for a rejected duplicate."""
+        self.event.register(self.participant("Anna"), confirm=True)
+        with self.assertRaises(IntegrityError):
+            self.event.register_batch(
+                [self.participant("Ben"), self.participant("Anna")], confirm=True
+            )
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_not_queued_by_default(self):
+        """Test that imports and other registrations do not send emails."""
+        self.event.register_batch([self.participant("Anna"), self.participant("Ben")])
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+
+@override_settings(
+    EMAIL_BACKEND="runs.tests.test_outbox.FlakyBackend",
+    EMAIL_OUTBOX_RETRY_DELAY=60,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+)
+class SendBatchTest(OutboxTestMixin, TestCase):
+    """Test case for the delivery of the outbox."""
+
+    def setUp(self):
+        """Set up test data."""
+        super().setUp()
+        FlakyBackend.opened = 0
+        self.event.register_batch(
+            [self.participant(name) for name in ("Anna", "Ben", "Bounce", "Carl")], confirm=True
+        )
+
+    def test_one_connection_per_batch(self):
+        """Test that a batch is sent over one connection and failures are retried later."""
+        self.assertEqual(send_batch(), (3, 1))
+        self.assertEqual(len(mail.outbox), 3)
+        # Once for the batch and once more after the failure
+        self.assertEqual(FlakyBackend.opened, 2)
+
+        failed = OutgoingEmail.objects.get(sent_at__isnull=True)
+        self.assertEqual(failed.recipient, "bounce@example.com")
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.last_error, "ConnectionError: Recipient rejected")
+        self.assertAlmostEqual(
+            failed.next_attempt_at,
+            timezone.now() + timedelta(seconds=60),
+            delta=timedelta(seconds=5),
+        )
+        self.assertEqual(send_batch(), (0, 0))
+
+    def test_backoff_and_give_up(self):
+        """Test that retries wait twice as long each time until attempts run out."""
+        send_batch()
+        failed = OutgoingEmail.objects.filter(sent_at__isnull=True)
+        for attempts, delay in ((2, 120), (3, 240)):
+            failed.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_batch(), (0, 1))
+            email = failed.get()
+            self.assertEqual(email.attempts, attempts)
+            self.assertAlmostEqual(
+                email.next_attempt_at,
+                timezone.now() + timedelta(seconds=delay),
+                delta=timedelta(seconds=5),
+            )
+        failed.update(next_attempt_at=timezone.now())
+        self.assertFalse(OutgoingEmail.objects.due().exists())
+
+    def test_batch_size(self):
+        """Test that a batch sends at most batch_size emails, oldest first."""
+        self.assertEqual(send_batch(2), (2, 0))
+        self.assertEqual(mail.outbox[0].to, ["anna@example.com"])
+
+    def test_command(self):
+        """Test that the command drains the outbox in batches."""
+        out = StringIO()
+        call_command("send_emails", "--batch-size", "2", stdout=out)
+        self.assertIn("Sent 3 emails, 1 failed.", out.getvalue())
+        self.assertEqual(FlakyBackend.opened, 3)
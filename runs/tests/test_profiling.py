@@ -0,0 +1,97 @@
+"""Tests for the request profiling of the runs application."""
+
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.models import RunningEvent
+
+
+class ProfilingTest(TestCase):
+    """Test case for the profiling middleware and the profile pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.event = RunningEvent.objects.create(
+            name="Profiled Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+        )
+        cls.user = User.objects.create_user("staff", is_staff=True)
+
+    def setUp(self):
+        """Store the profiles in a temporary directory."""
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(PROFILING_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.url = reverse("event_detail", args=[self.event.pk])
+
+    def profiles(self):
+        """Return the stored request details, oldest first."""
+        return [json.loads(path.read_text()) for path in sorted(self.directory.glob("*.json"))]
+
+    def test_requested_by_staff(self):
+        """Test that staff members can profile a request and inspect the profile."""
+        self.client.force_login(self.user)
+        self.client.get(self.url, {"_profile": "1"})
+        self.client.get(self.url, HTTP_X_PROFILE="1")
+        self.client.get(self.url)
+
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 2)
+        profile = profiles[0]
+        self.assertEqual(profile["trigger"], "requested")
+        self.assertEqual(profile["view"], "event_detail")
+        self.assertEqual(profile["queries"], len(profile["statements"]))
+        self.assertIn("runs_runningevent", profile["statements"][-1]["sql"])
+
+        response = self.client.get(reverse("profile_list"))
+        self.assertContains(response, reverse("profile_detail", args=[profile["name"]]))
+        response = self.client.get(reverse("profile_detail", args=[profile["name"]]))
+        self.assertContains(response, "cumulative")
+        response = self.client.get(reverse("profile_download", args=[profile["name"]]))
+        self.assertEqual(
+            response["Content-Disposition"], f'attachment; filename="{profile["name"]}.prof"'
+        )
+
+    def test_not_requested_by_visitors(self):
+        """Test that visitors cannot profile requests or see profiles."""
+        self.client.get(self.url, {"_profile": "1"})
+        self.assertEqual(self.profiles(), [])
+        self.assertEqual(self.client.get(reverse("profile_list")).status_code, 302)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_KEEP=2)
+    def test_sampled_and_pruned(self):
+        """Test that sampled requests are profiled and only the newest profiles kept."""
+        for _ in range(3):
+            self.client.get(self.url)
+        profiles = self.profiles()
+        self.assertEqual([profile["trigger"] for profile in profiles], ["sampled", "sampled"])
+        self.assertEqual(len(list(self.directory.glob("*.prof"))), 2)
+
+    def test_unknown_profile(self):
+        """Test that only generated profile names are looked up."""
+        self.client.force_login(self.user)
+        for name in ("missing", "20260101T000000-00000000"):
+            response = self.client.get(reverse("profile_detail", args=[name]))
+            self.assertEqual(response.status_code, 404)
+
+    async def test_async_request(self):
+        """Test that requests served by async views are profiled with their SQL."""
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        await client.get(self.url, {"_profile": "1"})
+        profiles = await sync_to_async(self.profiles)()
+        self.assertEqual(len(profiles), 1)
+        self.assertGreater(profiles[0]["queries"], 0)
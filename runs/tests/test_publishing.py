@@ -0,0 +1,114 @@
+"""Tests for the static publication of the runs application."""
+
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from runs import publishing
+from runs.cache import CSRF_TOKEN_PLACEHOLDER
+from runs.models import Participant, RunningEvent
+
+
+class PublishingTest(TestCase):
+    """Test case for publishing the public pages and removing changed ones."""
+
+    def setUp(self):
+        """Set up test data and publish to a temporary directory."""
+        today = timezone.now().date()
+        self.event = RunningEvent.objects.create(
+            name="Published Event", date=today + timedelta(days=7), location="Park"
+        )
+        self.past_event = RunningEvent.objects.create(
+            name="Past Event", date=today - timedelta(days=7), location="Park"
+        )
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(PUBLISHED_PAGES_DIR=str(self.directory))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def page(self, language, pk=None):
+        """Return the published page, or None if it is not published."""
+        path = self.directory / language / publishing.get_page_url(pk).strip("/") / "index.html"
+        return path.read_text() if path.exists() else None
+
+    def test_publish(self):
+        """Test that the list and upcoming events are published in every language."""
+        stdout = StringIO()
+        call_command("publish_pages", stdout=stdout)
+        self.assertIn("Published 4 pages, removed 0.", stdout.getvalue())
+
+        self.assertIn("Verfügbare Laufveranstaltungen", self.page("de"))
+        self.assertIn("Available Running Events", self.page("en"))
+        detail = self.page("en", self.event.pk)
+        self.assertIn("Registration Form", detail)
+        self.assertIn('name="csrfmiddlewaretoken" value=""', detail)
+        self.assertNotIn(CSRF_TOKEN_PLACEHOLDER, detail)
+        self.assertIsNone(self.page("en", self.past_event.pk))
+
+    def test_changes_unpublish(self):
+        """Test that registrations remove the affected pages until they are republished."""
+        publishing.publish_pages()
+        other = RunningEvent.objects.create(
+            name="Other Event", date=timezone.now().date(), location="Park"
+        )
+        publishing.publish_pages()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Participant.objects.create(
+                event=self.event,
+                name="Jane Doe",
+                department="IT",
+                year_of_birth=1990,
+                tshirt_size="M",
+                email="jane@example.com",
+            )
+        for language in ("de", "en"):
+            self.assertIsNone(self.page(language))
+            self.assertIsNone(self.page(language, self.event.pk))
+            self.assertIsNotNone(self.page(language, other.pk))
+
+        self.assertEqual(publishing.publish_pages(missing_only=True), (4, 0))
+        self.assertIsNotNone(self.page("de", self.event.pk))
+
+    def test_removed_events_unpublished(self):
+        """Test that pages of events no longer published are removed."""
+        publishing.publish_pages()
+        RunningEvent.objects.filter(pk=self.event.pk).update(date=self.past_event.date)
+        self.assertEqual(publishing.publish_pages(), (2, 2))
+        self.assertIsNone(self.page("de", self.event.pk))
+
+    def test_changed_while_rendering(self):
+        """Test that a page is not published if its event changed while it was rendered."""
+        render_page = publishing.render_page
+
+        def render_and_change(language, pk=None):
+            content = render_page(language, pk)
+            RunningEvent.objects.filter(pk=pk).update(updated_at=timezone.now())
+            return content
+
+        with mock.patch.object(publishing, "render_page", render_and_change):
+            self.assertFalse(publishing.publish_page("de", self.event.pk))
+        self.assertIsNone(self.page("de", self.event.pk))
+        self.assertEqual(list(self.directory.rglob(".*")), [])
+
+    def test_csrf_token(self):
+        """Test that forms of published pages can fetch a token with the cookie."""
+        response = self.client.get(reverse("csrf_token"))
+        self.assertTrue(response.json()["token"])
+        self.assertIn("csrftoken", response.cookies)
+
+    @override_settings(PUBLISHED_PAGES_DIR=None)
+    def test_disabled(self):
+        """Test that publishing requires a directory and changes are ignored without one."""
+        with self.assertRaises(CommandError):
+            call_command("publish_pages")
+        publishing.unpublish_event(self.event.pk)
@@ -0,0 +1,138 @@
+"""Tests for the participant reports of the runs application."""
+
+import csv
+import io
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from runs.models import Participant, RunningEvent
+from runs.reports import tshirt_size_report
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class TshirtSizeReportTest(TestCase):
+    """Test case for the t-shirt size report."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.event = RunningEvent.objects.create(
+            name="Shirt Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            max_participants=3,
+        )
+        self.event.register_batch(
+            [
+                Participant(
+                    name=f"Runner {i}", department="Dept", year_of_birth=2000, tshirt_size=size
+                )
+                for i, size in enumerate(["M", "M", "L", "M", "XS"])
+            ]
+        )
+
+    def sizes(self, report):
+        """Return the (registered, waiting list) counts of the report by size."""
+        return {
+            entry["size"]: (entry["registered"], entry["waiting_list"]) for entry in report["sizes"]
+        }
+
+    def test_counts_split_by_waiting_list(self):
+        """Test that every size is counted for registered and waiting participants."""
+        report = tshirt_size_report(self.event.pk)
+        self.assertEqual(
+            self.sizes(report),
+            {
+                "XS": (0, 1),
+                "S": (0, 0),
+                "M": (2, 1),
+                "L": (1, 0),
+                "XL": (0, 0),
+                "XXL": (0, 0),
+                "NO": (0, 0),
+            },
+        )
+        self.assertEqual(report["total"], {"registered": 3, "waiting_list": 2, "total": 5})
+        self.assertEqual(report["event"], {"id": self.event.pk, "name": "Shirt Event"})
+
+    def test_cached_until_participants_change(self):
+        """Test that the report is served from the cache until a participant changes."""
+        with self.assertNumQueries(2):
+            tshirt_size_report(self.event.pk)
+        with self.assertNumQueries(0):
+            tshirt_size_report(self.event.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.register(
+                Participant(
+                    name="Late Runner", department="Dept", year_of_birth=2000, tshirt_size="XL"
+                )
+            )
+
+        self.assertEqual(self.sizes(tshirt_size_report(self.event.pk))["XL"], (0, 1))
+
+    def test_missing_event(self):
+        """Test that there is no report for a missing event."""
+        self.assertIsNone(tshirt_size_report(self.event.pk + 100))
+
+
+class TshirtSizeReportViewTest(TestCase):
+    """Test case for the t-shirt size report endpoint and admin page."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Shirt Event", date=timezone.now().date() + timedelta(days=1), location="Park"
+        )
+        self.event.register(
+            Participant(name="Runner", department="Dept", year_of_birth=2000, tshirt_size="S")
+        )
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def url(self, format):
+        """Return the report URL of the test event."""
+        return reverse("tshirt_size_report", args=[self.event.pk, format])
+
+    def test_requires_staff(self):
+        """Test that anonymous visitors are sent to the login page."""
+        response = self.client.get(self.url("json"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_json(self):
+        """Test the JSON report."""
+        self.client.force_login(self.user)
+        response = self.client.get(self.url("json"))
+        self.assertEqual(response.json()["total"], {"registered": 1, "waiting_list": 0, "total": 1})
+
+    def test_csv(self):
+        """Test the CSV report."""
+        self.client.force_login(self.user)
+        response = self.client.get(self.url("csv"))
+        rows = list(csv.reader(io.StringIO(response.content.decode())))
+        self.assertEqual(rows[0], ["size", "label", "registered", "waiting_list", "total"])
+        self.assertEqual(rows[2][:3], ["S", "S", "1"])
+        self.assertEqual(rows[-1], ["", "", "1", "0", "1"])
+
+    def test_unknown_format_and_event(self):
+        """Test that unknown formats and events return 404."""
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url("xml")).status_code, 404)
+        response = self.client.get(
+            reverse("tshirt_size_report", args=[self.event.pk + 100, "json"])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_admin_page(self):
+        """Test the report page in the event admin."""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("admin:runs_runningevent_tshirt_sizes", args=[self.event.pk]),
+            HTTP_ACCEPT_LANGUAGE="en",
+        )
+        self.assertContains(response, "T-shirt sizes: Shirt Event")
+        self.assertContains(response, self.url("csv"))
@@ -0,0 +1,100 @@
+"""Tests for the static asset pipeline of the runs application."""
+
+import gzip
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "runs.storage.CompressedManifestStaticFilesStorage"},
+}
+
+
+class StaticAssetTest(TestCase):
+    """Test case for collecting, compressing and serving the static files."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Collect the static files into a temporary directory once."""
+        super().setUpClass()
+        cls.static_root = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        settings = override_settings(STATIC_ROOT=cls.static_root, STORAGES=STORAGES)
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_pages_use_hashed_assets(self):
+        """Test that pages link the vendored, content-hashed stylesheets only."""
+        content = self.client.get(reverse("event_list")).content.decode()
+        self.assertIn(staticfiles_storage.url("runs/css/firmenlauf.css"), content)
+        self.assertRegex(content, r"/static/runs/css/firmenlauf\.[0-9a-f]{12}\.css")
+        self.assertNotIn("<style>", content)
+        self.assertNotIn("cdn.jsdelivr.net", content)
+
+    def test_precompressed(self):
+        """Test that collectstatic writes gzip copies of the text assets only."""
+        name = staticfiles_storage.stored_name("runs/vendor/bootstrap/css/bootstrap.min.css")
+        original = (self.static_root / name).read_bytes()
+        compressed = (self.static_root / f"{name}.gz").read_bytes()
+        self.assertEqual(gzip.decompress(compressed), original)
+        self.assertLess(len(compressed), len(original) / 4)
+        other = staticfiles_storage.stored_name("admin/img/LICENSE")
+        self.assertFalse((self.static_root / f"{other}.gz").exists())
+
+    def test_serve(self):
+        """Test that hashed files are served compressed and cached for a year."""
+        url = staticfiles_storage.url("runs/css/firmenlauf.css")
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertNotIn("Content-Language", response)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertIn(b"--magenta-primary", gzip.decompress(b"".join(response.streaming_content)))
+
+        response = self.client.get(url)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertIn(b"--magenta-primary", b"".join(response.streaming_content))
+
+        response = self.client.get("/static/runs/css/firmenlauf.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+
+    def test_accept_encoding_quality(self):
+        """Test that gzip is only sent if the browser accepts it with a quality above zero."""
+        url = staticfiles_storage.url("runs/css/firmenlauf.css")
+        for accept_encoding, gzipped in (
+            ("gzip;q=0, br", False),
+            ("GZIP; q=0.5", True),
+            ("*", True),
+            ("*, gzip;q=0", False),
+            ("identity", False),
+        ):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertEqual("Content-Encoding" in response, gzipped, accept_encoding)
+
+    def test_not_modified(self):
+        """Test that unhashed files are revalidated with their modification time."""
+        response = self.client.get("/static/runs/css/firmenlauf.css")
+        last_modified = response["Last-Modified"]
+        response = self.client.get(
+            "/static/runs/css/firmenlauf.css", HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        response = self.client.get(
+            "/static/runs/css/firmenlauf.css",
+            HTTP_IF_MODIFIED_SINCE="Thu, 01 Jan 2015 00:00:00 GMT",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_serve_missing(self):
+        """Test that only files inside STATIC_ROOT are served."""
+        for path in ("/static/runs/missing.css", "/static/runs/", "/static/../manage.py"):
+            self.assertEqual(self.client.get(path).status_code, 404, path)
@@ -1,12 +1,24 @@
 """Tests for the views of the runs application."""
 
+import csv
+import io
+import threading
 from datetime import timedelta
 
-from django.test import Client, TestCase
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
-from runs.models import Participant, RunningEvent
+from runs.exports import EXPORT_CHUNK_SIZE, participant_csv_rows
+from runs.models import OutgoingEmail, Participant, RunningEvent
+from runs.views import (
+    AlreadyRegisteredView,
+    RegistrationSuccessView,
+    RunningEventDetailView,
+    RunningEventListView,
+)
 
 
 class RunningEventListViewTest(TestCase):
@@ -85,6 +97,58 @@ class RunningEventListViewTest(TestCase):
             if event.max_participants:
                 self.assertTrue(hasattr(event, "available_spots"))
 
+    def test_available_spots_counts_only_registered_participants(self):
+        """Test that waiting list participants do not reduce the available spots."""
+        Participant.objects.create(
+            event=self.limited_event,
+            name="Registered Participant",
+            department="Test Department",
+            year_of_birth=2000,
+            tshirt_size="M",
+            email="registered@example.com",
+        )
+        Participant.objects.create(
+            event=self.limited_event,
+            name="Waiting Participant",
+            department="Test Department",
+            year_of_birth=2001,
+            tshirt_size="L",
+            email="waiting@example.com",
+            on_waiting_list=True,
+        )
+
+        response = self.client.get(reverse("event_list"))
+        events = {event.pk: event for event in response.context["events"]}
+        self.assertEqual(events[self.limited_event.pk].available_spots, 1)
+        self.assertIsNone(events[self.open_event.pk].available_spots)
+
+    def test_query_count_independent_of_data_volume(self):
+        """Test that the number of queries does not grow with events or participants."""
+        # One query for the conditional GET validators, one for the events
+        self.client.get(reverse("event_list"))  # Warm up session and translation machinery
+        with self.assertNumQueries(2):
+            self.client.get(reverse("event_list"))
+
+        for i in range(5):
+            event = RunningEvent.objects.create(
+                name=f"Extra Event {i}",
+                date=self.tomorrow,
+                location="Test Location",
+                description="Test Description",
+                max_participants=10,
+            )
+            Participant.objects.create(
+                event=event,
+                name=f"Participant {i}",
+                department="Test Department",
+                year_of_birth=2000,
+                tshirt_size="M",
+                email=f"participant{i}@example.com",
+            )
+
+        with self.assertNumQueries(2):
+            self.client.get(reverse("event_list"))
+
 
 class RunningEventDetailViewTest(TestCase):
     """Test case for the RunningEventDetailView."""
@@ -239,7 +303,8 @@ class RunningEventDetailViewTest(TestCase):
         )
 
         # Should redirect to already registered page
-        self.assertEqual(response.status_code, 302)
+        existing = Participant.objects.get(event=self.event, name="Duplicate Participant")
+        self.assertRedirects(response, reverse("already_registered", args=[existing.pk]))
 
         # Check that only one participant was created
         self.assertEqual(
@@ -251,3 +316,388 @@ class RunningEventDetailViewTest(TestCase):
             ).count(),
             1,
         )
+
+    @override_settings(REGISTRATION_BATCHING=True, REGISTRATION_BATCH_WINDOW=0)
+    def test_already_registered_batched(self):
+        """Test that the batched path also redirects duplicates to the existing registration."""
+        response = self.client.post(
+            reverse("event_detail", args=[self.limited_event.pk]),
+            {
+                "name": "Test Participant",
+                "department": "Test Department",
+                "year_of_birth": 2000,
+                "tshirt_size": "L",
+                "email": "different@example.com",
+            },
+        )
+        self.assertRedirects(response, reverse("already_registered", args=[self.participant.pk]))
+        self.assertEqual(Participant.objects.filter(event=self.limited_event).count(), 1)
+
+    def test_invalid_registration_rerenders_form(self):
+        """Test that an invalid submission shows the form with errors."""
+        response = self.client.post(
+            reverse("event_detail", args=[self.event.pk]),
+            {
+                "name": "",
+                "department": "Test Department",
+                "year_of_birth": 1800,
+                "tshirt_size": "M",
+                "email": "new@example.com",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors)
+        self.assertFalse(Participant.objects.filter(event=self.event).exists())
+
+
+class AsyncRegistrationFlowTest(TestCase):
+    """Test case for the public registration flow served by async views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data."""
+        cls.event = RunningEvent.objects.create(
+            name="Async Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=1,
+        )
+
+    def test_public_views_are_async(self):
+        """Test that the public views run natively under ASGI."""
+        for view in (
+            RunningEventListView,
+            RunningEventDetailView,
+            RegistrationSuccessView,
+            AlreadyRegisteredView,
+        ):
+            self.assertTrue(view.view_is_async, view.__name__)
+
+    async def test_registration_flow(self):
+        """Test registering and viewing the result with an async client."""
+        client = AsyncClient()
+        url = reverse("event_detail", args=[self.event.pk])
+        data = {
+            "name": "Async Runner",
+            "department": "Test Department",
+            "year_of_birth": 2000,
+            "tshirt_size": "M",
+            "email": "async@example.com",
+        }
+
+        response = await client.get(url)
+        self.assertContains(response, "Async Event")
+
+        response = await client.post(url, data)
+        participant = await Participant.objects.aget(name="Async Runner")
+        self.assertRedirects(
+            response,
+            reverse("registration_success", args=[participant.pk]),
+            fetch_redirect_response=False,
+        )
+        response = await client.get(response["Location"])
+        self.assertContains(response, "Async Runner")
+
+        response = await client.post(url, data)
+        self.assertEqual(response["Location"], reverse("already_registered", args=[participant.pk]))
+
+        response = await client.get(reverse("event_list"))
+        self.assertContains(response, "Async Event")
+
+
+class EventAvailabilityApiTest(TestCase):
+    """Test case for the read-only JSON API."""
+
+    def setUp(self):
+        """Set up test data."""
+        today = timezone.now().date()
+        self.event = RunningEvent.objects.create(
+            name="Open Event",
+            date=today + timedelta(days=7),
+            location="Test Location",
+            description="Test Description",
+            registration_deadline=today + timedelta(days=1),
+            max_participants=2,
+        )
+        self.event.register(Participant(name="Runner", department="Dept", year_of_birth=2000))
+        self.closed_event = RunningEvent.objects.create(
+            name="Closed Event",
+            date=today,
+            location="Test Location",
+            description="Test Description",
+            registration_deadline=today - timedelta(days=1),
+        )
+
+    def test_list_contains_open_events(self):
+        """Test that the list contains only events with open registration."""
+        response = self.client.get(reverse("api_event_list"))
+        self.assertEqual(
+            response.json(),
+            {
+                "events": [
+                    {
+                        "id": self.event.pk,
+                        "name": "Open Event",
+                        "date": self.event.date.isoformat(),
+                        "registration_deadline": self.event.registration_deadline.isoformat(),
+                        "registration_open": True,
+                        "max_participants": 2,
+                        "available_spots": 1,
+                    }
+                ]
+            },
+        )
+        self.assertNotIn(b": ", response.content)
+
+    def test_detail(self):
+        """Test the availability of a single event, including closed ones."""
+        response = self.client.get(reverse("api_event_detail", args=[self.closed_event.pk]))
+        self.assertFalse(response.json()["registration_open"])
+        self.assertIsNone(response.json()["available_spots"])
+
+        response = self.client.get(reverse("api_event_detail", args=[self.closed_event.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cache_headers_and_conditional_requests(self):
+        """Test that polls can be answered by caches or with 304 Not Modified."""
+        url = reverse("api_event_detail", args=[self.event.pk])
+        response = self.client.get(url)
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=15", response["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        self.event.register(Participant(name="Other", department="Dept", year_of_birth=2000))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.json()["available_spots"], 0)
+
+
+class ConcurrentRegistrationTest(TransactionTestCase):
+    """Test case for registrations submitted concurrently for the same event."""
+
+    max_participants = 5
+    registrations = 20
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Rush Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=self.max_participants,
+        )
+
+    def register(self, index, barrier, errors, name=None, language="en"):
+        """Submit one registration from its own thread and database connection."""
+        try:
+            client = Client(HTTP_ACCEPT_LANGUAGE=language)
+            barrier.wait()
+            response = client.post(
+                reverse("event_detail", args=[self.event.pk]),
+                {
+                    "name": name or f"Runner {index}",
+                    "department": "Test Department",
+                    "year_of_birth": 2000,
+                    "tshirt_size": "M",
+                    "email": f"runner{index}@example.com",
+                },
+            )
+            if response.status_code != 302:
+                errors.append(response.status_code)
+        except Exception as exc:  # Collected and asserted in the main thread
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def run_registrations(self, names=None, languages=None):
+        """Fire all registrations at once and return the errors they produced."""
+        names = names or [None] * self.registrations
+        languages = languages or ["en"] * len(names)
+        barrier = threading.Barrier(len(names))
+        errors = []
+        threads = [
+            threading.Thread(target=self.register, args=(i, barrier, errors, name, language))
+            for i, (name, language) in enumerate(zip(names, languages))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_concurrent_registrations_respect_max_participants(self):
+        """Test that concurrent registrations never overbook the event."""
+        errors = self.run_registrations()
+
+        self.assertEqual(errors, [])
+        participants = Participant.objects.filter(event=self.event)
+        self.assertEqual(participants.count(), self.registrations)
+        self.assertEqual(participants.filter(on_waiting_list=False).count(), self.max_participants)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registered_count, self.max_participants)
+        self.assertEqual(self.event.waitlist_count, self.registrations - self.max_participants)
+
+    def test_concurrent_duplicate_registrations(self):
+        """Test that simultaneous double clicks only register once."""
+        errors = self.run_registrations(names=["Double Clicker"] * 3)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            Participant.objects.filter(event=self.event, name="Double Clicker").count(), 1
+        )
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registered_count, 1)
+
+    @override_settings(REGISTRATION_BATCHING=True, REGISTRATION_BATCH_WINDOW=0.05)
+    def test_batched_registrations_respect_max_participants(self):
+        """Test that batched registrations seat the earliest participants only."""
+        errors = self.run_registrations()
+
+        self.assertEqual(errors, [])
+        participants = list(Participant.objects.filter(event=self.event).order_by("registered_at"))
+        self.assertEqual(len(participants), self.registrations)
+        self.assertEqual(
+            [p.on_waiting_list for p in participants],
+            [False] * self.max_participants + [True] * (self.registrations - self.max_participants),
+        )
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registered_count, self.max_participants)
+        self.assertEqual(self.event.waitlist_count, self.registrations - self.max_participants)
+
+    @override_settings(REGISTRATION_BATCHING=True, REGISTRATION_BATCH_WINDOW=0.05)
+    def test_batched_duplicate_registrations(self):
+        """Test that duplicates within one batch are only registered once."""
+        errors = self.run_registrations(names=["Double Clicker"] * 3)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            Participant.objects.filter(event=self.event, name="Double Clicker").count(), 1
+        )
+
+    @override_settings(REGISTRATION_BATCHING=True, REGISTRATION_BATCH_WINDOW=0.05)
+    def test_batched_confirmations_in_each_language(self):
+        """Test that every confirmation of a batch is written in its visitor's language."""
+        self.registrations = 6
+        errors = self.run_registrations(languages=["en", "de"] * 3)
+
+        self.assertEqual(errors, [])
+        for email in OutgoingEmail.objects.filter(participant__event=self.event):
+            index = int(email.recipient.removeprefix("runner").split("@")[0])
+            german = email.subject.startswith(("Anmeldung für", "Warteliste für"))
+            self.assertEqual(german, index % 2 == 1, email.subject)
+        self.assertEqual(OutgoingEmail.objects.count(), 6)
+
+
+class ParticipantExportViewTest(TestCase):
+    """Test case for the ParticipantExportView."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.event = RunningEvent.objects.create(
+            name="Export Event",
+            date=timezone.now().date() + timedelta(days=1),
+            location="Test Location",
+            description="Test Description",
+            max_participants=1,
+        )
+        self.other_event = RunningEvent.objects.create(
+            name="Other Event",
+            date=timezone.now().date() + timedelta(days=2),
+            location="Test Location",
+            description="Test Description",
+        )
+        for event, name in [
+            (self.event, "Runner A"),
+            (self.event, "=HYPERLINK()"),
+            (self.other_event, "Runner B"),
+        ]:
+            event.register(
+                Participant(
+                    name=name,
+                    department="Dept",
+                    year_of_birth=2000,
+                    tshirt_size="M",
+                    email="runner@example.com",
+                )
+            )
+        self.staff = User.objects.create_user("staff", password="password", is_staff=True)
+        self.staff.user_permissions.add(Permission.objects.get(codename="view_participant"))
+
+    def get_rows(self, response):
+        """Consume the streamed response and parse it as CSV."""
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_requires_staff(self):
+        """Test that anonymous users are sent to the admin login."""
+        response = self.client.get(reverse("participant_export"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("admin:login"), response["Location"])
+
+    def test_requires_view_permission(self):
+        """Test that staff members who may not see the participants cannot export them."""
+        self.client.force_login(User.objects.create_user("other", is_staff=True))
+        self.assertEqual(self.client.get(reverse("participant_export")).status_code, 403)
+
+    async def test_async_export(self):
+        """Test that the export is streamed asynchronously under ASGI."""
+        client = AsyncClient()
+        await client.aforce_login(self.staff)
+        response = await client.get(reverse("participant_export"), {"event": self.event.pk})
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual([row[1] for row in rows[1:]], ["Runner A", "'=HYPERLINK()"])
+
+    def test_export_all(self):
+        """Test the export of all participants."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("participant_export"))
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment", response["Content-Disposition"])
+
+        rows = self.get_rows(response)
+        self.assertEqual(rows[0][:3], ["event", "name", "department"])
+        self.assertEqual(
+            [(row[0], row[1], row[6]) for row in rows[1:]],
+            [
+                ("Export Event", "Runner A", "False"),
+                ("Export Event", "'=HYPERLINK()", "True"),
+                ("Other Event", "Runner B", "False"),
+            ],
+        )
+
+    def test_formula_characters_escaped(self):
+        """Test that every value a spreadsheet could evaluate is prefixed with a quote."""
+        for name in ("+1", "-1", "@SUM(A1)", "\t=1", "\r=1"):
+            Participant.objects.filter(name="=HYPERLINK()").update(name=name)
+            content = "".join(participant_csv_rows(Participant.objects.all()))
+            rows = list(csv.reader(io.StringIO(content)))
+            self.assertEqual(rows[2][1], "'" + name, repr(name))
+            Participant.objects.filter(name=name).update(name="=HYPERLINK()")
+
+    def test_export_single_event(self):
+        """Test the export of the participants of one event."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("participant_export"), {"event": self.other_event.pk})
+        rows = self.get_rows(response)
+        self.assertEqual([row[1] for row in rows[1:]], ["Runner B"])
+
+    def test_single_query_for_large_exports(self):
+        """Test that rows are streamed in chunks from one query, without per-row lookups."""
+        self.event.register_batch(
+            [
+                Participant(name=f"Bulk {i}", department="Dept", year_of_birth=2000)
+                for i in range(EXPORT_CHUNK_SIZE + 10)
+            ]
+        )
+        with self.assertNumQueries(1):
+            chunks = list(participant_csv_rows(Participant.objects.all()))
+        self.assertEqual(len(chunks), 3)  # Header, one full chunk, the rest
+        self.assertEqual(sum(chunk.count("\n") for chunk in chunks), EXPORT_CHUNK_SIZE + 14)
@@ -17,4 +17,35 @@ urlpatterns = [
         views.AlreadyRegisteredView.as_view(),
         name="already_registered",
     ),
+    path(
+        "event/<int:pk>/availability/",
+        views.EventAvailabilityPollView.as_view(),
+        name="event_availability_poll",
+    ),
+    path(
+        "event/<int:pk>/availability/stream/",
+        views.EventAvailabilityStreamView.as_view(),
+        name="event_availability_stream",
+    ),
+    path("csrf-token/", views.CsrfTokenView.as_view(), name="csrf_token"),
+    path("api/events/", views.EventAvailabilityListView.as_view(), name="api_event_list"),
+    path(
+        "api/events/<int:pk>/",
+        views.EventAvailabilityView.as_view(),
+        name="api_event_detail",
+    ),
+    path(
+        "export/participants.csv",
+        views.ParticipantExportView.as_view(),
+        name="participant_export",
+    ),
+    path(
+        "event/<int:pk>/tshirt-sizes.<str:format>",
+        views.TshirtSizeReportView.as_view(),
+        name="tshirt_size_report",
+    ),
+    path("metrics", views.MetricsView.as_view(), name="metrics"),
+    path("profiles/", views.ProfileListView.as_view(), name="profile_list"),
+    path("profiles/<str:name>/", views.ProfileDetailView.as_view(), name="profile_detail"),
+    path("profiles/<str:name>.prof", views.ProfileDownloadView.as_view(), name="profile_download"),
 ]
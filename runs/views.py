@@ -1,25 +1,116 @@
 """Views for the runs application."""
 
+# Standard library imports
+import mimetypes
+import os
+
 # Django imports
 from django.conf import settings
 from django.contrib import messages
-from django.core.exceptions import NON_FIELD_ERRORS
-from django.shortcuts import redirect, render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import permission_required
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.middleware.csrf import get_token
+from django.shortcuts import aget_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django.utils.translation import gettext_lazy as _
-from django.views.generic import DetailView, ListView
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.generic import DetailView, ListView, View
+from django.views.static import was_modified_since
 
 # Local application imports
+from .availability import availability_broker
+from .batching import registration_batcher
+from .cache import CachedPageMixin
+from .exports import participant_csv_response
 from .forms import ParticipantForm
+from .metrics import metrics_registry
 from .models import Participant, RunningEvent
+from .profiling import get_profile_path, list_profiles, load_profile
+from .reports import tshirt_size_csv_response, tshirt_size_report
+
+# Browsers must revalidate the public pages; unchanged pages are answered with 304
+revalidate = cache_control(private=True, no_cache=True)
+
+# API responses hold no personal data, so proxies may share them for a few seconds
+api_cache = cache_control(public=True, max_age=settings.API_CACHE_MAX_AGE)
+
+# Content-hashed static files never change under their name, so browsers keep them a year
+STATIC_HASHED_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_MAX_AGE = 60
+
+# Separators without whitespace keep the API payloads compact
+COMPACT_JSON = {"separators": (",", ":")}
 
 
-class RunningEventListView(ListView):
+def event_availability(event: RunningEvent) -> dict:
+    """
+    Describe the registration status of an event for the JSON API.
+
+    Returns:
+        dict: The event's id, name, dates, whether registration is open and the
+            number of available spots (None if there is no limit)
+    """
+    deadline = event.registration_deadline
+    return {
+        "id": event.pk,
+        "name": event.name,
+        "date": event.date.isoformat(),
+        "registration_deadline": deadline.isoformat() if deadline else None,
+        "registration_open": event.is_registration_open(),
+        "max_participants": event.max_participants,
+        "available_spots": event.get_available_spots(),
+    }
+
+
+class AsyncDetailMixin:
+    """
+    Look up the object of a detail view with Django's async ORM.
+
+    Views using this mixin are async views: under ASGI they run on the event loop
+    instead of a worker thread. Templates are still rendered in a thread, so the
+    context must not contain querysets that are evaluated while rendering.
+    """
+
+    async def aget_object(self):
+        """
+        Return the object the view is displaying.
+
+        Raises:
+            Http404: If there is no object with the pk from the URL
+        """
+        return await aget_object_or_404(self.get_queryset(), pk=self.kwargs[self.pk_url_kwarg])
+
+    async def get(self, request, *args, **kwargs):
+        """Render the detail page of the object."""
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+@method_decorator(revalidate, name="get")
+class RunningEventListView(CachedPageMixin, ListView):
     """
     View for displaying a list of running events with open registration.
 
     This view shows all running events where registration is still open,
     ordered by date. It also adds information about available spots for
-    events with a maximum number of participants.
+    events with a maximum number of participants. Pages are served from the
+    versioned page cache, and unchanged pages are answered with 304 Not Modified.
     """
 
     model = RunningEvent
@@ -30,35 +121,36 @@ class RunningEventListView(ListView):
         """
         Get the list of running events with open registration.
 
+        The deadline filter and the available spots are computed in a single query,
+        so the page cost does not grow with the number of past events or participants.
+
         Returns:
-            list: A list of RunningEvent objects with open registration.
+            QuerySet: RunningEvent objects with open registration, annotated with
+                ``available_spots``.
         """
-        events = RunningEvent.objects.all().order_by("date")
-        # Filter to only include events where registration is open
-        return [event for event in events if event.is_registration_open()]
+        return RunningEvent.objects.registration_open().with_available_spots().order_by("date")
 
-    def get_context_data(self, **kwargs):
+    async def aget_page(self):
         """
-        Add available spots information to the context.
+        Fetch the events with the async ORM and render the list.
 
         Returns:
-            dict: The context dictionary with added available spots information.
+            TemplateResponse: The event list page
         """
-        context = super().get_context_data(**kwargs)
-        # Add available spots information to each event
-        for event in context["events"]:
-            if event.max_participants:
-                event.available_spots = event.get_available_spots()
-        return context
+        self.object_list = [event async for event in self.get_queryset()]
+        return self.render_to_response(self.get_context_data())
 
 
-class RunningEventDetailView(DetailView):
+@method_decorator(revalidate, name="get")
+class RunningEventDetailView(CachedPageMixin, AsyncDetailMixin, DetailView):
     """
     View for displaying details of a running event and handling registration.
 
     This view shows the details of a running event and provides a registration form.
     It also handles the registration process, including checking if registration is open,
     if there are available spots, and if the participant is already registered.
+    GET requests are served from the versioned page cache, and unchanged pages
+    are answered with 304 Not Modified.
     """
 
     model = RunningEvent
@@ -78,10 +170,24 @@ class RunningEventDetailView(DetailView):
         # Add available spots information
         if self.object.max_participants:
             context["available_spots"] = self.object.get_available_spots()
+            context["live_availability"] = settings.LIVE_AVAILABILITY_SSE
+            context["availability_poll_interval"] = (
+                0 if settings.LIVE_AVAILABILITY_SSE else settings.AVAILABILITY_POLL_INTERVAL
+            )
 
         return context
 
-    def post(self, request, *args, **kwargs):
+    async def aget_page(self):
+        """
+        Fetch the event with the async ORM and render its detail page.
+
+        Returns:
+            TemplateResponse: The event detail page
+        """
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    async def post(self, request, *args, **kwargs):
         """
         Handle POST requests for participant registration.
 
@@ -97,7 +203,7 @@ class RunningEventDetailView(DetailView):
             HttpResponse: Redirect to success page, already registered page,
                 or back to form with errors
         """
-        self.object = self.get_object()
+        self.object = await self.aget_object()
 
         # Check if registration is open
         if not self.object.is_registration_open():
@@ -108,27 +214,39 @@ class RunningEventDetailView(DetailView):
         if form.is_valid():
             participant = form.save(commit=False)
 
-            # Check if there are available spots
-            if self.object.max_participants and not self.object.has_available_spots():
-                participant.on_waiting_list = True
+            # Claim a spot or a waiting list place atomically
+            if settings.REGISTRATION_BATCHING:
+                participant, created = await registration_batcher.asubmit(self.object, participant)
+            else:
+                try:
+                    participant, created = (
+                        await self.object.aregister(participant, confirm=True),
+                        True,
+                    )
+                except IntegrityError:
+                    # The unique constraint caught a duplicate registration
+                    existing = await participant.aget_existing_registration()
+                    if existing is None:
+                        raise
+                    participant, created = existing, False
+
+            if not created:
+                # Redirect to the already registered page with the existing participant
+                return redirect("already_registered", pk=participant.pk)
+
+            if participant.on_waiting_list:
                 messages.warning(
                     request, _("No spots available. You have been placed on the waiting list.")
                 )
 
-            participant.save()
             return redirect("registration_success", pk=participant.pk)
-        else:
-            # Check if this is our special "already registered" error
-            if "already_registered" in form.errors[NON_FIELD_ERRORS]:
-                # Redirect to the already registered page with the existing participant
-                return redirect("already_registered", pk=form.existing_participant.pk)
 
         context = self.get_context_data(object=self.object)
         context["form"] = form
-        return render(request, self.template_name, context)
+        return self.render_to_response(context)
 
 
-class RegistrationSuccessView(DetailView):
+class RegistrationSuccessView(AsyncDetailMixin, DetailView):
     """
     View for displaying registration success information.
 
@@ -137,12 +255,12 @@ class RegistrationSuccessView(DetailView):
     participant has been placed on a waiting list.
     """
 
-    model = Participant
+    queryset = Participant.objects.select_related("event")
     template_name = "runs/registration_success.html"
     context_object_name = "participant"
 
 
-class AlreadyRegisteredView(DetailView):
+class AlreadyRegisteredView(AsyncDetailMixin, DetailView):
     """
     View for displaying information when a participant is already registered.
 
@@ -151,7 +269,7 @@ class AlreadyRegisteredView(DetailView):
     and admin contact information.
     """
 
-    model = Participant
+    queryset = Participant.objects.select_related("event")
     template_name = "runs/already_registered.html"
     context_object_name = "participant"
 
@@ -165,3 +283,363 @@ class AlreadyRegisteredView(DetailView):
         context = super().get_context_data(**kwargs)
         context["admin_email"] = settings.ADMIN_EMAIL
         return context
+
+
+@method_decorator(api_cache, name="get")
+class EventAvailabilityListView(CachedPageMixin, View):
+    """
+    JSON API listing the events with open registration and their available spots.
+
+    Responses are served from the versioned page cache and carry the same ETag and
+    Last-Modified validators as the event list page.
+    """
+
+    async def aget_page(self):
+        """
+        Fetch the events with the async ORM and serialise them.
+
+        Returns:
+            JsonResponse: The events, ordered by date
+        """
+        events = RunningEvent.objects.registration_open().order_by("date")
+        data = {"events": [event_availability(event) async for event in events]}
+        return JsonResponse(data, json_dumps_params=COMPACT_JSON)
+
+
+@method_decorator(api_cache, name="get")
+class EventAvailabilityView(CachedPageMixin, View):
+    """
+    JSON API for the registration status and available spots of one event.
+
+    Responses are served from the versioned page cache and carry the same ETag and
+    Last-Modified validators as the event detail page.
+    """
+
+    async def aget_page(self):
+        """
+        Fetch the event with the async ORM and serialise it.
+
+        Returns:
+            JsonResponse: The event's availability
+
+        Raises:
+            Http404: If the event does not exist
+        """
+        event = await aget_object_or_404(RunningEvent, pk=self.kwargs["pk"])
+        return JsonResponse(event_availability(event), json_dumps_params=COMPACT_JSON)
+
+
+@method_decorator(never_cache, name="get")
+class EventAvailabilityStreamView(View):
+    """
+    Server-sent event stream of the available spots and waiting list of one event.
+
+    The event detail page listens to this stream to update its seat count in place.
+    Changes are pushed by the in-process availability broker, which reads every
+    change once for all connected browsers. Only available with
+    ``LIVE_AVAILABILITY_SSE``, since a stream would block a WSGI worker.
+    """
+
+    async def get(self, request, pk, *args, **kwargs):
+        """
+        Stream the current availability, then every change.
+
+        Returns:
+            StreamingHttpResponse: The ``text/event-stream`` response
+
+        Raises:
+            Http404: If the event does not exist or streams are disabled
+        """
+        if not settings.LIVE_AVAILABILITY_SSE:
+            raise Http404
+        # Subscribe before reading the state, so no change can slip in between
+        subscription = availability_broker.subscribe(pk)
+        state = await availability_broker.aget_state(pk)
+        if state is None:
+            availability_broker.unsubscribe(subscription)
+            raise Http404
+        return StreamingHttpResponse(
+            availability_broker.stream(subscription, state),
+            content_type="text/event-stream",
+            headers={"X-Accel-Buffering": "no"},
+        )
+
+
+@method_decorator(never_cache, name="get")
+class EventAvailabilityPollView(View):
+    """
+    Long-polling fallback for browsers without server-sent events.
+
+    Answers as soon as the availability differs from the ``?version=`` the browser
+    already shows, or with the unchanged state after ``AVAILABILITY_POLL_TIMEOUT``
+    seconds. Without ``LIVE_AVAILABILITY_SSE`` it answers at once from the cache,
+    and the page asks again after ``AVAILABILITY_POLL_INTERVAL`` seconds.
+    """
+
+    async def get(self, request, pk, *args, **kwargs):
+        """
+        Wait for a change of the event's availability.
+
+        Returns:
+            JsonResponse: The current availability
+
+        Raises:
+            Http404: If the event does not exist
+        """
+        if not settings.LIVE_AVAILABILITY_SSE:
+            state = await availability_broker.aget_cached_state(pk)
+            if state is None:
+                raise Http404
+            return JsonResponse(state, json_dumps_params=COMPACT_JSON)
+
+        version = request.GET.get("version", "")
+        subscription = availability_broker.subscribe(pk)
+        try:
+            state = await availability_broker.aget_state(pk)
+            if state is None:
+                raise Http404
+            if str(state["version"]) == version:
+                state = await subscription.wait(settings.AVAILABILITY_POLL_TIMEOUT) or state
+        finally:
+            availability_broker.unsubscribe(subscription)
+        return JsonResponse(state, json_dumps_params=COMPACT_JSON)
+
+
+@method_decorator(never_cache, name="get")
+class CsrfTokenView(View):
+    """
+    CSRF token for forms submitted from published pages.
+
+    Published pages are shared by all visitors, so their registration form has no
+    token; it fetches one from here, which also sets the CSRF cookie.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return the visitor's CSRF token.
+
+        Returns:
+            JsonResponse: The token as ``token``
+        """
+        return JsonResponse({"token": get_token(request)})
+
+
+@method_decorator(
+    [staff_member_required, permission_required("runs.view_participant", raise_exception=True)],
+    name="dispatch",
+)
+class ParticipantExportView(View):
+    """
+    View for downloading participant rosters as CSV.
+
+    Streams the participants of all events, or only of the events given as
+    ``?event=<pk>`` parameters. Only available to staff members allowed to view
+    the participants.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Stream the requested participants as a CSV attachment.
+
+        Returns:
+            StreamingHttpResponse: The CSV download
+        """
+        queryset = Participant.objects.all()
+        event_ids = [pk for pk in request.GET.getlist("event") if pk.isdigit()]
+        if event_ids:
+            queryset = queryset.filter(event_id__in=event_ids)
+        return participant_csv_response(request, queryset)
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class TshirtSizeReportView(View):
+    """
+    View for downloading the t-shirt sizes of an event as JSON or CSV.
+
+    The report is cached until the event or its participants change, so it can be
+    polled without querying the participants. Only available to staff members.
+    """
+
+    def get(self, request, pk, format, *args, **kwargs):
+        """
+        Return the t-shirt size report in the requested format.
+
+        Args:
+            request: The HTTP request
+            pk (int): The primary key of the event
+            format (str): ``json`` or ``csv``
+
+        Returns:
+            HttpResponse: The report
+
+        Raises:
+            Http404: If the event does not exist or the format is unknown
+        """
+        if format not in ("json", "csv"):
+            raise Http404
+        report = tshirt_size_report(pk)
+        if report is None:
+            raise Http404
+        if format == "csv":
+            return tshirt_size_csv_response(report)
+        return JsonResponse(report)
+
+
+@method_decorator(never_cache, name="get")
+class MetricsView(View):
+    """
+    Prometheus endpoint with the request metrics of all processes.
+
+    Prometheus authenticates with the ``METRICS_TOKEN`` as a bearer token; staff
+    members can view the metrics in the browser.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return the request histograms in the Prometheus text format.
+
+        Returns:
+            HttpResponse: The metrics, or 403 Forbidden without a valid token
+        """
+        token = settings.METRICS_TOKEN
+        authorization = request.headers.get("Authorization", "")
+        if not (
+            request.user.is_staff
+            or (token and constant_time_compare(authorization, f"Bearer {token}"))
+        ):
+            return HttpResponseForbidden()
+        return HttpResponse(
+            metrics_registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ProfileListView(View):
+    """Staff page listing the stored request profiles, newest first."""
+
+    def get(self, request, *args, **kwargs):
+        """
+        Render the list of profiles.
+
+        Returns:
+            TemplateResponse: The profile list page
+        """
+        context = {"title": _("Request profiles"), "profiles": list_profiles()}
+        return TemplateResponse(request, "runs/profiles/profile_list.html", context)
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ProfileDetailView(View):
+    """Staff page showing the call statistics and SQL statements of a request profile."""
+
+    def get(self, request, name, *args, **kwargs):
+        """
+        Render one profile.
+
+        Returns:
+            TemplateResponse: The profile page
+
+        Raises:
+            Http404: If there is no profile with this name
+        """
+        profile = load_profile(name)
+        if profile is None:
+            raise Http404
+        context = {"title": _("Request profile %(name)s") % {"name": name}, "profile": profile}
+        return TemplateResponse(request, "runs/profiles/profile_detail.html", context)
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ProfileDownloadView(View):
+    """Download of a profile's call statistics for pstats or snakeviz."""
+
+    def get(self, request, name, *args, **kwargs):
+        """
+        Return the ``.prof`` file of a profile.
+
+        Returns:
+            FileResponse: The call statistics as an attachment
+
+        Raises:
+            Http404: If there is no profile with this name
+        """
+        path = get_profile_path(name)
+        if path is None:
+            raise Http404
+        return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)
+
+
+def accepts_encoding(accept_encoding: str, coding: str) -> bool:
+    """
+    Check if an Accept-Encoding header allows a content coding.
+
+    Args:
+        accept_encoding (str): The header value, e.g. ``"gzip;q=0.8, br"``
+        coding (str): The content coding, e.g. ``"gzip"``
+
+    Returns:
+        bool: Whether the coding (or ``*``) is listed with a quality above zero
+    """
+    qualities = {}
+    for entry in accept_encoding.split(","):
+        name, *parameters = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name.lower()] = quality
+    return qualities.get(coding, qualities.get("*", 0.0)) > 0
+
+
+class StaticAssetView(View):
+    """
+    Serve the collected static files for deployments without a web server in front.
+
+    Content-hashed files are cached by browsers for a year without revalidation,
+    and the gzip copy written by collectstatic is sent to browsers accepting it.
+    Other files are revalidated with their modification time. Reached through
+    runs.middleware.StaticAssetMiddleware.
+    """
+
+    def get(self, request, path, *args, **kwargs):
+        """
+        Return a file from ``STATIC_ROOT``.
+
+        Returns:
+            FileResponse: The file, compressed if possible, or 304 Not Modified if
+                the browser's copy is still current
+
+        Raises:
+            Http404: If there is no such file
+        """
+        try:
+            full_path = staticfiles_storage.path(path)
+        except (NotImplementedError, SuspiciousFileOperation):
+            raise Http404
+        if not os.path.isfile(full_path):
+            raise Http404
+        modified = os.stat(full_path).st_mtime
+        if not was_modified_since(request.headers.get("If-Modified-Since"), modified):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            gzipped = accepts_encoding(request.headers.get("Accept-Encoding", ""), "gzip")
+            if gzipped and os.path.isfile(f"{full_path}.gz"):
+                response = FileResponse(open(f"{full_path}.gz", "rb"), content_type=content_type)
+                response.headers["Content-Encoding"] = "gzip"
+            else:
+                response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        response.headers["Last-Modified"] = http_date(modified)
+        patch_vary_headers(response, ["Accept-Encoding"])
+        if path in getattr(staticfiles_storage, "hashed_names", ()):
+            patch_cache_control(
+                response, public=True, max_age=STATIC_HASHED_MAX_AGE, immutable=True
+            )
+        else:
+            patch_cache_control(response, public=True, max_age=STATIC_MAX_AGE)
+        return response